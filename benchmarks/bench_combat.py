@@ -0,0 +1,87 @@
+# bench_combat.py
+# Equivalence check and benchmark: closed-form and batched combat vs the
+# original one-swing-at-a-time loop.
+#
+#   python -m benchmarks.bench_combat [--max-attack N] [--max-health N]
+#
+# Every mob in the content registry is checked over a grid of player
+# attack/health values, including the edge cases (zero or negative health).
+# Exits non-zero on any mismatch.
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cogs.mobs import simulate_combat, simulate_combat_many  # noqa: E402
+from core.registry import registry  # noqa: E402
+
+MOBS = registry().mobs
+
+
+# Reference implementation: the loop simulate_combat replaced
+def loop_combat(mob, player_attack: int = 18, player_health: int = 100) -> Tuple[bool, int, int]:
+    m_hp = mob.health
+    p_hp = player_health
+    while m_hp > 0 and p_hp > 0:
+        m_hp -= max(1, player_attack - mob.difficulty)
+        if m_hp <= 0:
+            break
+        p_hp -= max(1, mob.attack - 5)
+    return (p_hp > 0, max(0, p_hp), max(0, m_hp))
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-attack", type=int, default=60)
+    parser.add_argument("--max-health", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    grid = [
+        (mob, atk, hp)
+        for mob in MOBS.values()
+        for atk in range(0, args.max_attack + 1)
+        for hp in range(-1, args.max_health + 1)
+    ]
+    mobs = [g[0] for g in grid]
+    attacks = [g[1] for g in grid]
+    healths = [g[2] for g in grid]
+
+    start = time.perf_counter()
+    expected = [loop_combat(m, a, h) for m, a, h in grid]
+    t_loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = [simulate_combat(m, a, h) for m, a, h in grid]
+    t_scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    wins, p_hp, m_hp = simulate_combat_many(mobs, attacks, healths)
+    t_batch = time.perf_counter() - start
+    batched = [(bool(w), int(p), int(m)) for w, p, m in zip(wins, p_hp, m_hp)]
+
+    mismatches = 0
+    for case, exp, got_s, got_b in zip(grid, expected, scalar, batched):
+        if exp != got_s or exp != got_b:
+            mismatches += 1
+            if mismatches <= 10:
+                mob, atk, hp = case
+                print(f"MISMATCH {mob.key} atk={atk} hp={hp}: loop={exp} closed={got_s} batch={got_b}")
+
+    n = len(grid)
+    print(f"{n:,} fights across {len(MOBS)} mobs")
+    print(f"  loop        {n / t_loop:>14,.0f} fights/s")
+    print(f"  closed form {n / t_scalar:>14,.0f} fights/s ({t_loop / t_scalar:.1f}x)")
+    print(f"  batched     {n / t_batch:>14,.0f} fights/s ({t_loop / t_batch:.1f}x)")
+    if mismatches:
+        print(f"{mismatches} mismatching fight(s)")
+        return 1
+    print("Closed-form and batched results match the loop for every mob")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# bench_embeds.py
+# Static content embeds: renders --renders viewstructure and biome card
+# embeds with a per-request footer, once by building each embed from the
+# content every time (the old handlers) and once from the per-version
+# payload cache in core/embeds.py. Reports embeds per second for both, with
+# and without turning them into the dict that is sent to Discord.
+#
+#   python -m benchmarks.bench_embeds [--renders N]
+#
+# Exits non-zero if a cached embed differs from a freshly built one, or a
+# footer set on one render shows up in another.
+from __future__ import annotations
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import discord  # noqa: E402
+
+from cogs.biomecard import biome_embed  # noqa: E402
+from cogs.structures import structure_embed  # noqa: E402
+from core.embeds import EmbedTemplates  # noqa: E402
+from core.registry import registry  # noqa: E402
+
+
+def _rate(work: List[Tuple], render: Callable, send: bool) -> float:
+    start = time.perf_counter()
+    if send:
+        for args in work:
+            render(*args).to_dict()
+    else:
+        for args in work:
+            render(*args)
+    return len(work) / (time.perf_counter() - start)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=200_000)
+    args = parser.parse_args(argv)
+    reg = registry()
+    records = [("structure", s) for s in reg.structure_table] + [("biome", b) for b in reg.biomes]
+    work = [(*records[i % len(records)], f"Requested by player{i % 1000}") for i in range(args.renders)]
+
+    def build(kind, record) -> discord.Embed:
+        return structure_embed(record) if kind == "structure" else biome_embed(record, reg)
+
+    def rebuild(kind, record, footer) -> discord.Embed:
+        e = build(kind, record)
+        if kind == "biome":
+            e.set_footer(text=footer)
+        return e
+
+    templates = EmbedTemplates()
+
+    def cached(kind, record, footer) -> discord.Embed:
+        return templates.render(reg, (kind, record.id), lambda: build(kind, record), footer=footer if kind == "biome" else None)
+
+    errors = 0
+    for kind, record in records:
+        first = cached(kind, record, "Requested by a").to_dict()
+        if first != rebuild(kind, record, "Requested by a").to_dict():
+            print(f"Cached {kind} embed for {record.name} differs from a fresh build")
+            errors += 1
+        again = cached(kind, record, "Requested by b").to_dict()
+        if first.get("footer") == again.get("footer") and kind == "biome":
+            print(f"A footer leaked between renders of the {record.name} embed")
+            errors += 1
+
+    for label, send in (("built", False), ("sent as dicts", True)):
+        before = _rate(work, rebuild, send)
+        after = _rate(work, cached, send)
+        print(f"{args.renders:,} embeds {label}: {before:,.0f}/s rebuilt, {after:,.0f}/s cached ({after / before:.1f}x)")
+    print(f"{len(templates)} payloads cached for {len(records)} records, {templates.hits:,} hits, {templates.misses} misses")
+
+    if errors:
+        return 1
+    print("Cached embeds match fresh builds and footers stay per render")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
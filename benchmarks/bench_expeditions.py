@@ -0,0 +1,128 @@
+# bench_expeditions.py
+# Expedition scheduling at scale: puts --expeditions timers on the timing
+# wheel and turns it second by second through the longest trip, checking that
+# every timer fires on its deadline tick. Compares memory against one
+# sleeping task per expedition and times batch resolution.
+#
+#   python -m benchmarks.bench_expeditions [--expeditions N] [--batch N]
+#
+# Exits non-zero if any timer fires early, late or more than once.
+from __future__ import annotations
+import argparse
+import asyncio
+import math
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cogs.expeditions import MAX_MINUTES, MIN_MINUTES, resolve_expeditions  # noqa: E402
+from core.expeditions import Expedition  # noqa: E402
+from core.registry import registry  # noqa: E402
+from core.wheel import TimingWheel  # noqa: E402
+
+START = 1_700_000_000.0
+
+
+def _traced(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+async def _sleeping_tasks(n: int) -> int:
+    # The alternative: one task parked in asyncio.sleep per expedition
+    tracemalloc.start()
+    tasks = [asyncio.ensure_future(asyncio.sleep(3600)) for _ in range(n)]
+    await asyncio.sleep(0)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return size
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--expeditions", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=1_000, help="expeditions per resolution batch")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    n = args.expeditions
+
+    due: Dict[int, float] = {u: START + rng.uniform(MIN_MINUTES, MAX_MINUTES) * 60 for u in range(n)}
+
+    def build() -> TimingWheel:
+        wheel = TimingWheel(START)
+        for user, when in due.items():
+            wheel.schedule(user, when)
+        return wheel
+
+    start = time.perf_counter()
+    wheel, wheel_bytes = _traced(build)
+    schedule_seconds = time.perf_counter() - start
+    task_bytes = asyncio.run(_sleeping_tasks(n))
+    print(
+        f"Scheduled {n:,} expeditions in {schedule_seconds * 1000:.0f} ms "
+        f"({schedule_seconds / n * 1e6:.2f} us each); wheel {wheel_bytes / 2**20:.1f} MiB "
+        f"vs {task_bytes / 2**20:.1f} MiB for one sleeping task each"
+    )
+
+    # Turn the wheel once per second, as the scheduler does
+    errors = 0
+    fired_total = 0
+    slowest = 0.0
+    spent = 0.0
+    ticks = math.ceil(MAX_MINUTES * 60) + 2
+    for tick in range(1, ticks + 1):
+        now = START + tick
+        t = time.perf_counter()
+        fired = wheel.advance(now)
+        elapsed = time.perf_counter() - t
+        spent += elapsed
+        slowest = max(slowest, elapsed)
+        fired_total += len(fired)
+        for user in fired:
+            expected = math.ceil(due.pop(user, math.inf))
+            if expected != int(now):
+                errors += 1
+    errors += len(due) + len(wheel)
+    print(
+        f"Turned {ticks:,} ticks in {spent * 1000:.0f} ms: {spent / ticks * 1e6:.1f} us per tick on average, "
+        f"slowest {slowest * 1000:.2f} ms; {fired_total:,} fired"
+    )
+
+    reg = registry()
+    biomes = [b.name for b in reg.biomes]
+    batch = [
+        Expedition(u, rng.choice(biomes), 1, START, START + rng.uniform(MIN_MINUTES, MAX_MINUTES) * 60)
+        for u in range(args.batch)
+    ]
+    start = time.perf_counter()
+    reports = resolve_expeditions(batch, reg, rng)
+    elapsed = time.perf_counter() - start
+    encounters = sum(r.encounters for r in reports)
+    print(
+        f"Resolved a batch of {len(batch):,} expeditions ({encounters:,} encounters) in {elapsed * 1000:.0f} ms "
+        f"({elapsed / len(batch) * 1000:.2f} ms per expedition)"
+    )
+
+    if errors:
+        print(f"{errors} timer(s) fired off their deadline, twice or never")
+        return 1
+    print("Every timer fired exactly once, on its deadline tick")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# bench_leaderboard.py
+# Leaderboard maintenance at scale: fills the boards with --users players
+# spread over --guilds guilds, then times reward updates, rank and top-N
+# lookups, and a snapshot save and reload. Ranks and top-N are checked
+# against a full sort of the scores.
+#
+#   python -m benchmarks.bench_leaderboard [--users N] [--guilds N] [--updates N]
+#
+# Exits non-zero if any rank or top-N differs from the full sort.
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.leaderboard import Leaderboards, RankedBoard  # noqa: E402
+
+
+def _check(board: RankedBoard, rng: random.Random, samples: int = 200) -> int:
+    expected = sorted(board.scores.items(), key=lambda p: (-p[1], p[0]))
+    errors = int(board.top(50) != expected[:50])
+    ranks = {u: i for i, (u, _) in enumerate(expected, 1)}
+    for user in rng.sample(list(ranks), min(samples, len(ranks))):
+        errors += board.rank(user) != ranks[user]
+    return errors
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--guilds", type=int, default=10_000)
+    parser.add_argument("--updates", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    n = args.users
+
+    boards = Leaderboards()
+    start = time.perf_counter()
+    boards.seed((u, rng.randint(0, 100_000), rng.randint(0, 1_000_000), 0, 0) for u in range(n))
+    print(f"Seeded {n:,} players in {(time.perf_counter() - start) * 1000:.0f} ms")
+    for u in range(n):
+        boards.seen(rng.randrange(args.guilds), u)
+
+    # Grants: mostly small positive coin/XP deltas, some spends, some kills
+    updates = [
+        (rng.randrange(n), rng.randint(-50, 200), rng.randint(0, 300), rng.random() < 0.1, rng.random() < 0.3)
+        for _ in range(args.updates)
+    ]
+    start = time.perf_counter()
+    for user, coins, xp, cards, kills in updates:
+        boards.add(user, coins=coins, xp=xp, cards=int(cards), kills=int(kills))
+    elapsed = time.perf_counter() - start
+    print(f"Applied {len(updates):,} grants in {elapsed * 1000:.0f} ms ({len(updates) / elapsed:,.0f} grants/s)")
+
+    users = [rng.randrange(n) for _ in range(10_000)]
+    start = time.perf_counter()
+    for user in users:
+        boards.rank("coins", user)
+    rank_us = (time.perf_counter() - start) / len(users) * 1e6
+    start = time.perf_counter()
+    for user in users[:1000]:
+        boards.top("xp", None, 10)
+    top_us = (time.perf_counter() - start) / 1000 * 1e6
+    guild_ids = list(boards.guilds)
+    start = time.perf_counter()
+    for user in users:
+        boards.rank("coins", user, guild_ids[user % len(guild_ids)])
+    guild_us = (time.perf_counter() - start) / len(users) * 1e6
+    print(f"Global rank {rank_us:.1f} us, global top 10 {top_us:.1f} us, guild rank {guild_us:.1f} us")
+
+    errors = sum(_check(boards.boards[m], rng) for m in boards.boards)
+    errors += sum(_check(boards.guilds[g]["coins"], rng, 5) for g in rng.sample(guild_ids, min(50, len(guild_ids))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leaderboards.bin")
+        boards.path = path
+        boards._dirty = True
+        start = time.perf_counter()
+        asyncio.run(boards.save())
+        saved = time.perf_counter() - start
+        reloaded = Leaderboards(path)
+        start = time.perf_counter()
+        reloaded._load()
+        loaded = time.perf_counter() - start
+        print(
+            f"Snapshot of {os.path.getsize(path) / 2**20:.1f} MiB saved in {saved * 1000:.0f} ms, "
+            f"loaded in {loaded * 1000:.0f} ms"
+        )
+    for metric, board in boards.boards.items():
+        errors += board.top(100) != reloaded.boards[metric].top(100) or board.scores != reloaded.boards[metric].scores
+    errors += boards.memberships != reloaded.memberships
+
+    if errors:
+        print(f"{errors} rank(s), top lists or snapshot rows differ from a full sort")
+        return 1
+    print("Ranks, top lists and the reloaded snapshot match a full sort")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# bench_lookup.py
+# Micro-benchmark for the argument key indexes: autocomplete, resolve and
+# did-you-mean suggestions over the live tier/mob/structure keys and over a
+# synthetic key set of --keys entries.
+#
+#   python -m benchmarks.bench_lookup [--keys N] [--queries N] [--budget-ms MS]
+#
+# Exits non-zero if any lookup averages over the budget (default 1 ms).
+from __future__ import annotations
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.lookup import KeyIndex  # noqa: E402
+from core.registry import registry  # noqa: E402
+
+
+def _synthetic_keys(n: int, rng: random.Random) -> List[str]:
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))).title() for _ in range(max(50, n // 4))]
+    keys = {" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(n)}
+    return sorted(keys)
+
+
+def _typo(key: str, rng: random.Random) -> str:
+    if len(key) < 3:
+        return key
+    i = rng.randrange(1, len(key))
+    return key[:i] + key[i + 1:]
+
+
+def _time(fn: Callable[[str], object], queries: Sequence[str]) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keys", type=int, default=10_000, help="size of the synthetic key set")
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    reg = registry()
+    indexes = {
+        "tiers": reg.tier_keys,
+        "mobs": reg.mob_keys,
+        "structures": reg.structure_keys,
+    }
+    start = time.perf_counter()
+    indexes[f"synthetic[{args.keys}]"] = KeyIndex(_synthetic_keys(args.keys, rng))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    failures = 0
+    print(f"{'index':<20} {'keys':>7} {'complete us':>12} {'resolve us':>11} {'suggest us':>11}")
+    for name, index in indexes.items():
+        keys = list(index.keys)
+        # Keystroke prefixes for autocomplete, exact and typo'd keys for resolution
+        prefixes = [k[: rng.randint(0, len(k))] for k in rng.choices(keys, k=args.queries)]
+        exact = [k.lower().replace(" ", "_") for k in rng.choices(keys, k=args.queries)]
+        # difflib is the slow path; a smaller sample keeps the run short
+        typos = [_typo(k, rng) for k in rng.choices(keys, k=max(1, args.queries // 20))]
+        t_complete = _time(index.complete, prefixes)
+        t_resolve = _time(index.resolve, exact)
+        t_suggest = _time(index.suggest, typos)
+        unresolved = sum(index.resolve(k) is None for k in exact)
+        over = [t for t in (t_complete, t_resolve, t_suggest) if t * 1000 > args.budget_ms]
+        failures += bool(over) + bool(unresolved)
+        print(
+            f"{name:<20} {len(index):>7} {t_complete * 1e6:>12.1f} {t_resolve * 1e6:>11.1f} {t_suggest * 1e6:>11.1f}"
+            f"{'  OVER BUDGET' if over else ''}{f'  {unresolved} UNRESOLVED' if unresolved else ''}"
+        )
+    print(f"Built the synthetic index in {build_ms:.1f} ms")
+
+    if failures:
+        print(f"{failures} index(es) failed the {args.budget_ms} ms budget or missed exact keys")
+        return 1
+    print(f"All lookups within {args.budget_ms} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# bench_market.py
+# Order book matching throughput: rests --resting orders on one item, then
+# streams --orders limit orders around the mid price through it (about a
+# third cross and fill), with some cancels mixed in. Reports orders per
+# second and checks the engine against a sort-everything reference matcher
+# on a smaller run.
+#
+#   python -m benchmarks.bench_market [--resting N] [--orders N]
+#
+# Exits non-zero if a fill differs from the reference, the book ends up
+# crossed, or any quantity is created or lost.
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.market import Market, Side  # noqa: E402
+
+ITEM = 7
+MID = 1_000
+
+
+def _order(rng: random.Random, spread: int) -> Tuple[Side, int, int]:
+    side = Side(rng.randrange(2))
+    # Buys mostly below the mid price and sells above it, so a minority cross
+    offset = int(rng.gauss(spread / 2, spread))
+    price = MID - offset if side == Side.BUY else MID + offset
+    return side, max(1, price), rng.randint(1, 20)
+
+
+def _reference(orders: List[Tuple[Side, int, int]]) -> List[Tuple[int, int, int]]:
+    # Re-sorts the whole opposite side for every order: price-time priority spelled out
+    book: List[List[int]] = []  # [id, side, price, qty]
+    fills = []
+    for oid, (side, price, qty) in enumerate(orders, 1):
+        if side == Side.BUY:
+            opposite = sorted((o for o in book if o[1] == Side.SELL), key=lambda o: (o[2], o[0]))
+        else:
+            opposite = sorted((o for o in book if o[1] == Side.BUY), key=lambda o: (-o[2], o[0]))
+        for resting in opposite:
+            if not qty or (resting[2] > price if side == Side.BUY else resting[2] < price):
+                break
+            take = min(qty, resting[3])
+            qty -= take
+            resting[3] -= take
+            fills.append((oid, resting[0], take))
+        book = [o for o in book if o[3]]
+        if qty:
+            book.append([oid, side, price, qty])
+    return fills
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--resting", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--cancel-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    errors = 0
+
+    # Correctness first, on a size the reference can handle
+    sample = [_order(rng, 40) for _ in range(3_000)]
+    market = Market()
+    fills = []
+    for side, price, qty in sample:
+        order, got = market.place(1, ITEM, side, price, qty, now=0.0)
+        fills += [(order.id, f.sell_id if side == Side.BUY else f.buy_id, f.qty) for f in got]
+    if fills != _reference(sample):
+        print("Fills differ from the reference matcher")
+        errors += 1
+
+    market = Market()
+    start = time.perf_counter()
+    # Two-sided book that doesn't cross: bids below the mid price, asks above
+    for _ in range(args.resting):
+        side = Side(rng.randrange(2))
+        offset = 1 + int(abs(rng.gauss(0, 100)))
+        market.place(rng.randrange(10_000), ITEM, side, MID - offset if side == Side.BUY else MID + offset, rng.randint(1, 20), now=0.0)
+    print(f"Rested {len(market):,} orders in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    stream = [_order(rng, 100) for _ in range(args.orders)]
+    users = [rng.randrange(10_000) for _ in range(args.orders)]
+    cancels = [rng.random() < args.cancel_rate for _ in range(args.orders)]
+    placed_qty = sum(o.qty for o in market.orders.values()) + sum(q for _, _, q in stream)
+    filled_qty = cancelled_qty = n_fills = 0
+    ids = list(market.orders)
+    start = time.perf_counter()
+    slowest = 0.0
+    for (side, price, qty), user, cancel in zip(stream, users, cancels):
+        t = time.perf_counter()
+        order, got = market.place(user, ITEM, side, price, qty, now=0.0)
+        if cancel and ids:
+            cancelled_qty += market.cancel(ids[rng.randrange(len(ids))])
+        slowest = max(slowest, time.perf_counter() - t)
+        if order.qty:
+            ids.append(order.id)
+        n_fills += len(got)
+        filled_qty += 2 * sum(f.qty for f in got)
+    elapsed = time.perf_counter() - start
+    book = market.books[ITEM]
+    print(
+        f"Matched {args.orders:,} orders against a {args.resting:,}-order book in {elapsed * 1000:.0f} ms: "
+        f"{args.orders / elapsed:,.0f} orders/s, slowest {slowest * 1e6:.0f} us; "
+        f"{n_fills:,} fills, {len(market):,} orders resting"
+    )
+
+    resting_qty = sum(o.qty for o in market.orders.values())
+    if placed_qty != filled_qty + cancelled_qty + resting_qty:
+        print(f"Quantity not conserved: placed {placed_qty}, filled {filled_qty}, cancelled {cancelled_qty}, resting {resting_qty}")
+        errors += 1
+    bid, ask = book.depth(Side.BUY, 1), book.depth(Side.SELL, 1)
+    if bid and ask and bid[0][0] >= ask[0][0]:
+        print(f"Book is crossed: best bid {bid[0][0]}, best ask {ask[0][0]}")
+        errors += 1
+    if sum(book.levels[Side.BUY].values()) + sum(book.levels[Side.SELL].values()) != resting_qty:
+        print("Price level totals differ from the resting orders")
+        errors += 1
+
+    if errors:
+        return 1
+    print("Fills match the reference; the book is uncrossed and every unit is accounted for")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
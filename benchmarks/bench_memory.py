@@ -0,0 +1,153 @@
+# bench_memory.py
+# Resident memory of the client caches under each runtime profile.
+#
+#   python -m benchmarks.bench_memory [--guilds N] [--members N] [--messages N]
+#
+# Each profile runs in a fresh interpreter. A synthetic guild set (channels,
+# roles, members, voice states) is fed through the library's own GUILD_CREATE
+# and MESSAGE_CREATE handlers without a network connection, then RSS and the
+# number of cached objects are reported.
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+TIMESTAMP = "2024-01-01T00:00:00+00:00"
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _user(uid: int) -> dict:
+    return {"id": str(uid), "username": f"player{uid}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def guild_payload(gid: int, channels: int, members: int, voice_share: float) -> dict:
+    base = gid * 1_000_000
+    chans = [
+        {"id": str(base + c), "type": 0, "name": f"chan-{c}", "position": c, "permission_overwrites": [], "guild_id": str(gid)}
+        for c in range(1, channels + 1)
+    ]
+    voice_channel = base + channels + 1
+    chans.append({"id": str(voice_channel), "type": 2, "name": "voice", "position": channels + 1, "permission_overwrites": [], "bitrate": 64000, "user_limit": 0})
+    uids = [base + 10_000 + m for m in range(members)]
+    return {
+        "id": str(gid),
+        "name": f"guild-{gid}",
+        "owner_id": str(uids[0]) if uids else "1",
+        "member_count": members,
+        "large": False,
+        "features": [],
+        "emojis": [],
+        "stickers": [],
+        "threads": [],
+        "roles": [{"id": str(gid), "name": "@everyone", "permissions": "0", "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+        "channels": chans,
+        "members": [{"user": _user(u), "roles": [], "joined_at": TIMESTAMP, "deaf": False, "mute": False, "flags": 0} for u in uids],
+        "voice_states": [
+            {"user_id": str(u), "channel_id": str(voice_channel), "session_id": "s", "deaf": False, "mute": False,
+             "self_deaf": False, "self_mute": False, "self_video": False, "suppress": False}
+            for u in uids[: int(len(uids) * voice_share)]
+        ],
+    }
+
+
+def message_payload(mid: int, gid: int, channel_id: int, uid: int) -> dict:
+    return {
+        "id": str(mid), "channel_id": str(channel_id), "guild_id": str(gid), "type": 0,
+        "author": _user(uid), "member": {"roles": [], "joined_at": TIMESTAMP, "deaf": False, "mute": False, "flags": 0},
+        "content": "!openchest rare", "timestamp": TIMESTAMP, "edited_timestamp": None, "tts": False,
+        "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False,
+    }
+
+
+def child(profile: str, args: argparse.Namespace) -> dict:
+    os.environ["CLIENT_PROFILE"] = profile
+    import discord
+
+    from core.profile import client_options, describe
+
+    options = client_options()
+    client = discord.Client(**options)
+    state = client._connection
+    gc.collect()
+    before = rss_bytes()
+
+    mid = 1
+    for g in range(1, args.guilds + 1):
+        gid = 10_000 + g
+        state._add_guild_from_data(guild_payload(gid, args.channels, args.members, args.voice_share))
+        base = gid * 1_000_000
+        for m in range(args.messages):
+            channel_id = base + 1 + m % args.channels
+            uid = base + 10_000 + m % max(1, args.members)
+            state.parse_message_create(message_payload(mid, gid, channel_id, uid))
+            mid += 1
+
+    gc.collect()
+    after = rss_bytes()
+    return {
+        "profile": profile,
+        "settings": describe(options),
+        "rss_mb": after / 2**20,
+        "delta_mb": (after - before) / 2**20,
+        "guilds": len(state._guilds),
+        "cached_members": sum(len(g._members) for g in state._guilds.values()),
+        "cached_messages": len(state._messages) if state._messages is not None else 0,
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--members", type=int, default=50, help="members per guild in GUILD_CREATE")
+    parser.add_argument("--voice-share", type=float, default=0.2, help="fraction of those members in voice")
+    parser.add_argument("--messages", type=int, default=5, help="MESSAGE_CREATE events per guild")
+    parser.add_argument("--profiles", default="default,lean")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child(args.child, args)))
+        return 0
+
+    passthrough = [
+        f"--guilds={args.guilds}", f"--channels={args.channels}", f"--members={args.members}",
+        f"--voice-share={args.voice_share}", f"--messages={args.messages}",
+    ]
+    rows = []
+    for profile in args.profiles.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", *passthrough, "--child", profile],
+            cwd=str(Path(__file__).resolve().parents[1]),
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{args.guilds} guilds x {args.channels} channels, {args.members} members, {args.messages} messages each")
+    print(f"{'profile':<10} {'RSS MB':>8} {'cache MB':>9} {'members':>9} {'messages':>9}  settings")
+    for r in rows:
+        print(f"{r['profile']:<10} {r['rss_mb']:>8.1f} {r['delta_mb']:>9.1f} {r['cached_members']:>9} {r['cached_messages']:>9}  {r['settings']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# bench_ratelimit.py
+# Per-check cost and memory of the command rate limiter with a large number
+# of tracked users, plus a check of the bucket semantics.
+#
+#   python -m benchmarks.bench_ratelimit [--users N] [--checks N]
+#
+# Exits non-zero if a bucket admits more (or fewer) requests than its limit.
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.ratelimit import Bucket, CommandLimits, Limit, RateLimiter  # noqa: E402
+
+
+def check_semantics() -> List[str]:
+    errors = []
+    bucket = Bucket(Limit(5, 10))
+    allowed = 0
+    for _ in range(20):
+        if not bucket.retry_after(1, 0.0):
+            bucket.consume(1, 0.0)
+            allowed += 1
+    if allowed != 5:
+        errors.append(f"burst admitted {allowed}, expected 5")
+    # One token comes back every per/rate seconds
+    if bucket.retry_after(1, 1.9) == 0 or bucket.retry_after(1, 2.0) != 0:
+        errors.append("token not refilled after per/rate seconds")
+    # Keys untouched for a full generation are dropped, and start full
+    for t in (25.0, 40.0):
+        bucket.retry_after(2, t)
+    if len(bucket) != 0 or bucket.retry_after(1, 40.0) != 0:
+        errors.append(f"{len(bucket)} stale key(s) survived two rotations")
+    return errors
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--guilds", type=int, default=20_000)
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    errors = check_semantics()
+    for e in errors:
+        print(f"FAIL: {e}")
+
+    # No global bucket here, it would reject nearly everything at this rate
+    limits = {"openchest": CommandLimits(user=Limit(5, 60), guild=Limit(10_000, 60))}
+    limiter = RateLimiter(limits, global_limit=None)
+    users = [rng.getrandbits(62) for _ in range(args.users)]
+    guilds = [rng.getrandbits(62) for _ in range(args.guilds)]
+
+    now = 1000.0
+    start = time.perf_counter()
+    for i, uid in enumerate(users):
+        limiter.check("openchest", uid, guilds[i % args.guilds], now)
+    fill = time.perf_counter() - start
+    tracked = limiter.tracked()
+    # Dict tables plus one float per key; the int keys are the caller's ids
+    size = sum(
+        sys.getsizeof(d) + len(d) * sys.getsizeof(0.0)
+        for b in limiter._buckets.values() for d in (b.current, b.previous)
+    )
+    print(f"tracked keys: {tracked:,} ({size / 2**20:.1f} MiB, {size / max(1, tracked):.0f} B/key)")
+    print(f"first check per user: {fill / args.users * 1e9:,.0f} ns")
+
+    sample = [(rng.choice(users), rng.choice(guilds)) for _ in range(args.checks)]
+    check = limiter.check
+    start = time.perf_counter()
+    rejected = 0
+    for uid, gid in sample:
+        if check("openchest", uid, gid, now) is not None:
+            rejected += 1
+    elapsed = time.perf_counter() - start
+    print(f"check on a tracked user: {elapsed / args.checks * 1e9:,.0f} ns ({rejected / args.checks:.1%} rejected)")
+
+    start = time.perf_counter()
+    for _ in range(args.checks):
+        check("viewstructure", 1, 1, now)
+    print(f"unlimited command: {(time.perf_counter() - start) / args.checks * 1e9:,.0f} ns")
+
+    # The first check after a window rotates every bucket in O(1)
+    start = time.perf_counter()
+    check("openchest", users[0], guilds[0], now + 61)
+    print(f"check that rotates a generation: {(time.perf_counter() - start) * 1e3:.2f} ms")
+    start = time.perf_counter()
+    check("openchest", users[0], guilds[0], now + 200)
+    print(f"check that drops {tracked:,} stale keys: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    if errors:
+        return 1
+    print("Bucket semantics OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
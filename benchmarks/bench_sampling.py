@@ -0,0 +1,123 @@
+# bench_sampling.py
+# Micro-benchmark and distribution check: precompiled alias samplers vs the
+# original linear-scan rollers for biomes, chest tiers and loot items.
+#
+#   python -m benchmarks.bench_sampling [--rolls N] [--seed S]
+#
+# Exits non-zero if any compiled table drifts from the linear-scan odds.
+from __future__ import annotations
+import argparse
+import math
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from cogs.biomecard import weighted_choice  # noqa: E402
+from cogs.chests import loot_sampler, weighted_pick_tier  # noqa: E402
+from core.registry import registry  # noqa: E402
+
+CONTENT = registry()
+TIERS = CONTENT.tiers
+DEFAULT_BIOMES = CONTENT.biomes
+
+
+# Reference implementations: the linear scans these samplers replaced
+def linear_choice(items: Sequence, weight: Callable) -> object:
+    total = sum(weight(x) for x in items)
+    r = random.uniform(0, total)
+    upto = 0.0
+    for x in items:
+        if upto + weight(x) >= r:
+            return x
+        upto += weight(x)
+    return items[-1]
+
+
+def linear_pick_tier(allowed: List[str]):
+    return linear_choice([TIERS[k] for k in allowed], lambda t: t.weights)
+
+
+def _chi2_critical(df: int, z: float = 3.09) -> float:
+    # Wilson-Hilferty approximation; z=3.09 is roughly p=0.001
+    return df * (1 - 2 / (9 * df) + z * math.sqrt(2 / (9 * df))) ** 3
+
+
+def chi2_two_sample(a: Counter, b: Counter) -> float:
+    na, nb = sum(a.values()), sum(b.values())
+    ka, kb = math.sqrt(nb / na), math.sqrt(na / nb)
+    stat = 0.0
+    for key in set(a) | set(b):
+        x, y = a.get(key, 0), b.get(key, 0)
+        if x + y:
+            stat += (ka * x - kb * y) ** 2 / (x + y)
+    return stat
+
+
+def _time(fn: Callable[[], object], n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return time.perf_counter() - start
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rolls", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+    n = args.rolls
+
+    tables: Dict[str, tuple] = {
+        "biomes": (
+            lambda: weighted_choice(DEFAULT_BIOMES).name,
+            lambda: linear_choice(DEFAULT_BIOMES, lambda b: b.chance).name,
+            len(DEFAULT_BIOMES),
+        ),
+    }
+    all_tiers = list(TIERS)
+    biome_tiers = {tuple(CONTENT.tier_table[i].key for i in b.chest_types) for b in DEFAULT_BIOMES}
+    for allowed in biome_tiers | {tuple(all_tiers)}:
+        allowed_list = list(allowed)
+        tables[f"tiers[{','.join(allowed)}]"] = (
+            lambda a=allowed_list: weighted_pick_tier(a).key,
+            lambda a=allowed_list: linear_pick_tier(a).key,
+            len(allowed),
+        )
+    for tier in TIERS.values():
+        tables[f"loot[{tier.key}]"] = (
+            lambda t=tier: loot_sampler(t).sample().item,
+            lambda t=tier: linear_choice(t.items, lambda i: i.chance).item,
+            len(tier.items),
+        )
+
+    failures = 0
+    print(f"{'table':<44} {'linear/s':>12} {'alias/s':>12} {'speedup':>8} {'chi2':>8} {'crit':>8}")
+    for name, (fast, slow, k) in sorted(tables.items()):
+        fast_counts = Counter(fast() for _ in range(n))
+        slow_counts = Counter(slow() for _ in range(n))
+        stat = chi2_two_sample(fast_counts, slow_counts)
+        crit = _chi2_critical(max(1, k - 1))
+        t_slow = _time(slow, n)
+        t_fast = _time(fast, n)
+        ok = stat <= crit
+        failures += not ok
+        print(
+            f"{name:<44} {n / t_slow:>12,.0f} {n / t_fast:>12,.0f} {t_slow / t_fast:>7.1f}x "
+            f"{stat:>8.2f} {crit:>8.2f}{'' if ok else '  DRIFT'}"
+        )
+
+    if failures:
+        print(f"{failures} table(s) drifted from the linear-scan distribution")
+        return 1
+    print("All compiled tables match the linear-scan distribution")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
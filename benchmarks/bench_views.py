@@ -0,0 +1,145 @@
+# bench_views.py
+# Memory held by abandoned button messages: starts --flows fights that are
+# never clicked again, once the way discord.py does it by default (a View
+# with a timeout per message, registered in the view store) and once the
+# way cogs/mobs.py does it (one dispatcher view, one record per message in
+# a bounded ViewStateStore). Reports memory and tasks per approach, the
+# store's get/put cost, and what a TTL sweep leaves behind.
+#
+#   python -m benchmarks.bench_views [--flows N] [--capacity N]
+#
+# Exits non-zero if the store grows past its capacity, keeps anything past
+# its TTL, or starts a task.
+from __future__ import annotations
+import argparse
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from discord.ui.view import ViewStore  # noqa: E402
+
+from cogs.mobs import Fight, FightButtons  # noqa: E402
+from core import combat  # noqa: E402
+from core.registry import registry  # noqa: E402
+from core.views import ViewStateStore  # noqa: E402
+
+MESSAGE_BASE = 1_100_000_000_000_000_000
+
+
+class _TimedButtons(FightButtons):
+    # What a per-message view looks like: same buttons, default 3-minute timeout
+    def __init__(self):
+        super().__init__()
+        self.timeout = 180.0
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _measure(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, used
+
+
+async def _run(args) -> int:
+    mobs = list(registry().mobs.values())
+    n = args.flows
+    errors = 0
+    tasks_before = len(asyncio.all_tasks())
+
+    # Per-message views: each one is registered under its message and gets a timeout task
+    def per_message():
+        store = ViewStore(None)
+        for i in range(n):
+            store.add_view(_TimedButtons(), MESSAGE_BASE + i)
+        return store
+
+    start = time.perf_counter()
+    view_store, view_bytes = _measure(per_message)
+    view_tasks = len(asyncio.all_tasks()) - tasks_before
+    print(
+        f"{n:,} per-message views: {view_bytes / 2**20:.1f} MiB ({view_bytes / n:,.0f} B each), "
+        f"{view_tasks:,} timeout tasks, built in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    for view in list(view_store._synced_message_views.values()):
+        view.stop()
+    del view_store
+    await asyncio.sleep(0)  # let the cancelled timeout tasks finish
+
+    # Shared dispatcher plus one compact record per message
+    clock = _Clock()
+    tasks_before = len(asyncio.all_tasks())
+
+    def bounded():
+        store = ViewStateStore(args.capacity, args.ttl, clock)
+        dispatcher = FightButtons(cog=None)
+        for i in range(n):
+            clock.now += args.interval
+            store.put(MESSAGE_BASE + i, Fight(i, combat.Duel(mobs[i % len(mobs)])))
+        return store, dispatcher
+
+    start = time.perf_counter()
+    (store, _), store_bytes = _measure(bounded)
+    elapsed = time.perf_counter() - start
+    store_tasks = len(asyncio.all_tasks()) - tasks_before
+    print(
+        f"{n:,} flows in a ViewStateStore (capacity {args.capacity:,}): {len(store):,} kept, "
+        f"{store_bytes / 2**20:.1f} MiB ({store_bytes / max(1, len(store)):,.0f} B per kept flow), "
+        f"{store_tasks} tasks, {n / elapsed:,.0f} puts/s"
+    )
+    if len(store) > args.capacity:
+        print(f"Store holds {len(store):,} flows, over its capacity of {args.capacity:,}")
+        errors += 1
+    if store_tasks:
+        print(f"The store started {store_tasks} task(s)")
+        errors += 1
+
+    keys = [MESSAGE_BASE + n - 1 - i for i in range(min(len(store), 10_000))]
+    start = time.perf_counter()
+    for key in keys:
+        store.get(key)
+    get_us = (time.perf_counter() - start) / max(1, len(keys)) * 1e6
+    print(f"get {get_us:.2f} us per click")
+
+    clock.now += args.ttl
+    dropped = store.sweep()
+    print(f"Sweep after {args.ttl:.0f}s idle dropped {dropped:,} flows, {len(store):,} left")
+    if len(store):
+        print(f"{len(store):,} flows outlived the TTL")
+        errors += 1
+
+    if errors:
+        return 1
+    print("The store stayed within capacity, expired everything past its TTL and started no tasks")
+    return 0
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--flows", type=int, default=100_000)
+    parser.add_argument("--capacity", type=int, default=20_000)
+    parser.add_argument("--ttl", type=float, default=900.0)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between new flows")
+    args = parser.parse_args(argv)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
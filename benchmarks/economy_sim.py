@@ -0,0 +1,224 @@
+# economy_sim.py
+# Headless Monte Carlo economy simulator and hot-path throughput benchmark.
+#
+#   python -m benchmarks.economy_sim [-n ITERATIONS] [--workers N] [--format json|csv] [--out FILE]
+#
+# Every scenario drives the same functions the commands use (weighted_choice,
+# weighted_pick_tier, roll_items, simulate_combat, roll_drops, resolve_exploration), spread across
+# a process pool. The report covers expected coins/XP per command, item
+# inflow per command, win rate per mob, and rolls per second, so two commits
+# can be compared by diffing their output.
+from __future__ import annotations
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+CHUNK = 50_000
+
+
+def scenarios() -> List[str]:
+    from core.registry import registry
+
+    content = registry()
+    names = ["openbiome", "picktier", "explore"]
+    names += [f"openchest:{key}" for key in content.tiers]
+    names += [f"fightmob:{key}" for key in content.mobs]
+    return names
+
+
+def run_chunk(scenario: str, n: int, seed: int, player_attack: int, player_health: int) -> dict:
+    """Runs ``n`` iterations of one scenario in a worker and returns raw sums."""
+    from cogs.biomecard import weighted_choice
+    from cogs.chests import roll_items, weighted_pick_tier
+    from cogs.exploration import resolve_exploration
+    from cogs.mobs import roll_drops, simulate_combat
+    from core.registry import registry
+
+    content = registry()
+
+    random.seed(seed)
+    coins = xp = wins = 0
+    items: Counter = Counter()
+    outcomes: Counter = Counter()
+    randint = random.randint
+
+    start = time.perf_counter()
+    kind, _, key = scenario.partition(":")
+    if kind == "openbiome":
+        for _ in range(n):
+            biome = weighted_choice(content.biomes)
+            coins += biome.bonus.coins
+            xp += biome.bonus.xp
+            outcomes[biome.name] += 1
+    elif kind == "picktier":
+        allowed = list(content.tiers)
+        for _ in range(n):
+            tier = weighted_pick_tier(allowed)
+            coins += randint(*tier.coins)
+            xp += randint(*tier.xp)
+            outcomes[tier.key] += 1
+    elif kind == "openchest":
+        tier = content.tiers[key]
+        for _ in range(n):
+            coins += randint(*tier.coins)
+            xp += randint(*tier.xp)
+            for item_id, qty in roll_items(tier):
+                items[item_id] += qty
+    elif kind == "fightmob":
+        mob = content.mobs[key]
+        for _ in range(n):
+            win, _, _ = simulate_combat(mob, player_attack, player_health)
+            if win:
+                wins += 1
+                for item_id, qty in roll_drops(mob):
+                    items[item_id] += qty
+    elif kind == "explore":
+        for _ in range(n):
+            r = resolve_exploration()
+            coins += r.coins
+            xp += r.xp
+            items.update(r.loot)
+            outcomes[r.pool.biome.name] += 1
+            if r.fight is not None:
+                outcomes["fights"] += 1
+                wins += r.fight[0]
+    else:
+        raise ValueError(f"Unknown scenario {scenario!r}")
+    elapsed = time.perf_counter() - start
+    # Item IDs are counted in the loop and named only for the report
+    names = content.items
+    items = {names[i]: qty for i, qty in items.items()}
+    return {"n": n, "coins": coins, "xp": xp, "wins": wins, "items": items, "outcomes": dict(outcomes), "cpu_seconds": elapsed}
+
+
+def _merge(parts: List[dict]) -> dict:
+    total = {"n": 0, "coins": 0, "xp": 0, "wins": 0, "items": Counter(), "outcomes": Counter(), "cpu_seconds": 0.0}
+    for p in parts:
+        for key in ("n", "coins", "xp", "wins", "cpu_seconds"):
+            total[key] += p[key]
+        total["items"].update(p["items"])
+        total["outcomes"].update(p["outcomes"])
+    return total
+
+
+def summarize(scenario: str, total: dict, wall: float) -> dict:
+    n = total["n"]
+    kind = scenario.partition(":")[0]
+    row = {
+        "scenario": scenario,
+        "iterations": n,
+        "coins_per_cmd": total["coins"] / n,
+        "xp_per_cmd": total["xp"] / n,
+        "items_per_cmd": sum(total["items"].values()) / n,
+        "item_inflow": {k: v / n for k, v in sorted(total["items"].items())},
+        "rolls_per_sec_core": n / total["cpu_seconds"] if total["cpu_seconds"] else 0.0,
+        "rolls_per_sec_wall": n / wall if wall else 0.0,
+    }
+    if kind == "fightmob":
+        row["win_rate"] = total["wins"] / n
+    if kind == "explore":
+        fights = total["outcomes"].pop("fights", 0)
+        row["win_rate"] = total["wins"] / fights if fights else 0.0
+    if kind in ("openbiome", "explore"):
+        row["biome_share"] = {k: v / n for k, v in sorted(total["outcomes"].items())}
+    if kind == "picktier":
+        row["tier_share"] = {k: v / n for k, v in sorted(total["outcomes"].items())}
+    return row
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=str(Path(__file__).resolve().parents[1]),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def to_csv(report: dict) -> str:
+    # Long format: one (scenario, metric, value) row per number
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["commit", "scenario", "metric", "value"])
+    for row in report["scenarios"]:
+        for metric, value in row.items():
+            if metric == "scenario":
+                continue
+            if isinstance(value, dict):
+                for sub, v in value.items():
+                    writer.writerow([report["commit"], row["scenario"], f"{metric}.{sub}", f"{v:.6g}"])
+            else:
+                writer.writerow([report["commit"], row["scenario"], metric, f"{value:.6g}" if isinstance(value, float) else value])
+    return buf.getvalue()
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--iterations", type=int, default=1_000_000, help="iterations per scenario")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=20240101)
+    parser.add_argument("--scenario", action="append", help="limit to these scenarios (repeatable, prefix match)")
+    parser.add_argument("--player-attack", type=int, default=18)
+    parser.add_argument("--player-health", type=int, default=100)
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--out", help="write the report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    selected = scenarios()
+    if args.scenario:
+        selected = [s for s in selected if any(s.startswith(p) for p in args.scenario)]
+
+    report_rows = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for s_index, scenario in enumerate(selected):
+            chunks: List[Tuple[int, int]] = []
+            remaining, c_index = args.iterations, 0
+            while remaining > 0:
+                size = min(CHUNK, remaining)
+                chunks.append((size, args.seed + s_index * 1_000_003 + c_index))
+                remaining -= size
+                c_index += 1
+            wall_start = time.perf_counter()
+            futures = [
+                pool.submit(run_chunk, scenario, size, seed, args.player_attack, args.player_health)
+                for size, seed in chunks
+            ]
+            total = _merge([f.result() for f in futures])
+            report_rows.append(summarize(scenario, total, time.perf_counter() - wall_start))
+            print(f"{scenario:<28} {report_rows[-1]['rolls_per_sec_wall']:>14,.0f} rolls/s", file=sys.stderr)
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "workers": args.workers,
+        "iterations": args.iterations,
+        "seed": args.seed,
+        "player": {"attack": args.player_attack, "health": args.player_health},
+        "elapsed_seconds": time.perf_counter() - started,
+        "scenarios": report_rows,
+    }
+    text = json.dumps(report, indent=2) if args.format == "json" else to_csv(report)
+    if args.out:
+        Path(args.out).write_text(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
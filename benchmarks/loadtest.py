@@ -0,0 +1,480 @@
+# loadtest.py
+# Headless load test: loads cogs/* into a real Bot whose gateway and HTTP
+# layer are stubbed out, then drives synthetic prefix messages and slash
+# interactions through the normal dispatch path (get_context/invoke and
+# parse_interaction_create) at a fixed rate and concurrency.
+#
+#   python -m benchmarks.loadtest [--rate 200] [--duration 10] [--concurrency 64]
+#                                 [--slash-share 0.5] [--inventory memory|sqlite] [--reward-log]
+#                                 [--http-latency-ms 0] [--json FILE]
+#
+# Latency runs from dispatch to the moment the user's response is sent (the
+# reply, the interaction response, or the follow-up after a defer). Reports
+# throughput, p50/p99/max latency per command, event-loop lag and RSS. Exits
+# non-zero on errors or timeouts, or when --max-p99-ms is exceeded.
+from __future__ import annotations
+import argparse
+import asyncio
+import contextvars
+import gc
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import discord  # noqa: E402
+from discord.ext import commands  # noqa: E402
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context  # noqa: E402
+
+from benchmarks.bench_memory import _user, guild_payload, rss_bytes  # noqa: E402
+from core.extensions import load_cogs  # noqa: E402
+from core.inventory import InventoryService, SQLiteInventoryService  # noqa: E402
+from core.journal import RewardJournal  # noqa: E402
+from core.metrics import instrument  # noqa: E402
+from core.ratelimit import RateLimiter, install_limiter  # noqa: E402
+from core.registry import registry  # noqa: E402
+from core.responses import ResponseScheduler  # noqa: E402
+
+BOT_ID = 900_000_000_000_000_001
+APPLICATION_ID = 900_000_000_000_000_002
+# Prefix and slash commands exercised; explore has no slash version
+COMMANDS = ("openchest", "fightmob", "viewstructure", "openbiome", "explore")
+PREFIX_ONLY = {"explore"}
+# The request being dispatched; slash handlers run in a task that inherits it
+CURRENT_REQUEST: contextvars.ContextVar[int] = contextvars.ContextVar("loadtest_request", default=0)
+
+
+def _now_iso() -> str:
+    return discord.utils.utcnow().isoformat()
+
+
+def _key_arg(key: str) -> str:
+    # Handlers accept keys as title-cased words joined by underscores
+    return key.lower().replace(" ", "_")
+
+
+class Tracker:
+    """Pending requests by ID; the stubs resolve them as responses go out."""
+
+    def __init__(self):
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.acks: Dict[int, float] = {}
+        self.limited: set = set()
+
+    def open(self, rid: int) -> asyncio.Future:
+        fut = self.pending[rid] = asyncio.get_running_loop().create_future()
+        return fut
+
+    def ack(self, rid: int) -> None:
+        self.acks.setdefault(rid, time.perf_counter())
+
+    def done(self, rid: int, status: str) -> None:
+        fut = self.pending.get(rid)
+        if fut is not None and not fut.done():
+            fut.set_result((time.perf_counter(), status))
+
+
+def _status(payload: Optional[Dict[str, Any]]) -> str:
+    payload = payload or {}
+    return "embed" if payload.get("embeds") else "text"
+
+
+class StubHTTP:
+    """Stands in for ``HTTPClient.request``: answers channel sends with a message payload."""
+
+    def __init__(self, tracker: Tracker, latency: float):
+        self.tracker = tracker
+        self.latency = latency
+        self.ids = itertools.count(BOT_ID + 1)
+        self.requests = 0
+
+    def message(self, channel_id: Any, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": str(next(self.ids)), "channel_id": str(channel_id), "type": 0, "author": {**_user(BOT_ID), "bot": True},
+            "content": payload.get("content") or "", "timestamp": _now_iso(), "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+            "embeds": payload.get("embeds") or [], "pinned": False, "flags": 0,
+        }
+
+    async def request(self, route, *, files=None, form=None, **kwargs) -> Any:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if route.method == "POST" and route.path == "/channels/{channel_id}/messages":
+            payload = kwargs.get("json") or {}
+            reference = payload.get("message_reference")
+            if reference:
+                self.tracker.done(int(reference["message_id"]), _status(payload))
+            return self.message(route.channel_id, payload)
+        return None
+
+
+class StubWebhookAdapter(AsyncWebhookAdapter):
+    """Answers interaction callbacks and follow-ups without a network."""
+
+    def __init__(self, http: StubHTTP):
+        super().__init__()
+        self.http = http
+
+    async def request(self, route, session=None, *, payload=None, multipart=None, files=None, **kwargs) -> Any:
+        http = self.http
+        http.requests += 1
+        if http.latency:
+            await asyncio.sleep(http.latency)
+        payload = payload or {}
+        if route.path == "/interactions/{webhook_id}/{webhook_token}/callback":
+            rid = int(route.webhook_id)
+            http.tracker.ack(rid)
+            if payload.get("type") == discord.InteractionResponseType.channel_message.value:
+                http.tracker.done(rid, _status(payload.get("data")))
+            return None
+        if route.method == "POST" and route.path == "/webhooks/{webhook_id}/{webhook_token}":
+            http.tracker.done(int(route.webhook_token[1:]), _status(payload))
+            return http.message(0, payload)
+        if route.method == "PATCH" and route.path.endswith("/messages/{message_id}"):
+            return http.message(0, payload)
+        return None
+
+
+class TracedLimiter(RateLimiter):
+    """Notes which requests were rejected; most rejected prefix commands get no reply."""
+
+    def __init__(self, tracker: Tracker):
+        super().__init__()
+        self.tracker = tracker
+
+    def check(self, command, user_id, guild_id, now=None):
+        hit = super().check(command, user_id, guild_id, now)
+        if hit is not None:
+            self.tracker.limited.add(CURRENT_REQUEST.get())
+        return hit
+
+
+class TracedResponder(ResponseScheduler):
+    """Marks a prefix request done when its queued reply is actually sent."""
+
+    def __init__(self, tracker: Tracker):
+        super().__init__()
+        self.tracker = tracker
+
+    async def reply(self, ctx, content=None, *, embed=None, coalesce=True, view=None) -> asyncio.Future:
+        fut = await super().reply(ctx, content, embed=embed, coalesce=coalesce, view=view)
+        rid = ctx.message.id
+        status = "text" if embed is None else "embed"
+        fut.add_done_callback(lambda f: self.tracker.done(rid, status if f.exception() is None else "error"))
+        return fut
+
+
+class Harness:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.tracker = Tracker()
+        self.ids = itertools.count(1_000_000_000_000_000)
+        self.samples: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+        self.statuses: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.slash_acks: List[float] = []
+        self.loop_lag: List[float] = []
+        self.rss_peak = 0
+        self.channels: List[Tuple[int, int]] = []
+        self.bot: Optional[commands.Bot] = None
+        self._tmp: Optional[tempfile.TemporaryDirectory] = None
+
+    # -- setup ---------------------------------------------------------------
+
+    async def setup(self) -> commands.Bot:
+        args = self.args
+        intents = discord.Intents.default()
+        intents.message_content = True
+        bot = commands.Bot(command_prefix="!", help_command=None, intents=intents)
+        await bot._async_setup_hook()
+        state = bot._connection
+        state.user = discord.ClientUser(state=state, data={**_user(BOT_ID), "bot": True})
+        state.application_id = APPLICATION_ID
+
+        http = StubHTTP(self.tracker, args.http_latency_ms / 1000)
+        bot.http.request = http.request
+        async_context.set(StubWebhookAdapter(http))
+        self.http = http
+
+        if args.inventory == "sqlite":
+            path = args.db
+            self._tmp = tempfile.TemporaryDirectory()
+            if path is None:
+                path = os.path.join(self._tmp.name, "inventory.sqlite3")
+            journal = RewardJournal(os.path.join(self._tmp.name, "rewards"), args.reward_log_commit_ms / 1000) if args.reward_log else None
+            bot.inventory = SQLiteInventoryService(path, flush_interval=args.flush_ms / 1000, journal=journal)
+        else:
+            bot.inventory = InventoryService()
+        await bot.inventory.start()
+        bot.responder = TracedResponder(self.tracker)
+        instrument(bot)
+        if args.rate_limits:
+            install_limiter(bot, TracedLimiter(self.tracker))
+
+        await load_cogs(bot, strict=True)
+
+        for g in range(args.guilds):
+            gid = 10_000 + g
+            state._add_guild_from_data(guild_payload(gid, args.channels, 0, 0.0))
+            self.channels += [(gid, gid * 1_000_000 + c) for c in range(1, args.channels + 1)]
+        self.users = [20_000_000 + u for u in range(args.users)]
+        if args.inventory == "sqlite":
+            # Enough cards that openbiome never runs dry
+            for uid in self.users:
+                await bot.inventory.add_biome_card(uid, 1_000_000)
+            await bot.inventory.flush()
+
+        content = registry()
+        self.arguments = {
+            "openchest": [("tier_key", _key_arg(k)) for k in content.tiers],
+            "fightmob": [("mob_key", _key_arg(k)) for k in content.mobs],
+            "viewstructure": [("structure_key", _key_arg(k)) for k in content.structures],
+            "openbiome": [None],
+            "explore": [None],
+        }
+        self.bot = bot
+        return bot
+
+    async def close(self) -> None:
+        bot = self.bot
+        await bot.responder.close()
+        await bot.inventory.close()
+        await bot.close()
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+    # -- traffic -------------------------------------------------------------
+
+    def _message(self, rid: int, gid: int, channel_id: int, uid: int, content: str) -> discord.Message:
+        channel = self.bot.get_channel(channel_id)
+        data = {
+            "id": str(rid), "channel_id": str(channel_id), "guild_id": str(gid), "type": 0,
+            "author": _user(uid), "member": {"roles": [], "joined_at": _now_iso(), "deaf": False, "mute": False, "flags": 0},
+            "content": content, "timestamp": _now_iso(), "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False,
+        }
+        return discord.Message(state=self.bot._connection, channel=channel, data=data)
+
+    def _interaction(self, rid: int, gid: int, channel_id: int, uid: int, command: str, option) -> Dict[str, Any]:
+        options = [] if option is None else [{"name": option[0], "type": 3, "value": option[1]}]
+        return {
+            "id": str(rid), "application_id": str(APPLICATION_ID), "type": 2, "token": f"t{rid}", "version": 1,
+            "guild_id": str(gid), "channel": {"id": str(channel_id), "type": 0}, "channel_id": str(channel_id),
+            "member": {
+                "user": _user(uid), "roles": [], "joined_at": _now_iso(), "deaf": False, "mute": False,
+                "flags": 0, "permissions": "0",
+            },
+            "data": {"id": str(APPLICATION_ID + 1), "name": command, "type": 1, "options": options},
+            "locale": "en-US", "app_permissions": "0",
+        }
+
+    async def one(self, command: str, slash: bool) -> None:
+        rng = self.rng
+        gid, channel_id = rng.choice(self.channels)
+        uid = rng.choice(self.users)
+        option = rng.choice(self.arguments[command])
+        rid = next(self.ids)
+        kind = "slash" if slash else "prefix"
+        tracker = self.tracker
+        fut = tracker.open(rid)
+        CURRENT_REQUEST.set(rid)
+        start = time.perf_counter()
+        status = None
+        try:
+            if slash:
+                self.bot._connection.parse_interaction_create(self._interaction(rid, gid, channel_id, uid, command, option))
+            else:
+                content = f"!{command}" if option is None else f"!{command} {option[1]}"
+                ctx = await self.bot.get_context(self._message(rid, gid, channel_id, uid, content))
+                await self.bot.invoke(ctx)
+                if ctx.command_failed:
+                    status = "error"
+                elif rid in tracker.limited:
+                    status = "limited"
+            if status is None:
+                end, status = await asyncio.wait_for(fut, self.args.timeout)
+                if rid in tracker.limited:
+                    status = "limited"
+                else:
+                    self.samples[(command, kind)].append(end - start)
+                ack = tracker.acks.pop(rid, None)
+                if ack is not None:
+                    self.slash_acks.append(ack - start)
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except Exception:
+            status = "error"
+        finally:
+            tracker.pending.pop(rid, None)
+            tracker.limited.discard(rid)
+            self.statuses[(command, kind)][status] += 1
+
+    def _pick(self) -> Tuple[str, bool]:
+        command = self.rng.choices(self.mix_names, self.mix_weights)[0]
+        slash = command not in PREFIX_ONLY and self.rng.random() < self.args.slash_share
+        return command, slash
+
+    async def _heartbeat(self, stop: asyncio.Event) -> None:
+        interval = 0.01
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            before = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, loop.time() - before - interval))
+            if len(self.loop_lag) % 50 == 0:
+                self.rss_peak = max(self.rss_peak, rss_bytes())
+
+    async def run(self) -> float:
+        args = self.args
+        self.mix_names = list(args.mix)
+        self.mix_weights = [args.mix[name] for name in self.mix_names]
+        total = args.requests or int(args.rate * args.duration)
+        gate = asyncio.Semaphore(args.concurrency)
+        stop = asyncio.Event()
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(stop))
+        tasks = []
+
+        async def guarded(command: str, slash: bool) -> None:
+            try:
+                await self.one(command, slash)
+            finally:
+                gate.release()
+
+        start = time.perf_counter()
+        for i in range(total):
+            if args.rate:
+                # Open loop: requests go out on schedule unless concurrency is saturated
+                delay = start + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await gate.acquire()
+            tasks.append(asyncio.ensure_future(guarded(*self._pick())))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await heartbeat
+        return elapsed
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(h: Harness, elapsed: float, rss_start: int) -> Dict[str, Any]:
+    rows = []
+    for key in sorted(h.statuses):
+        lat = h.samples.get(key, [])
+        statuses = dict(h.statuses[key])
+        rows.append({
+            "command": key[0], "kind": key[1], "requests": sum(statuses.values()), "statuses": statuses,
+            "p50_ms": _pct(lat, 0.50) * 1000, "p99_ms": _pct(lat, 0.99) * 1000, "max_ms": max(lat, default=0.0) * 1000,
+        })
+    all_lat = [x for v in h.samples.values() for x in v]
+    requests = sum(r["requests"] for r in rows)
+    return {
+        "requests": requests,
+        "elapsed_seconds": elapsed,
+        "throughput_per_sec": requests / elapsed if elapsed else 0.0,
+        "p50_ms": _pct(all_lat, 0.50) * 1000,
+        "p99_ms": _pct(all_lat, 0.99) * 1000,
+        "slash_ack_p99_ms": _pct(h.slash_acks, 0.99) * 1000,
+        "loop_lag_p99_ms": _pct(h.loop_lag, 0.99) * 1000,
+        "loop_lag_max_ms": max(h.loop_lag, default=0.0) * 1000,
+        "http_requests": h.http.requests,
+        "rss_start_mb": rss_start / 2**20,
+        "rss_peak_mb": max(h.rss_peak, rss_bytes()) / 2**20,
+        "commands": rows,
+    }
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in COMMANDS:
+            raise argparse.ArgumentTypeError(f"unknown command {name!r}; choose from {', '.join(COMMANDS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def amain(args: argparse.Namespace) -> Dict[str, Any]:
+    h = Harness(args)
+    await h.setup()
+    gc.collect()
+    rss_start = rss_bytes()
+    try:
+        elapsed = await h.run()
+    finally:
+        await h.close()
+    return report(h, elapsed, rss_start)
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=200.0, help="requests per second; 0 = as fast as concurrency allows")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of traffic at --rate")
+    parser.add_argument("--requests", type=int, default=0, help="total requests (overrides --rate x --duration)")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests awaiting a response")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(",".join(COMMANDS)), help="e.g. openchest=3,fightmob=2,explore=1")
+    parser.add_argument("--slash-share", type=float, default=0.5, help="fraction sent as slash commands")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=5, help="text channels per guild")
+    parser.add_argument("--inventory", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--db", help="SQLite path for --inventory sqlite (default: a temp file)")
+    parser.add_argument("--flush-ms", type=int, default=250)
+    parser.add_argument("--reward-log", action="store_true", help="also append grants to a reward log (needs --inventory sqlite)")
+    parser.add_argument("--reward-log-commit-ms", type=int, default=50)
+    parser.add_argument("--http-latency-ms", type=float, default=0.0, help="simulated Discord API round trip")
+    parser.add_argument("--rate-limits", action="store_true", help="install the command rate limiter")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds before a request counts as timed out")
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero if overall p99 latency exceeds this")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args(argv)
+    if not args.requests and not args.rate:
+        parser.error("--rate 0 needs --requests")
+    if args.reward_log and args.inventory != "sqlite":
+        parser.error("--reward-log needs --inventory sqlite")
+
+    result = asyncio.run(amain(args))
+
+    print(f"{'command':<14} {'kind':<7} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    for r in result["commands"]:
+        statuses = " ".join(f"{k}={v}" for k, v in sorted(r["statuses"].items()))
+        print(f"{r['command']:<14} {r['kind']:<7} {r['requests']:>8} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f}  {statuses}")
+    print(
+        f"{result['requests']} requests in {result['elapsed_seconds']:.2f}s ({result['throughput_per_sec']:,.0f}/s), "
+        f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms, slash ack p99 {result['slash_ack_p99_ms']:.2f} ms"
+    )
+    print(
+        f"loop lag p99 {result['loop_lag_p99_ms']:.2f} ms, max {result['loop_lag_max_ms']:.2f} ms; "
+        f"RSS {result['rss_start_mb']:.1f} -> {result['rss_peak_mb']:.1f} MiB peak; {result['http_requests']} API calls"
+    )
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+
+    failed = sum(n for r in result["commands"] for s, n in r["statuses"].items() if s in ("error", "timeout"))
+    if failed:
+        print(f"FAIL: {failed} request(s) errored or timed out")
+        return 1
+    if args.max_p99_ms is not None and result["p99_ms"] > args.max_p99_ms:
+        print(f"FAIL: p99 {result['p99_ms']:.2f} ms exceeds {args.max_p99_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
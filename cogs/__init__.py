@@ -1 +1,8 @@
 # Cogs package initialization
+
+# Cogs loaded on first use instead of at startup (core/extensions.py): module
+# name -> every prefix command name and alias it registers. Only prefix-only
+# cogs belong here.
+LAZY_COGS = {
+    "admin": ("synccommands", "sync", "reloadcontent", "profile"),
+}
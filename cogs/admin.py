@@ -0,0 +1,78 @@
+# admin.py
+# Owner and server-admin maintenance commands
+from __future__ import annotations
+
+import io
+import time
+
+import discord
+from discord.ext import commands
+
+from core.diagnostics import SamplingProfiler
+from core.registry import CONTENT_DIR, ContentWatcher, registry
+from core.sync import SyncState, sync_commands
+
+MAX_PROFILE_SECONDS = 60
+
+
+class AdminCog(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    # Owner: force a slash command sync, ignoring the stored tree hash
+    @commands.is_owner()
+    @commands.command(name="synccommands", aliases=["sync"])
+    async def sync_commands_prefix(self, ctx: commands.Context, scope: str = "all"):
+        state = getattr(self.bot, "sync_state", None) or SyncState("data/command_sync.json")
+        dev_guilds = list(getattr(self.bot, "dev_guild_ids", []))
+        include_global = getattr(self.bot, "sync_global", True)
+        if scope == "guild":
+            if ctx.guild is None:
+                return await ctx.reply("Run this in a server to sync it.")
+            dev_guilds, include_global = [ctx.guild.id], False
+        elif scope == "global":
+            dev_guilds, include_global = [], True
+        elif scope != "all":
+            return await ctx.reply("Scope must be one of: all, global, guild")
+
+        try:
+            results = await sync_commands(self.bot.tree, state, dev_guilds, include_global=include_global, force=True)
+        except discord.HTTPException as e:
+            return await ctx.reply(f"Sync failed: {e}")
+        await ctx.reply("\n".join(str(r) for r in results) or "Nothing to sync.")
+
+    # Owner: reload content/ now instead of waiting for the watcher
+    @commands.is_owner()
+    @commands.command(name="reloadcontent")
+    async def reload_content(self, ctx: commands.Context):
+        watcher = getattr(self.bot, "content_watcher", None) or ContentWatcher(CONTENT_DIR)
+        old = registry().version
+        new = await watcher.reload()
+        if new is None:
+            return await ctx.reply(f"Reload failed; still on content {old}. See the log for details.")
+        await ctx.reply(f"Content {old} -> {new.version} ({new.load_seconds * 1000:.0f} ms)")
+
+    # Admin: sample the live process and upload collapsed stacks
+    @commands.has_permissions(manage_guild=True)
+    @commands.command(name="profile")
+    async def profile(self, ctx: commands.Context, seconds: int = 10):
+        seconds = max(1, min(MAX_PROFILE_SECONDS, seconds))
+        if SamplingProfiler.busy():
+            return await ctx.reply("A profile is already running.")
+        await ctx.reply(f"Profiling for {seconds}s...")
+        profiler = SamplingProfiler()
+        await profiler.profile(seconds)
+
+        top = profiler.top_frames(5, thread="MainThread")
+        summary = "\n".join(f"`{n / profiler.total:6.1%}` {frame}" for frame, n in top) or "No samples."
+        data = io.BytesIO(profiler.collapsed().encode())
+        filename = f"profile-{int(time.time())}.folded"
+        await ctx.reply(
+            f"{profiler.total} samples over {seconds}s. Busiest event-loop frames:\n{summary}\n"
+            "Open the file with speedscope or flamegraph.pl.",
+            file=discord.File(data, filename=filename),
+        )
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(AdminCog(bot))
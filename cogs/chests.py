@@ -2,136 +2,174 @@
 # See cogs version in previous file; this is path fix when adding from root.
 from __future__ import annotations
 import random
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import discord
 from discord.ext import commands
 
-CoinsRange = Tuple[int, int]
-XpRange = Tuple[int, int]
-
-@dataclass(frozen=True)
-class LootItem:
-    name: str
-    chance: float
-    min_qty: int = 1
-    max_qty: int = 1
-
-@dataclass(frozen=True)
-class ChestTier:
-    key: str
-    display: str
-    weights: float
-    coins: CoinsRange
-    xp: XpRange
-    items: List[LootItem]
-    special_notes: str = ""
-
-TIERS: Dict[str, ChestTier] = {}
-
-# populate tiers (same data as earlier page write)
-TIERS.update({
-    "Common": ChestTier(
-        key="Common", display="Common Chest", weights=55.0,
-        coins=(15, 45), xp=(5, 12),
-        items=[LootItem("Wood", 25, 2, 6), LootItem("Stone", 20, 2, 5), LootItem("Leather", 18, 1, 3), LootItem("Small Potion", 15, 1, 2), LootItem("Copper Ore", 12, 1, 3), LootItem("Old Map Fragment", 10, 1, 1)],
-        special_notes="Basic supplies and small boosts.",
-    ),
-    "Rare": ChestTier(
-        key="Rare", display="Rare Chest", weights=25.0,
-        coins=(40, 110), xp=(10, 25),
-        items=[LootItem("Iron Ingot", 22, 1, 3), LootItem("Healing Potion", 18, 1, 2), LootItem("Enchanted Leaf", 14, 1, 2), LootItem("Silver Ore", 14, 1, 3), LootItem("Traveler's Charm", 12, 1, 1), LootItem("Rare Map Fragment", 10, 1, 1)],
-        special_notes="Better materials and utility items.",
-    ),
-    "Epic": ChestTier(
-        key="Epic", display="Epic Chest", weights=12.0,
-        coins=(120, 260), xp=(25, 60),
-        items=[LootItem("Gold Ingot", 22, 1, 3), LootItem("Elixir of Swiftness", 18, 1, 2), LootItem("Jungle Relic", 15, 1, 1), LootItem("Rune Stone", 15, 1, 2), LootItem("Obsidian Shard", 12, 1, 2), LootItem("Epic Map Fragment", 10, 1, 1)],
-        special_notes="Valuable crafting and rare relics.",
-    ),
-    "Mythic": ChestTier(
-        key="Mythic", display="Mythic Chest", weights=6.0,
-        coins=(260, 520), xp=(60, 120),
-        items=[LootItem("Diamond", 20, 1, 2), LootItem("Phoenix Feather", 18, 1, 1), LootItem("Magma Core", 15, 1, 1), LootItem("Void-Touched Gem", 12, 1, 1), LootItem("Ancient Rune", 12, 1, 2), LootItem("Mythic Map Fragment", 10, 1, 1)],
-        special_notes="Top-tier mats and powerful curios.",
-    ),
-    "Legendary Void": ChestTier(
-        key="Legendary Void", display="Legendary Void Chest", weights=2.0,
-        coins=(600, 1200), xp=(120, 240),
-        items=[LootItem("Void Crown", 12, 1, 1), LootItem("Entropy Crystal", 16, 1, 1), LootItem("Phantom Silk", 18, 1, 2), LootItem("Prismatic Core", 14, 1, 1), LootItem("Legendary Rune", 20, 1, 1), LootItem("Legendary Map Fragment", 10, 1, 1)],
-        special_notes="Exclusive endgame items and high rewards.",
-    ),
-})
+from core.content import content_index
+from core.inventory import InventoryService
+from core.journal import Source
+from core.models import ChestTier
+from core.registry import registry
+from core.responses import ResponseScheduler
+from core.rewards import REWARD_TABLES
+from core.sampling import randint_sum
+from core.views import ViewStateStore, claim, frozen, reply_with_view
 
 
 def weighted_pick_tier(allowed: List[str]) -> ChestTier:
-    pool = [TIERS[k] for k in allowed]
-    total = sum(t.weights for t in pool)
-    r = random.uniform(0, total)
-    upto = 0.0
-    for t in pool:
-        if upto + t.weights >= r:
-            return t
-        upto += t.weights
-    return pool[-1]
-
-
-def roll_items(tier: ChestTier) -> List[Tuple[str, int]]:
-    results: List[Tuple[str, int]] = []
-    count = random.randint(1, 3)
-    table = tier.items
-    total = sum(i.chance for i in table)
-    for _ in range(count):
-        r = random.uniform(0, total)
-        upto = 0.0
-        chosen = table[-1]
-        for it in table:
-            if upto + it.chance >= r:
-                chosen = it
-                break
-            upto += it.chance
-        qty = random.randint(chosen.min_qty, chosen.max_qty)
-        results.append((chosen.name, qty))
+    # Samplers for every biome's tier list are compiled with the registry
+    return registry().tier_sampler(tuple(allowed)).sample()
+
+
+def loot_sampler(tier: ChestTier):
+    return registry().loot_sampler(tier)
+
+
+def roll_items(tier: ChestTier) -> List[Tuple[int, int]]:
+    # (item ID, qty) pairs; names are looked up when the reply is rendered
+    sampler = loot_sampler(tier)
+    results: List[Tuple[int, int]] = []
+    for _ in range(random.randint(1, 3)):
+        chosen = sampler.sample()
+        results.append((chosen.item, random.randint(chosen.min_qty, chosen.max_qty)))
     return results
 
 
+def open_chest(tier: ChestTier, biome=None, structure=None) -> Tuple[int, int, List[Tuple[int, int]]]:
+    # Coins, XP and items with biome/structure bonuses folded into a cached table
+    return REWARD_TABLES.chest(content_index(), tier, biome, structure).roll()
+
+
+def roll_items_bulk(tier: ChestTier, chests: int) -> Dict[int, int]:
+    # Same odds as calling roll_items `chests` times, but counted per item ID
+    sampler = loot_sampler(tier)
+    totals: Dict[int, int] = {}
+    for row, hits in zip(sampler.items, sampler.sample_counts(randint_sum(1, 3, chests))):
+        if hits:
+            totals[row.item] = totals.get(row.item, 0) + randint_sum(row.min_qty, row.max_qty, hits)
+    return totals
+
+
+def open_chests_bulk(tier: ChestTier, count: int) -> Tuple[int, int, Dict[int, int]]:
+    return randint_sum(*tier.coins, count), randint_sum(*tier.xp, count), roll_items_bulk(tier, count)
+
+
+MAX_BULK_OPEN = 5000
+
+
+class ChestRun:
+    """View state behind a single-chest reply's "Open next chest" button."""
+
+    __slots__ = ("user_id", "tier", "opened", "coins", "xp")
+
+    def __init__(self, user_id: int, tier: str):
+        self.user_id = user_id
+        self.tier = tier  # tier key; content may be reloaded while the message is up
+        self.opened = 0
+        self.coins = 0
+        self.xp = 0
+
+
+class ChestButtons(discord.ui.View):
+    # One registered instance handles every message's clicks; the copies sent
+    # with messages are frozen and only render the button
+    def __init__(self, cog: Optional["ChestsCog"] = None):
+        super().__init__(timeout=None)
+        self.cog = cog
+
+    @discord.ui.button(label="Open next chest", style=discord.ButtonStyle.primary, custom_id="chest:next")
+    async def next_chest(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog._next(interaction)
+
+
 class ChestsCog(commands.Cog):
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, inventory: InventoryService | None = None):
         self.bot = bot
-
-    @commands.command(name="openchest")
-    async def open_chest_prefix(self, ctx: commands.Context, tier_key: str):
-        tier_key = tier_key.title().replace("_", " ")
-        if tier_key not in TIERS:
-            return await ctx.reply("Unknown chest tier. Try: Common, Rare, Epic, Mythic, Legendary Void")
-        tier = TIERS[tier_key]
-        coins = random.randint(*tier.coins)
-        xp = random.randint(*tier.xp)
-        items = roll_items(tier)
-        e = discord.Embed(title=f"Opened {tier.display}", color=0xf1c40f)
-        e.add_field(name="Coins", value=str(coins))
-        e.add_field(name="XP", value=str(xp))
-        e.add_field(name="Items", value="\n".join(f"{n} x{q}" for n, q in items), inline=False)
-        e.set_footer(text=tier.special_notes)
-        await ctx.reply(embed=e)
-
-    @discord.app_commands.command(name="openchest", description="Open a chest by tier key")
-    async def open_chest_slash(self, interaction: discord.Interaction, tier_key: str):
-        tier_key = tier_key.title().replace("_", " ")
-        if tier_key not in TIERS:
-            return await interaction.response.send_message("Unknown chest tier. Try: Common, Rare, Epic, Mythic, Legendary Void", ephemeral=True)
-        tier = TIERS[tier_key]
-        coins = random.randint(*tier.coins)
-        xp = random.randint(*tier.xp)
-        items = roll_items(tier)
-        e = discord.Embed(title=f"Opened {tier.display}", color=0xf1c40f)
+        self.inventory = inventory or InventoryService()
+        self.responder = getattr(bot, "responder", None) or ResponseScheduler()
+        views = getattr(bot, "view_states", None)
+        self.views = views if views is not None else ViewStateStore()
+        self._buttons: Optional[ChestButtons] = None
+        self._layout: Optional[ChestButtons] = None
+
+    async def cog_load(self):
+        # Views need a running loop, so they are built here rather than in __init__
+        self._buttons = ChestButtons(self)
+        self.bot.add_view(self._buttons)
+        self._layout = frozen(ChestButtons())
+
+    async def cog_unload(self):
+        if self._buttons is not None:
+            self._buttons.stop()
+
+    # Helper: roll, store and render one or many chests of a tier
+    async def _open(self, user_id: int, tier: ChestTier, count: int, run: Optional[ChestRun] = None) -> discord.Embed:
+        if count == 1:
+            coins = random.randint(*tier.coins)
+            xp = random.randint(*tier.xp)
+            items = roll_items(tier)
+            title = f"Opened {tier.display}"
+        else:
+            coins, xp, totals = open_chests_bulk(tier, count)
+            items = sorted(totals.items(), key=lambda kv: -kv[1])
+            title = f"Opened {count}x {tier.display}"
+        await self.inventory.grant(user_id, coins=coins, xp=xp, items=items, source=Source.CHEST)
+        names = registry().items
+        e = discord.Embed(title=title, color=0xf1c40f)
         e.add_field(name="Coins", value=str(coins))
         e.add_field(name="XP", value=str(xp))
-        e.add_field(name="Items", value="\n".join(f"{n} x{q}" for n, q in items), inline=False)
+        e.add_field(name="Items", value="\n".join(f"{names[i]} x{q}" for i, q in items), inline=False)
+        if run is not None:
+            run.opened += 1
+            run.coins += coins
+            run.xp += xp
+            if run.opened > 1:
+                e.add_field(name="This run", value=f"{run.opened} chests, {run.coins} coins, {run.xp} XP", inline=False)
         e.set_footer(text=tier.special_notes)
-        await interaction.response.send_message(embed=e)
+        return e
+
+    async def _next(self, interaction: discord.Interaction):
+        run = await claim(interaction, self.views, ChestRun, "openchest")
+        if run is None:
+            return
+        tier = registry().tiers.get(run.tier)
+        if tier is None:
+            # Removed from the content since the message was sent
+            return await interaction.response.edit_message(view=None)
+        await interaction.response.edit_message(embed=await self._open(run.user_id, tier, 1, run))
+
+    @commands.command(name="openchest")
+    async def open_chest_prefix(self, ctx: commands.Context, tier_key: str, count: int = 1):
+        reg = registry()
+        key = reg.tier_keys.resolve(tier_key)
+        if key is None:
+            return await self.responder.reply(ctx, reg.tier_keys.unknown("chest tier", tier_key))
+        count = max(1, min(MAX_BULK_OPEN, count))
+        if count == 1:
+            run = ChestRun(ctx.author.id, key)
+            embed = await self._open(ctx.author.id, reg.tiers[key], 1, run)
+            return await reply_with_view(self.responder, ctx, self.views, run, embed=embed, view=self._layout)
+        await self.responder.reply(ctx, embed=await self._open(ctx.author.id, reg.tiers[key], count))
+
+    @discord.app_commands.command(name="openchest", description="Open one or more chests by tier key")
+    async def open_chest_slash(self, interaction: discord.Interaction, tier_key: str, count: int = 1):
+        reg = registry()
+        key = reg.tier_keys.resolve(tier_key)
+        if key is None:
+            return await interaction.response.send_message(reg.tier_keys.unknown("chest tier", tier_key), ephemeral=True)
+        count = max(1, min(MAX_BULK_OPEN, count))
+        if count == 1:
+            run = ChestRun(interaction.user.id, key)
+            self.views.put(interaction.id, run)
+            return await self.responder.respond(interaction, self._open(interaction.user.id, reg.tiers[key], 1, run), view=self._layout)
+        await self.responder.respond(interaction, self._open(interaction.user.id, reg.tiers[key], count), slow=True)
+
+    @open_chest_slash.autocomplete("tier_key")
+    async def tier_key_autocomplete(self, interaction: discord.Interaction, current: str):
+        return registry().tier_keys.choices(current)
 
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(ChestsCog(bot))
+    await bot.add_cog(ChestsCog(bot, getattr(bot, "inventory", None)))
@@ -0,0 +1,201 @@
+# expeditions.py
+# Idle expeditions: send a party into a biome for a while and get every
+# encounter of the trip back at once when it returns. Timing and persistence
+# live in core/expeditions.py; this cog resolves the finished batches.
+from __future__ import annotations
+import asyncio
+import logging
+import random
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+import discord
+from discord.ext import commands
+
+from core.expeditions import Expedition, ExpeditionScheduler, ExpeditionStore
+from core.inventory import Grant, InventoryService
+from core.journal import Source
+from core.registry import ContentRegistry, registry
+from core.responses import ResponseScheduler
+from core.rewards import combine
+from .chests import open_chest
+from .mobs import roll_drops, simulate_combat_many
+
+log = logging.getLogger(__name__)
+
+MIN_MINUTES = 10
+MAX_MINUTES = 8 * 60
+DEFAULT_MINUTES = 60
+# One encounter per this many minutes away
+ENCOUNTER_MINUTES = 10
+CHEST_CHANCE = 0.5
+# Expeditions rolled between yields to the event loop; at 0.2-0.4 ms per
+# 8-hour trip a chunk blocks the loop for 10-20 ms
+RESOLVE_CHUNK = 50
+
+
+class ExpeditionReport(NamedTuple):
+    expedition: Expedition
+    biome: str
+    encounters: int
+    fights: int
+    wins: int
+    structures: Counter  # structure name -> visits
+    chests: Counter  # tier display -> chests opened
+    coins: int
+    xp: int
+    loot: Counter  # item ID -> qty
+
+
+def encounter_count(expedition: Expedition) -> int:
+    return max(1, int((expedition.due - expedition.started) // (ENCOUNTER_MINUTES * 60)))
+
+
+def resolve_expeditions(batch: List[Expedition], reg: Optional[ContentRegistry] = None, rng: random.Random = random) -> List[ExpeditionReport]:
+    """Rolls every encounter of every expedition in ``batch``; all fights go through one combat batch."""
+    reg = reg or registry()
+    index = reg.index
+    fights = []  # (expedition slot, mob, drop bonus)
+    rolled = []
+    loots: List[Counter] = []
+    for slot, expedition in enumerate(batch):
+        # A biome removed from the content while the party was out: it wandered somewhere else
+        pool = index.pool(expedition.biome) or index.roll_biome(rng)
+        structures: Counter = Counter()
+        chests: Counter = Counter()
+        loot: Counter = Counter()
+        coins = xp = 0
+        n = encounter_count(expedition)
+        for _ in range(n):
+            structure = pool.roll_structure(rng)
+            if structure is not None:
+                structures[structure.name] += 1
+            if pool.tiers and rng.random() < CHEST_CHANCE:
+                tier = pool.roll_tier(rng)
+                c, x, items = open_chest(tier, pool.biome, structure)
+                chests[tier.display] += 1
+                coins += c
+                xp += x
+                for item_id, qty in items:
+                    loot[item_id] += qty
+            mob = pool.roll_mob(rng)
+            if mob is not None:
+                fights.append((slot, mob, combine(pool.biome, structure).drop_bonus))
+        rolled.append((expedition, pool.biome.name, n, structures, chests, coins, xp))
+        loots.append(loot)
+
+    fought = [0] * len(batch)
+    won = [0] * len(batch)
+    if fights:
+        wins, _, _ = simulate_combat_many([mob for _, mob, _ in fights])
+        for (slot, mob, drop_bonus), win in zip(fights, wins):
+            fought[slot] += 1
+            if win:
+                won[slot] += 1
+                for item_id, qty in roll_drops(mob, drop_bonus):
+                    loots[slot][item_id] += qty
+    return [
+        ExpeditionReport(expedition, biome, n, fought[i], won[i], structures, chests, coins, xp, loots[i])
+        for i, (expedition, biome, n, structures, chests, coins, xp) in enumerate(rolled)
+    ]
+
+
+class ExpeditionsCog(commands.Cog):
+    def __init__(self, bot: commands.Bot, inventory: InventoryService | None = None, scheduler: ExpeditionScheduler | None = None):
+        self.bot = bot
+        self.inventory = inventory or InventoryService()
+        self.responder = getattr(bot, "responder", None) or ResponseScheduler()
+        self.scheduler = scheduler if scheduler is not None else ExpeditionScheduler(ExpeditionStore(":memory:"))
+        # Granted but not yet known to be on disk; a retried batch only flushes these again
+        self._granted: Dict[Expedition, ExpeditionReport] = {}
+
+    async def cog_load(self):
+        await self.scheduler.start(self._finish)
+
+    async def cog_unload(self):
+        await self.scheduler.close()
+
+    # Resolver: one call per wheel tick with everything that came back
+    async def _finish(self, batch: List[Expedition]) -> None:
+        reg = registry()
+        fresh = [e for e in batch if e not in self._granted]
+        reports: List[ExpeditionReport] = []
+        for i in range(0, len(fresh), RESOLVE_CHUNK):
+            if i:
+                await asyncio.sleep(0)
+            reports += resolve_expeditions(fresh[i:i + RESOLVE_CHUNK], reg)
+        # One call for the whole tick, with no await before it is recorded in
+        # _granted, so a retried batch never grants anything twice
+        await self.inventory.grant_many([
+            Grant(r.expedition.user_id, r.coins, r.xp, list(r.loot.items()), kills=r.wins) for r in reports
+        ], Source.EXPEDITION)
+        for report in reports:
+            self._granted[report.expedition] = report
+        # The scheduler deletes the batch's rows once this returns, so the
+        # rewards must be on disk first; if the flush raises, the batch comes
+        # back next tick and only the flush is retried
+        await self.inventory.flush()
+        reports = [self._granted.pop(e) for e in batch]
+        for report in reports:
+            user_id = report.expedition.user_id
+            try:
+                channel = self.bot.get_partial_messageable(report.expedition.channel_id)
+                await self.responder.notify(channel, f"<@{user_id}>", embed=self._report_embed(report, reg))
+            except Exception:
+                # Rewarded already; a missing report must not get the batch retried
+                log.exception("Could not post the expedition report for %d", user_id)
+
+    def _report_embed(self, report: ExpeditionReport, reg: ContentRegistry) -> discord.Embed:
+        e = discord.Embed(title=f"Expedition returned from {report.biome}", color=0x3498db)
+        e.description = f"<@{report.expedition.user_id}>'s party is back after {report.encounters} encounter(s)."
+        e.add_field(name="Fights", value=f"{report.wins} won of {report.fights}")
+        e.add_field(name="Rewards", value=f"+{report.coins} coins, +{report.xp} XP")
+        if report.structures:
+            e.add_field(name="Structures", value=", ".join(f"{n} x{c}" for n, c in report.structures.most_common(5)), inline=False)
+        if report.chests:
+            e.add_field(name="Chests", value=", ".join(f"{n} x{c}" for n, c in report.chests.most_common()), inline=False)
+        if report.loot:
+            names = reg.items
+            e.add_field(name="Loot", value="\n".join(f"{names[i]} x{q}" for i, q in report.loot.most_common(15)), inline=False)
+        return e
+
+    def _status(self, user_id: int) -> str:
+        expedition = self.scheduler.get(user_id)
+        if expedition is None:
+            return "You have no party out. Start one with `expedition [minutes] <biome>`."
+        return f"Your party is exploring {expedition.biome} and returns <t:{int(expedition.due)}:R>."
+
+    async def _start(self, user_id: int, channel_id: int, biome: str, minutes: int) -> str:
+        reg = registry()
+        name = reg.biome_keys.resolve(biome)
+        if name is None:
+            return reg.biome_keys.unknown("biome", biome)
+        minutes = max(MIN_MINUTES, min(MAX_MINUTES, minutes))
+        expedition = await self.scheduler.add(user_id, name, channel_id, minutes * 60)
+        if expedition is None:
+            return self._status(user_id)
+        return (
+            f"Your party set out for {name}. It returns <t:{int(expedition.due)}:R> "
+            f"with {encounter_count(expedition)} encounter(s)."
+        )
+
+    @commands.command(name="expedition", aliases=["expeditions"])
+    async def expedition_prefix(self, ctx: commands.Context, minutes: Optional[int] = None, *, biome: Optional[str] = None):
+        # Minutes first so the biome can be several words; "expedition deep dark" skips the minutes
+        if biome is None:
+            return await self.responder.reply(ctx, self._status(ctx.author.id))
+        await self.responder.reply(ctx, await self._start(ctx.author.id, ctx.channel.id, biome, DEFAULT_MINUTES if minutes is None else minutes))
+
+    @discord.app_commands.command(name="expedition", description="Send a party into a biome and get the loot when it returns")
+    async def expedition_slash(self, interaction: discord.Interaction, biome: Optional[str] = None, minutes: int = DEFAULT_MINUTES):
+        if biome is None:
+            return await interaction.response.send_message(self._status(interaction.user.id), ephemeral=True)
+        await self.responder.respond(interaction, self._start(interaction.user.id, interaction.channel_id, biome, minutes))
+
+    @expedition_slash.autocomplete("biome")
+    async def biome_autocomplete(self, interaction: discord.Interaction, current: str):
+        return registry().biome_keys.choices(current)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(ExpeditionsCog(bot, getattr(bot, "inventory", None), getattr(bot, "expeditions", None)))
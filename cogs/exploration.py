@@ -1,31 +1,94 @@
 import discord
 import random
+from collections import Counter
 from discord.ext import commands
 
-from .mobs import MOB_POOLS
-from .chests import CHEST_POOL
-from .structures import STRUCTURE_POOLS
+from core.content import content_index
+from core.inventory import InventoryService
+from core.journal import Source
+from core.registry import registry
+from core.responses import ResponseScheduler
+from core.rewards import combine
+from .chests import open_chest
+from .mobs import roll_drops, simulate_combat
+
+class ExplorationResult:
+    __slots__ = ("pool", "structure", "mob", "fight", "chests", "drop_bonus", "coins", "xp", "loot")
+
+    def __init__(self, pool, structure, mob, fight, chests, drop_bonus, coins, xp, loot):
+        self.pool = pool
+        self.structure = structure
+        self.mob = mob
+        self.fight = fight
+        self.chests = chests
+        self.drop_bonus = drop_bonus
+        self.coins = coins
+        self.xp = xp
+        self.loot = loot
+
+
+def resolve_exploration() -> ExplorationResult:
+    # Pure game logic, shared by the command and the offline simulator
+    pool = content_index().roll_biome()
+    structure = pool.roll_structure()
+    mob = pool.roll_mob()
+    chests = [pool.roll_tier() for _ in range(random.randint(1, 3))] if pool.tiers else []
+    drop_bonus = combine(pool.biome, structure).drop_bonus
+
+    coins = xp = 0
+    loot = Counter()
+    for tier in chests:
+        c, x, items = open_chest(tier, pool.biome, structure)
+        coins += c
+        xp += x
+        for item_id, qty in items:
+            loot[item_id] += qty
+    fight = simulate_combat(mob) if mob is not None else None
+    if fight is not None and fight[0]:
+        for item_id, qty in roll_drops(mob, drop_bonus):
+            loot[item_id] += qty
+    return ExplorationResult(pool, structure, mob, fight, chests, drop_bonus, coins, xp, loot)
 
 class Exploration(commands.Cog):
     """Handles exploration logic"""
 
-    def __init__(self, bot):
+    def __init__(self, bot, inventory: InventoryService = None):
         self.bot = bot
+        self.inventory = inventory or InventoryService()
+        self.responder = getattr(bot, "responder", None) or ResponseScheduler()
 
     @commands.command()
     async def explore(self, ctx):
-        biome = random.choice(list(STRUCTURE_POOLS.keys()))
-        structure = random.choice(STRUCTURE_POOLS[biome])
-        mob = random.choice(MOB_POOLS[biome])
-        chests = random.choices(CHEST_POOL, k=random.randint(1, 3))
+        r = resolve_exploration()
+        pool, structure, mob, fight, chests = r.pool, r.structure, r.mob, r.fight, r.chests
+        coins, xp, loot, drop_bonus = r.coins, r.xp, r.loot, r.drop_bonus
+        await self.inventory.grant(
+            ctx.author.id, coins=coins, xp=xp, items=list(loot.items()), source=Source.EXPLORE,
+            kills=1 if fight is not None and fight[0] else 0,
+        )
+
         embed = discord.Embed(title="Exploration Results")
-        embed.add_field(name="Biome", value=biome)
-        embed.add_field(name="Structure", value=f"{structure['name']} ({structure['effect']})")
-        embed.add_field(name="Mob", value=f"{mob['name']} (HP {mob['hp']}, ATK {mob['atk']})")
-        chest_summary = "\n".join(f"{c['tier']} Chest" for c in chests)
+        embed.add_field(name="Biome", value=f"{pool.biome.name} ({pool.biome.rarity})")
+        if structure is not None:
+            embed.add_field(name="Structure", value=f"{structure.name} (+{structure.xp_bonus} XP, +{structure.coins_bonus} coins, +{structure.drop_bonus_percent}% drops)")
+        else:
+            embed.add_field(name="Structure", value="None found")
+        if mob is not None:
+            win, p_hp, m_hp = fight
+            outcome = f"Victory, {p_hp} HP left" if win else f"Defeat, mob at {m_hp} HP"
+            embed.add_field(name="Mob", value=f"{mob.name} (HP {mob.health}, ATK {mob.attack}): {outcome}")
+        else:
+            embed.add_field(name="Mob", value="None found")
+        chest_summary = "\n".join(c.display for c in chests) or "None found"
         embed.add_field(name="Chests", value=chest_summary)
-        embed.set_footer(text="Fight the mob and open your chests!")
-        await ctx.send(embed=embed)
+        embed.add_field(name="Rewards", value=f"+{coins} coins, +{xp} XP", inline=False)
+        if loot:
+            names = registry().items
+            embed.add_field(name="Loot", value="\n".join(f"{names[i]} x{q}" for i, q in loot.most_common()), inline=False)
+        embed.set_footer(text=f"+{drop_bonus}% drop bonus from biome and structure")
+        await self.responder.reply(ctx, embed=embed)
 
 async def setup(bot):
-    await bot.add_cog(Exploration(bot))
+    # Build the join index at load time so dangling references surface in the startup log
+    content_index()
+    await bot.add_cog(Exploration(bot, getattr(bot, "inventory", None)))
@@ -0,0 +1,62 @@
+# leaderboard.py
+# Leaderboards for coins, XP, biome cards opened and mobs defeated, for the
+# current server or across all players. The boards are kept up to date by the
+# inventory (core/leaderboard.py), so a lookup never sorts anything.
+from __future__ import annotations
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core.leaderboard import BOARDS, Leaderboards
+from core.responses import ResponseScheduler
+
+PAGE_SIZE = 10
+# What players may type for each board
+ALIASES = {
+    "coins": "coins", "coin": "coins", "money": "coins",
+    "xp": "xp", "exp": "xp", "experience": "xp",
+    "cards": "cards", "card": "cards", "biomes": "cards", "biomecards": "cards",
+    "mobs": "kills", "mob": "kills", "kills": "kills", "fights": "kills",
+}
+SCOPES = {"server": False, "guild": False, "global": True, "all": True}
+
+
+class LeaderboardCog(commands.Cog):
+    def __init__(self, bot: commands.Bot, boards: Leaderboards | None = None):
+        self.bot = bot
+        self.boards = boards if boards is not None else Leaderboards()
+        self.responder = getattr(bot, "responder", None) or ResponseScheduler()
+
+    def _embed(self, metric: str, user_id: int, guild_id: Optional[int]) -> discord.Embed:
+        scope = "This Server" if guild_id is not None else "Global"
+        e = discord.Embed(title=f"Leaderboard: {BOARDS[metric]} ({scope})", color=0xf1c40f)
+        top = self.boards.top(metric, guild_id, PAGE_SIZE)
+        e.description = "\n".join(f"`#{i}` <@{u}> - {score:,}" for i, (u, score) in enumerate(top, 1)) or "Nobody is on this board yet."
+        rank, score, total = self.boards.rank(metric, user_id, guild_id)
+        e.add_field(name="Your rank", value=f"#{rank:,} of {total:,} ({score:,})" if rank is not None else "Not ranked yet")
+        return e
+
+    @commands.command(name="leaderboard", aliases=["lb", "top"])
+    async def leaderboard_prefix(self, ctx: commands.Context, metric: str = "coins", scope: Optional[str] = None):
+        board = ALIASES.get(metric.casefold())
+        if board is None:
+            return await self.responder.reply(ctx, f"Unknown leaderboard `{metric}`. Try coins, xp, cards or mobs.")
+        if scope is not None and scope.casefold() not in SCOPES:
+            return await self.responder.reply(ctx, f"Unknown scope `{scope}`. Try server or global.")
+        is_global = ctx.guild is None or (scope is not None and SCOPES[scope.casefold()])
+        await self.responder.reply(ctx, embed=self._embed(board, ctx.author.id, None if is_global else ctx.guild.id))
+
+    @app_commands.command(name="leaderboard", description="Top players by coins, XP, cards opened or mobs defeated")
+    @app_commands.choices(
+        metric=[app_commands.Choice(name=label, value=key) for key, label in BOARDS.items()],
+        scope=[app_commands.Choice(name="This server", value="server"), app_commands.Choice(name="Global", value="global")],
+    )
+    async def leaderboard_slash(self, interaction: discord.Interaction, metric: str = "coins", scope: str = "server"):
+        guild_id = interaction.guild_id if scope == "server" else None
+        await self.responder.respond(interaction, self._embed(metric, interaction.user.id, guild_id))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(LeaderboardCog(bot, getattr(bot, "leaderboards", None)))
@@ -0,0 +1,138 @@
+# market.py
+# Player item market: limit orders to buy and sell items for coins. Matching,
+# escrow and settlement live in core/market.py; this cog parses the
+# commands and renders the results.
+from __future__ import annotations
+from typing import List, Optional
+
+import discord
+from discord.ext import commands
+
+from core.inventory import InventoryService
+from core.market import Exchange, Fill, MarketError, Order, Side
+from core.registry import registry
+from core.responses import ResponseScheduler
+
+MAX_QTY = 10_000
+MAX_PRICE = 1_000_000
+DEPTH_LEVELS = 5
+
+
+class MarketCog(commands.Cog):
+    def __init__(self, bot: commands.Bot, inventory: InventoryService | None = None, exchange: Exchange | None = None):
+        self.bot = bot
+        self.inventory = inventory or InventoryService()
+        self.responder = getattr(bot, "responder", None) or ResponseScheduler()
+        self.exchange = exchange if exchange is not None else Exchange(self.inventory)
+
+    async def cog_load(self):
+        await self.exchange.start()
+
+    async def cog_unload(self):
+        await self.exchange.close()
+
+    async def _trade(self, user_id: int, side: Side, item: str, qty: int, price: int) -> str:
+        reg = registry()
+        name = reg.item_keys.resolve(item)
+        if name is None:
+            return reg.item_keys.unknown("item", item)
+        if not 1 <= qty <= MAX_QTY or not 1 <= price <= MAX_PRICE:
+            return f"Quantity must be 1-{MAX_QTY:,} and price 1-{MAX_PRICE:,} coins."
+        try:
+            order, fills = await self.exchange.place(user_id, reg.items.id(name), side, price, qty)
+        except MarketError as e:
+            return str(e)
+        return _describe(order, fills, name)
+
+    def _book_embed(self, item: str) -> discord.Embed:
+        reg = registry()
+        name = reg.item_keys.resolve(item)
+        e = discord.Embed(title=f"Market: {name}", color=0xe67e22)
+        book = self.exchange.market.books.get(reg.items.id(name))
+        for side, label in ((Side.SELL, "Selling"), (Side.BUY, "Buying")):
+            levels = book.depth(side, DEPTH_LEVELS) if book is not None else []
+            e.add_field(name=label, value="\n".join(f"{q:,} @ {p:,}" for p, q in levels) or "Nothing")
+        return e
+
+    def _orders_embed(self, user_id: int) -> discord.Embed:
+        names = registry().items
+        orders = self.exchange.open_orders(user_id)
+        e = discord.Embed(title="Your open orders", color=0xe67e22)
+        e.description = "\n".join(
+            f"`#{o.id}` {o.side.name.lower()} {o.qty:,} {names[o.item_id]} @ {o.price:,}" for o in orders
+        ) or "You have no open orders. Place one with `buy` or `sell`."
+        e.set_footer(text=f"{len(orders)}/{self.exchange.max_open} orders; cancel with `cancelorder <id>`")
+        return e
+
+    async def _orders(self, user_id: int, item: Optional[str]):
+        if item is None:
+            return self._orders_embed(user_id)
+        reg = registry()
+        if reg.item_keys.resolve(item) is None:
+            return reg.item_keys.unknown("item", item)
+        return self._book_embed(item)
+
+    async def _cancel(self, user_id: int, order_id: int) -> str:
+        order = await self.exchange.cancel(user_id, order_id)
+        if order is None:
+            return f"You have no open order #{order_id}."
+        refund = f"{order.price * order.qty:,} coins" if order.side == Side.BUY else f"{order.qty:,} {registry().items[order.item_id]}"
+        return f"Cancelled order #{order.id}; {refund} returned."
+
+    @commands.command(name="buy")
+    async def buy_prefix(self, ctx: commands.Context, qty: int, price: int, *, item: str):
+        await self.responder.reply(ctx, await self._trade(ctx.author.id, Side.BUY, item, qty, price))
+
+    @commands.command(name="sell")
+    async def sell_prefix(self, ctx: commands.Context, qty: int, price: int, *, item: str):
+        await self.responder.reply(ctx, await self._trade(ctx.author.id, Side.SELL, item, qty, price))
+
+    @commands.command(name="orders", aliases=["market"])
+    async def orders_prefix(self, ctx: commands.Context, *, item: Optional[str] = None):
+        result = await self._orders(ctx.author.id, item)
+        if isinstance(result, str):
+            return await self.responder.reply(ctx, result)
+        await self.responder.reply(ctx, embed=result)
+
+    @commands.command(name="cancelorder")
+    async def cancel_prefix(self, ctx: commands.Context, order_id: int):
+        await self.responder.reply(ctx, await self._cancel(ctx.author.id, order_id))
+
+    @discord.app_commands.command(name="buy", description="Place an order to buy an item at up to a price each")
+    async def buy_slash(self, interaction: discord.Interaction, item: str, quantity: int, price: int):
+        await self.responder.respond(interaction, self._trade(interaction.user.id, Side.BUY, item, quantity, price))
+
+    @discord.app_commands.command(name="sell", description="Place an order to sell an item at no less than a price each")
+    async def sell_slash(self, interaction: discord.Interaction, item: str, quantity: int, price: int):
+        await self.responder.respond(interaction, self._trade(interaction.user.id, Side.SELL, item, quantity, price))
+
+    @discord.app_commands.command(name="orders", description="Your open market orders, or the order book for an item")
+    async def orders_slash(self, interaction: discord.Interaction, item: Optional[str] = None):
+        await self.responder.respond(interaction, self._orders(interaction.user.id, item))
+
+    @discord.app_commands.command(name="cancelorder", description="Cancel one of your market orders")
+    async def cancel_slash(self, interaction: discord.Interaction, order_id: int):
+        await self.responder.respond(interaction, self._cancel(interaction.user.id, order_id))
+
+    @buy_slash.autocomplete("item")
+    @sell_slash.autocomplete("item")
+    @orders_slash.autocomplete("item")
+    async def item_autocomplete(self, interaction: discord.Interaction, current: str):
+        return registry().item_keys.choices(current)
+
+
+def _describe(order: Order, fills: List[Fill], name: str) -> str:
+    verb = "Bought" if order.side == Side.BUY else "Sold"
+    parts = []
+    if fills:
+        filled = sum(f.qty for f in fills)
+        total = sum(f.price * f.qty for f in fills)
+        parts.append(f"{verb} {filled:,} {name} for {total:,} coins.")
+    if order.qty:
+        action = "buy" if order.side == Side.BUY else "sell"
+        parts.append(f"Order #{order.id} to {action} {order.qty:,} {name} at {order.price:,} each is on the market.")
+    return " ".join(parts)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(MarketCog(bot, getattr(bot, "inventory", None), getattr(bot, "market", None)))
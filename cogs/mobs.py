@@ -2,75 +2,42 @@
 # Comet Assistant generated cog for Mobs and combat
 from __future__ import annotations
 import random
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import discord
 from discord.ext import commands
 
-@dataclass(frozen=True)
-class MobDrop:
-    item: str
-    chance: float  # percent
-    min_qty: int = 1
-    max_qty: int = 1
-
-@dataclass(frozen=True)
-class Mob:
-    key: str
-    name: str
-    biome_rarity: str
-    attack: int
-    health: int
-    difficulty: int  # 1-10
-    abilities: List[str]
-    drops: List[MobDrop]
-
-
-MOBS: Dict[str, Mob] = {
-    # Common
-    "Zombie": Mob("Zombie", "Zombie", "Common", 6, 30, 2, ["Infectious Swipe"], [MobDrop("Rotten Flesh", 45, 1, 3), MobDrop("Copper Coin", 30, 2, 6)]),
-    "Skeleton": Mob("Skeleton", "Skeleton", "Common", 7, 28, 3, ["Piercing Arrow"], [MobDrop("Bone", 50, 1, 3), MobDrop("Arrow", 30, 3, 6)]),
-    "Spider": Mob("Spider", "Spider", "Common", 5, 26, 3, ["Web Snare"], [MobDrop("Silk", 40, 1, 2), MobDrop("Venom Gland", 20, 1, 1)]),
-    # Uncommon
-    "Husk": Mob("Husk", "Husk", "Uncommon", 9, 40, 4, ["Sand Daze"], [MobDrop("Dried Husk", 40, 1, 2), MobDrop("Iron Scrap", 18, 1, 2)]),
-    "Stray": Mob("Stray", "Stray", "Uncommon", 10, 42, 4, ["Frostbite"], [MobDrop("Frost Arrow", 30, 2, 4), MobDrop("Ice Shard", 20, 1, 2)]),
-    "Scorpion": Mob("Scorpion", "Scorpion", "Uncommon", 11, 36, 5, ["Poison Sting"], [MobDrop("Scorpion Tail", 25, 1, 1), MobDrop("Chitin", 35, 1, 2)]),
-    # Rare
-    "Jaguar": Mob("Jaguar", "Jaguar", "Rare", 14, 60, 6, ["Pounce", "Bleed"], [MobDrop("Jaguar Pelt", 35, 1, 1), MobDrop("Fang", 20, 1, 2)]),
-    "Cave Spider": Mob("Cave Spider", "Cave Spider", "Rare", 13, 55, 6, ["Poison Bite"], [MobDrop("Toxic Silk", 30, 1, 2), MobDrop("Glow Sac", 18, 1, 1)]),
-    "Harpy": Mob("Harpy", "Harpy", "Rare", 12, 58, 6, ["Screech"], [MobDrop("Feather", 38, 2, 4), MobDrop("Wind Essence", 15, 1, 1)]),
-    # Epic
-    "Fire Golem": Mob("Fire Golem", "Fire Golem", "Epic", 22, 120, 8, ["Lava Slam", "Burning Aura"], [MobDrop("Magma Core", 28, 1, 1), MobDrop("Charred Plate", 22, 1, 2)]),
-    "Blaze Captain": Mob("Blaze Captain", "Blaze Captain", "Epic", 20, 110, 8, ["Flame Volley"], [MobDrop("Blaze Rod", 30, 1, 2), MobDrop("Cinder", 20, 2, 4)]),
-    "Ash Wraith": Mob("Ash Wraith", "Ash Wraith", "Epic", 19, 105, 8, ["Smoke Veil", "Life Drain"], [MobDrop("Wraith Dust", 25, 1, 2), MobDrop("Ashen Cloth", 25, 1, 2)]),
-    # Legendary
-    "Phantom King": Mob("Phantom King", "Phantom King", "Legendary", 30, 200, 10, ["Void Rift", "Phantom Lance"], [MobDrop("Void Crown", 10, 1, 1), MobDrop("Phantom Silk", 30, 1, 2)]),
-    "Null Shade": Mob("Null Shade", "Null Shade", "Legendary", 26, 180, 9, ["Phase Shift"], [MobDrop("Entropy Crystal", 12, 1, 1), MobDrop("Shadow Fragment", 22, 1, 2)]),
-}
+from core import combat
+from core.content import content_index
+from core.inventory import InventoryService
+from core.journal import Source
+from core.models import Mob
+from core.registry import registry
+from core.responses import ResponseScheduler
+from core.rewards import REWARD_TABLES
+from core.views import ViewStateStore, claim, frozen, reply_with_view, view_key
 
 
 def roll_mob(mob_keys: List[str]) -> Mob:
     # simple uniform among provided biome pool; difficulty comes from mob data
-    return MOBS[random.choice(mob_keys)]
+    return registry().mobs[random.choice(mob_keys)]
 
 
 def simulate_combat(mob: Mob, player_attack: int = 18, player_health: int = 100) -> Tuple[bool, int, int]:
-    # Very simple turn-based sim to produce a result; expandable later
-    m_hp = mob.health
-    p_hp = player_health
-    while m_hp > 0 and p_hp > 0:
-        # player hits
-        m_hp -= max(1, player_attack - mob.difficulty)
-        if m_hp <= 0:
-            break
-        # mob hits
-        p_hp -= max(1, mob.attack - 5)
-    return (p_hp > 0, max(0, p_hp), max(0, m_hp))
-
-
-def roll_drops(mob: Mob) -> List[Tuple[str, int]]:
-    results: List[Tuple[str, int]] = []
+    # O(1) from turns-to-kill; steps turn by turn only for hooked abilities (core.combat)
+    return combat.simulate(mob, player_attack, player_health)
+
+
+def simulate_combat_many(mobs: List[Mob], player_attacks=18, player_healths=100):
+    return combat.simulate_many(mobs, player_attacks, player_healths)
+
+
+def roll_drops(mob: Mob, drop_bonus: int = 0) -> List[Tuple[int, int]]:
+    # (item ID, qty) pairs; names are looked up when the reply is rendered
+    if drop_bonus:
+        # Boosted chances are precomputed per (mob, bonus) by the reward pipeline
+        return REWARD_TABLES.drops(content_index(), mob, drop_bonus).roll()
+    results: List[Tuple[int, int]] = []
     for d in mob.drops:
         if random.uniform(0, 100) <= d.chance:
             qty = random.randint(d.min_qty, d.max_qty)
@@ -78,42 +45,132 @@ def roll_drops(mob: Mob) -> List[Tuple[str, int]]:
     return results
 
 
+class Fight:
+    """View state behind a fightmob message's buttons."""
+
+    __slots__ = ("user_id", "duel", "last")
+
+    def __init__(self, user_id: int, duel: combat.Duel):
+        self.user_id = user_id
+        self.duel = duel
+        self.last = f"A wild {duel.state.mob.name} appears!"
+
+
+class FightButtons(discord.ui.View):
+    # Registered once as the dispatcher for every fight; the frozen copies sent
+    # with messages differ only in the potion button's label
+    def __init__(self, cog: Optional["MobsCog"] = None, potions: int = combat.POTIONS):
+        super().__init__(timeout=None)
+        self.cog = cog
+        self.potion.label = f"Potion ({potions})"
+        self.potion.disabled = not potions
+
+    @discord.ui.button(label="Attack", style=discord.ButtonStyle.danger, custom_id="fight:attack")
+    async def attack(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog._turn(interaction, combat.ATTACK)
+
+    @discord.ui.button(label="Defend", style=discord.ButtonStyle.primary, custom_id="fight:defend")
+    async def defend(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog._turn(interaction, combat.DEFEND)
+
+    @discord.ui.button(label="Potion", style=discord.ButtonStyle.success, custom_id="fight:potion")
+    async def potion(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog._turn(interaction, combat.POTION)
+
+    @discord.ui.button(label="Flee", style=discord.ButtonStyle.secondary, custom_id="fight:flee")
+    async def flee(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog._turn(interaction, combat.FLEE)
+
+    @discord.ui.button(label="Auto-battle", style=discord.ButtonStyle.secondary, custom_id="fight:auto")
+    async def auto(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.cog._turn(interaction, None)
+
+
 class MobsCog(commands.Cog):
-    def __init__(self, bot: commands.Bot):
+    def __init__(self, bot: commands.Bot, inventory: InventoryService | None = None):
         self.bot = bot
+        self.inventory = inventory or InventoryService()
+        self.responder = getattr(bot, "responder", None) or ResponseScheduler()
+        views = getattr(bot, "view_states", None)
+        self.views = views if views is not None else ViewStateStore()
+        self._buttons: Optional[FightButtons] = None
+        self._layouts: Dict[int, FightButtons] = {}
+
+    async def cog_load(self):
+        # Views need a running loop, so they are built here rather than in __init__
+        self._buttons = FightButtons(self)
+        self.bot.add_view(self._buttons)
+        self._layouts = {n: frozen(FightButtons(potions=n)) for n in range(combat.POTIONS + 1)}
+
+    async def cog_unload(self):
+        if self._buttons is not None:
+            self._buttons.stop()
+
+    # Helper: render a fight in progress, or its result with any drops
+    def _embed(self, fight: Fight, drops: List[Tuple[int, int]] = ()) -> discord.Embed:
+        duel = fight.duel
+        s = duel.state
+        if duel.over:
+            result = "Fled" if duel.fled else "Victory" if duel.won else "Defeat"
+            color = 0x2ecc71 if duel.won else 0xe74c3c
+        else:
+            result, color = f"Turn {s.turn + 1}", 0xf1c40f
+        e = discord.Embed(title=f"Encounter: {s.mob.name}", description=fight.last, color=color)
+        e.add_field(name="Result", value=result)
+        e.add_field(name="Player HP", value=f"{max(0, s.p_hp)}/{duel.max_hp}")
+        e.add_field(name="Mob HP", value=f"{max(0, s.m_hp)}/{s.mob.health}")
+        if drops:
+            names = registry().items
+            e.add_field(name="Drops", value="\n".join(f"{names[i]} x{q}" for i, q in drops), inline=False)
+        return e
+
+    async def _turn(self, interaction: discord.Interaction, action: Optional[str]):
+        fight = await claim(interaction, self.views, Fight, "fightmob")
+        if fight is None:
+            return
+        duel = fight.duel
+        if duel.over:
+            return await interaction.response.edit_message(view=None)
+        if action is None:
+            duel.finish()
+            fight.last = "You fight it out."
+        else:
+            try:
+                fight.last = duel.act(action)
+            except ValueError as e:
+                return await interaction.response.send_message(f"You can't do that: {e}.", ephemeral=True)
+        if not duel.over:
+            return await interaction.response.edit_message(embed=self._embed(fight), view=self._layouts[duel.potions])
+        # Dropped before awaiting so a second click can't pay out the same fight twice
+        self.views.pop(view_key(interaction.message))
+        drops = roll_drops(duel.state.mob) if duel.won else []
+        if duel.won:
+            await self.inventory.grant(fight.user_id, items=drops, source=Source.MOB, kills=1)
+        await interaction.response.edit_message(embed=self._embed(fight, drops), view=None)
 
     @commands.command(name="fightmob")
-    async def fight_mob_prefix(self, ctx: commands.Context, mob_key: str):
-        mob_key = mob_key.title().replace("_", " ")
-        if mob_key not in MOBS:
-            return await ctx.reply("Unknown mob.")
-        mob = MOBS[mob_key]
-        win, p_hp, m_hp = simulate_combat(mob)
-        drops = roll_drops(mob) if win else []
-        e = discord.Embed(title=f"Encounter: {mob.name}", color=0xe74c3c if not win else 0x2ecc71)
-        e.add_field(name="Result", value="Victory" if win else "Defeat")
-        e.add_field(name="Player HP", value=str(p_hp))
-        e.add_field(name="Mob HP", value=str(m_hp))
-        if drops:
-            e.add_field(name="Drops", value="\n".join(f"{n} x{q}" for n, q in drops), inline=False)
-        await ctx.reply(embed=e)
+    async def fight_mob_prefix(self, ctx: commands.Context, *, mob_key: str):
+        reg = registry()
+        key = reg.mob_keys.resolve(mob_key)
+        if key is None:
+            return await self.responder.reply(ctx, reg.mob_keys.unknown("mob", mob_key))
+        fight = Fight(ctx.author.id, combat.Duel(reg.mobs[key]))
+        await reply_with_view(self.responder, ctx, self.views, fight, embed=self._embed(fight), view=self._layouts[combat.POTIONS])
 
     @discord.app_commands.command(name="fightmob", description="Fight a mob by key")
     async def fight_mob_slash(self, interaction: discord.Interaction, mob_key: str):
-        mob_key = mob_key.title().replace("_", " ")
-        if mob_key not in MOBS:
-            return await interaction.response.send_message("Unknown mob.", ephemeral=True)
-        mob = MOBS[mob_key]
-        win, p_hp, m_hp = simulate_combat(mob)
-        drops = roll_drops(mob) if win else []
-        e = discord.Embed(title=f"Encounter: {mob.name}", color=0xe74c3c if not win else 0x2ecc71)
-        e.add_field(name="Result", value="Victory" if win else "Defeat")
-        e.add_field(name="Player HP", value=str(p_hp))
-        e.add_field(name="Mob HP", value=str(m_hp))
-        if drops:
-            e.add_field(name="Drops", value="\n".join(f"{n} x{q}" for n, q in drops), inline=False)
-        await interaction.response.send_message(embed=e)
+        reg = registry()
+        key = reg.mob_keys.resolve(mob_key)
+        if key is None:
+            return await interaction.response.send_message(reg.mob_keys.unknown("mob", mob_key), ephemeral=True)
+        fight = Fight(interaction.user.id, combat.Duel(reg.mobs[key]))
+        self.views.put(interaction.id, fight)
+        await self.responder.respond(interaction, self._embed(fight), view=self._layouts[combat.POTIONS])
+
+    @fight_mob_slash.autocomplete("mob_key")
+    async def mob_key_autocomplete(self, interaction: discord.Interaction, current: str):
+        return registry().mob_keys.choices(current)
 
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(MobsCog(bot))
+    await bot.add_cog(MobsCog(bot, getattr(bot, "inventory", None)))
@@ -0,0 +1 @@
+# Core package initialization (shared, non-cog building blocks)
@@ -0,0 +1,311 @@
+# cluster.py
+# Multi-process cluster support: shard range splitting, per-cluster health
+# reports, and a supervisor that aggregates them and restarts crashed clusters.
+from __future__ import annotations
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import queue
+import random
+import signal
+import time
+from typing import Dict, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+HEALTH_INTERVAL = 5.0
+
+
+def split_shards(shard_count: int, clusters: int) -> List[List[int]]:
+    """Contiguous, near-equal shard ranges, one per cluster."""
+    if shard_count < 1 or clusters < 1:
+        raise ValueError("shard_count and clusters must be positive")
+    clusters = min(clusters, shard_count)
+    base, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def health_report(cluster_id: int, shard_ids: Sequence[int], guilds: int, latencies: Dict[int, float], ready: bool) -> dict:
+    return {
+        "cluster": cluster_id,
+        "shards": list(shard_ids),
+        "guilds": guilds,
+        "latencies": {int(k): float(v) for k, v in latencies.items()},
+        "ready": ready,
+        "pid": os.getpid(),
+        "time": time.time(),
+    }
+
+
+class HealthReporter:
+    """Runs inside a cluster process and pushes health reports to the supervisor."""
+
+    def __init__(self, health_queue, cluster_id: int, shard_ids: Sequence[int], interval: float = HEALTH_INTERVAL):
+        self.queue = health_queue
+        self.cluster_id = cluster_id
+        self.shard_ids = list(shard_ids)
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, bot) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(bot))
+
+    def report(self, bot) -> None:
+        latencies = dict(getattr(bot, "latencies", None) or [(self.shard_ids[0] if self.shard_ids else 0, bot.latency)])
+        self._put(health_report(self.cluster_id, self.shard_ids, len(bot.guilds), latencies, bot.is_ready()))
+
+    def _put(self, report: dict) -> None:
+        try:
+            self.queue.put_nowait(report)
+        except queue.Full:
+            pass
+
+    async def _run(self, bot) -> None:
+        while True:
+            try:
+                self.report(bot)
+            except Exception:
+                log.exception("Health report failed")
+            await asyncio.sleep(self.interval)
+
+
+class FleetStats:
+    """Latest report from every cluster, summed for fleet-wide logging."""
+
+    def __init__(self):
+        self.reports: Dict[int, dict] = {}
+
+    def update(self, report: dict) -> None:
+        self.reports[report["cluster"]] = report
+
+    def forget(self, cluster_id: int) -> None:
+        self.reports.pop(cluster_id, None)
+
+    @property
+    def guilds(self) -> int:
+        return sum(r["guilds"] for r in self.reports.values())
+
+    @property
+    def shards_reporting(self) -> int:
+        return sum(len(r["latencies"]) for r in self.reports.values())
+
+    @property
+    def latency(self) -> float:
+        values = [v for r in self.reports.values() for v in r["latencies"].values() if v == v and v != float("inf")]
+        return sum(values) / len(values) if values else float("nan")
+
+    def ready_clusters(self) -> int:
+        return sum(1 for r in self.reports.values() if r["ready"])
+
+    def summary(self, expected_clusters: Optional[int] = None) -> str:
+        total = len(self.reports) if expected_clusters is None else expected_clusters
+        return (
+            f"{self.guilds} guilds, {self.shards_reporting} shards, "
+            f"{self.ready_clusters()}/{total} clusters ready, "
+            f"avg latency {self.latency * 1000:.0f} ms"
+        )
+
+
+class RestartPolicy:
+    """Exponential backoff, giving up after ``max_restarts`` within ``window`` seconds."""
+
+    def __init__(self, max_restarts: int = 5, window: float = 300.0, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_restarts = max_restarts
+        self.window = window
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._history: Dict[int, List[float]] = {}
+
+    def next_delay(self, cluster_id: int, now: float) -> Optional[float]:
+        """Delay before restarting, or None if the cluster should stay down."""
+        recent = [t for t in self._history.get(cluster_id, []) if now - t < self.window]
+        if len(recent) >= self.max_restarts:
+            self._history[cluster_id] = recent
+            return None
+        recent.append(now)
+        self._history[cluster_id] = recent
+        return min(self.max_delay, self.base_delay * 2 ** (len(recent) - 1))
+
+
+# -- worker side -------------------------------------------------------------
+
+def _term_as_interrupt(signum, frame):
+    # Lets asyncio.run unwind so the inventory buffer is flushed on shutdown;
+    # a repeated SIGTERM must not interrupt that cleanup
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def run_cluster(cluster_id: int, shard_ids: List[int], shard_count: int, health_queue, stub: bool = False) -> None:
+    """Process entry point for one cluster."""
+    signal.signal(signal.SIGTERM, _term_as_interrupt)
+    os.environ["CLUSTER_ID"] = str(cluster_id)
+    os.environ["SHARD_COUNT"] = str(shard_count)
+    os.environ["SHARD_IDS"] = ",".join(map(str, shard_ids))
+    reporter = HealthReporter(health_queue, cluster_id, shard_ids)
+    try:
+        if stub:
+            asyncio.run(run_stub_cluster(reporter))
+        else:
+            import main as bot_main
+
+            bot_main.bot.health_reporter = reporter
+            asyncio.run(bot_main.main())
+    except KeyboardInterrupt:
+        pass
+
+
+async def run_stub_cluster(reporter: HealthReporter) -> None:
+    """Stand-in for a real gateway connection, for exercising the supervisor locally.
+
+    STUB_GUILDS_PER_SHARD sets the fake guild count; STUB_CRASH_RATE is the
+    chance per report interval that the cluster exits with an error.
+    """
+    guilds_per_shard = int(os.getenv("STUB_GUILDS_PER_SHARD", "1000"))
+    crash_rate = float(os.getenv("STUB_CRASH_RATE", "0"))
+    interval = float(os.getenv("STUB_HEALTH_INTERVAL", str(reporter.interval)))
+    await asyncio.sleep(random.uniform(0.1, 0.5))  # connect + READY
+    guilds = guilds_per_shard * len(reporter.shard_ids)
+    while True:
+        latencies = {sid: random.uniform(0.03, 0.12) for sid in reporter.shard_ids}
+        reporter._put(health_report(reporter.cluster_id, reporter.shard_ids, guilds, latencies, True))
+        if crash_rate and random.random() < crash_rate:
+            raise SystemExit(1)
+        await asyncio.sleep(interval)
+
+
+# -- supervisor side ---------------------------------------------------------
+
+class Supervisor:
+    def __init__(
+        self,
+        shard_count: int,
+        clusters: int,
+        *,
+        stub: bool = False,
+        policy: Optional[RestartPolicy] = None,
+        heartbeat_timeout: float = HEALTH_INTERVAL * 6,
+    ):
+        self.shard_count = shard_count
+        self.ranges = split_shards(shard_count, clusters)
+        self.stub = stub
+        self.policy = policy or RestartPolicy()
+        self.heartbeat_timeout = heartbeat_timeout
+        self.ctx = mp.get_context("spawn")
+        self.health = self.ctx.Queue(maxsize=1024)
+        self.fleet = FleetStats()
+        self.procs: Dict[int, mp.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.last_seen: Dict[int, float] = {}
+        self.restart_at: Dict[int, float] = {}
+        self.abandoned: set = set()
+        self._fleet_ready_logged = False
+        self._stopping = False
+
+    def _spawn(self, cluster_id: int) -> None:
+        proc = self.ctx.Process(
+            target=run_cluster,
+            args=(cluster_id, self.ranges[cluster_id], self.shard_count, self.health, self.stub),
+            name=f"cluster-{cluster_id}",
+            daemon=False,
+        )
+        proc.start()
+        self.procs[cluster_id] = proc
+        self.started_at[cluster_id] = time.monotonic()
+        self.last_seen.pop(cluster_id, None)
+        shards = self.ranges[cluster_id]
+        log.info("Cluster %d started (pid %d, shards %d-%d)", cluster_id, proc.pid, shards[0], shards[-1])
+
+    def start(self) -> None:
+        for cluster_id in range(len(self.ranges)):
+            self._spawn(cluster_id)
+
+    def stop(self, timeout: float = 15.0) -> None:
+        self._stopping = True
+        for proc in self.procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        deadline = time.monotonic() + timeout
+        for proc in self.procs.values():
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                proc.kill()
+
+    def _drain(self) -> None:
+        try:
+            report = self.health.get(timeout=1.0)
+        except queue.Empty:
+            return
+        while True:
+            self._on_report(report)
+            try:
+                report = self.health.get_nowait()
+            except queue.Empty:
+                return
+
+    def _on_report(self, report: dict) -> None:
+        cluster_id = report["cluster"]
+        proc = self.procs.get(cluster_id)
+        if proc is None or report.get("pid") != proc.pid:
+            return  # stale report from a replaced process
+        was_ready = self.fleet.reports.get(cluster_id, {}).get("ready", False)
+        self.fleet.update(report)
+        self.last_seen[cluster_id] = time.monotonic()
+        if report["ready"] and not was_ready:
+            log.info("Cluster %d ready: %d guilds on shards %s", cluster_id, report["guilds"], report["shards"])
+        if not self._fleet_ready_logged and self.fleet.ready_clusters() == len(self.ranges):
+            self._fleet_ready_logged = True
+            log.info("Fleet ready: %s", self.fleet.summary(len(self.ranges)))
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        for cluster_id, proc in list(self.procs.items()):
+            if cluster_id in self.abandoned:
+                continue
+            if cluster_id in self.restart_at:
+                if now >= self.restart_at[cluster_id]:
+                    del self.restart_at[cluster_id]
+                    self._spawn(cluster_id)
+                continue
+            seen = self.last_seen.get(cluster_id, self.started_at[cluster_id])
+            hung = proc.is_alive() and now - seen > self.heartbeat_timeout
+            if proc.is_alive() and not hung:
+                continue
+            if hung:
+                log.warning("Cluster %d missed heartbeats for %.0fs; terminating", cluster_id, now - seen)
+                proc.terminate()
+                proc.join(10)
+            else:
+                log.warning("Cluster %d exited with code %s", cluster_id, proc.exitcode)
+            self.fleet.forget(cluster_id)
+            self._fleet_ready_logged = False
+            delay = self.policy.next_delay(cluster_id, now)
+            if delay is None:
+                log.error("Cluster %d crashed too often; leaving it down", cluster_id)
+                self.abandoned.add(cluster_id)
+            else:
+                log.info("Restarting cluster %d in %.1fs", cluster_id, delay)
+                self.restart_at[cluster_id] = now + delay
+
+    def run(self, status_interval: float = 60.0) -> None:
+        self.start()
+        next_status = time.monotonic() + status_interval
+        try:
+            while not self._stopping:
+                self._drain()
+                self._check()
+                if time.monotonic() >= next_status:
+                    next_status += status_interval
+                    log.info("Fleet status: %s", self.fleet.summary(len(self.ranges)))
+                if len(self.abandoned) == len(self.ranges):
+                    log.error("All clusters are down; exiting")
+                    break
+        finally:
+            self.stop()
@@ -0,0 +1,228 @@
+# combat.py
+# Combat resolution: closed form for the plain rules, step-by-step only when a
+# mob ability registers a per-turn hook.
+from __future__ import annotations
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # optional: batches fall back to the scalar path
+    np = None
+
+# Flat reduction applied to every mob hit (player armor)
+PLAYER_ARMOR = 5
+
+CombatResult = Tuple[bool, int, int]
+
+
+class CombatState:
+    """Mutable per-fight state handed to ability hooks each turn."""
+
+    __slots__ = ("mob", "turn", "p_hp", "m_hp", "player_damage", "mob_damage")
+
+    def __init__(self, mob, p_hp: int, m_hp: int):
+        self.mob = mob
+        self.turn = 0
+        self.p_hp = p_hp
+        self.m_hp = m_hp
+        self.player_damage = 0
+        self.mob_damage = 0
+
+
+AbilityHook = Callable[[CombatState], None]
+
+# Ability name -> hook run at the start of every turn. Mobs whose abilities
+# have no hook here resolve in O(1).
+ABILITY_HOOKS: Dict[str, AbilityHook] = {}
+
+
+def register_ability(name: str) -> Callable[[AbilityHook], AbilityHook]:
+    def decorator(fn: AbilityHook) -> AbilityHook:
+        ABILITY_HOOKS[name] = fn
+        return fn
+    return decorator
+
+
+def player_damage(mob, player_attack: int) -> int:
+    return max(1, player_attack - mob.difficulty)
+
+
+def mob_damage(mob) -> int:
+    return max(1, mob.attack - PLAYER_ARMOR)
+
+
+def resolve(m_hp: int, p_hp: int, d_player: int, d_mob: int) -> CombatResult:
+    """Outcome of a fight where the player swings first, from turns-to-kill."""
+    if m_hp <= 0 or p_hp <= 0:
+        return (p_hp > 0, max(0, p_hp), max(0, m_hp))
+    player_turns = -(-m_hp // d_player)
+    mob_turns = -(-p_hp // d_mob)
+    # The mob only gets to swing player_turns - 1 times before it dies
+    if mob_turns < player_turns:
+        return (False, 0, m_hp - mob_turns * d_player)
+    return (True, p_hp - (player_turns - 1) * d_mob, 0)
+
+
+def _hooks_for(mob) -> List[AbilityHook]:
+    if not ABILITY_HOOKS:
+        return []
+    return [ABILITY_HOOKS[a] for a in mob.abilities if a in ABILITY_HOOKS]
+
+
+def _step(mob, player_attack: int, player_health: int, hooks: List[AbilityHook]) -> CombatResult:
+    state = CombatState(mob, player_health, mob.health)
+    base_player, base_mob = player_damage(mob, player_attack), mob_damage(mob)
+    while state.m_hp > 0 and state.p_hp > 0:
+        state.turn += 1
+        state.player_damage, state.mob_damage = base_player, base_mob
+        for hook in hooks:
+            hook(state)
+        if state.p_hp <= 0 or state.m_hp <= 0:
+            break
+        state.m_hp -= state.player_damage
+        if state.m_hp <= 0:
+            break
+        state.p_hp -= state.mob_damage
+    return (state.p_hp > 0, max(0, state.p_hp), max(0, state.m_hp))
+
+
+def simulate(mob, player_attack: int = 18, player_health: int = 100) -> CombatResult:
+    hooks = _hooks_for(mob)
+    if hooks:
+        return _step(mob, player_attack, player_health, hooks)
+    return resolve(mob.health, player_health, player_damage(mob, player_attack), mob_damage(mob))
+
+
+def simulate_many(
+    mobs: Sequence,
+    player_attacks: Union[int, Sequence[int]] = 18,
+    player_healths: Union[int, Sequence[int]] = 100,
+):
+    """Resolve many fights at once.
+
+    Returns ``(wins, player_hp, mob_hp)`` as NumPy arrays when NumPy is
+    installed, otherwise as lists. Scalar attacks/healths are broadcast.
+    """
+    n = len(mobs)
+    attacks = [player_attacks] * n if isinstance(player_attacks, int) else list(player_attacks)
+    healths = [player_healths] * n if isinstance(player_healths, int) else list(player_healths)
+    if len(attacks) != n or len(healths) != n:
+        raise ValueError("mobs, player_attacks and player_healths must have the same length")
+
+    if np is None:
+        results = [simulate(m, a, h) for m, a, h in zip(mobs, attacks, healths)]
+        return [r[0] for r in results], [r[1] for r in results], [r[2] for r in results]
+
+    m_hp = np.fromiter((m.health for m in mobs), dtype=np.int64, count=n)
+    diff = np.fromiter((m.difficulty for m in mobs), dtype=np.int64, count=n)
+    m_atk = np.fromiter((m.attack for m in mobs), dtype=np.int64, count=n)
+    p_atk = np.asarray(attacks, dtype=np.int64)
+    p_hp = np.asarray(healths, dtype=np.int64)
+
+    d_player = np.maximum(1, p_atk - diff)
+    d_mob = np.maximum(1, m_atk - PLAYER_ARMOR)
+    player_turns = -(-m_hp // d_player)
+    mob_turns = -(-p_hp // d_mob)
+    lose = mob_turns < player_turns
+    out_p = np.where(lose, 0, p_hp - (player_turns - 1) * d_mob)
+    out_m = np.where(lose, m_hp - mob_turns * d_player, 0)
+
+    # Fights that never start keep their starting values
+    idle = (m_hp <= 0) | (p_hp <= 0)
+    out_p = np.where(idle, np.maximum(0, p_hp), out_p)
+    out_m = np.where(idle, np.maximum(0, m_hp), out_m)
+    wins = out_p > 0
+
+    if ABILITY_HOOKS:
+        for i, mob in enumerate(mobs):
+            hooks = _hooks_for(mob)
+            if hooks:
+                wins[i], out_p[i], out_m[i] = _step(mob, int(p_atk[i]), int(p_hp[i]), hooks)
+    return wins, out_p, out_m
+
+
+# Interactive fights: the player picks one action per turn
+ATTACK, DEFEND, POTION, FLEE = "attack", "defend", "potion", "flee"
+POTIONS = 2
+POTION_HEAL = 30
+
+
+class Duel:
+    """A fight stepped through one player action at a time.
+
+    Same turn order as ``simulate``: ability hooks run first, then the player
+    acts and the mob hits back if it is still standing. Defending halves the
+    mob's hit and makes the next attack a counter for half again as much
+    damage; a potion heals up to POTION_HEAL. ``finish()`` plays the rest
+    out as plain attacks.
+    """
+
+    __slots__ = ("state", "attack", "max_hp", "potions", "braced", "fled")
+
+    def __init__(self, mob, player_attack: int = 18, player_health: int = 100, potions: int = POTIONS):
+        self.state = CombatState(mob, player_health, mob.health)
+        self.attack = player_attack
+        self.max_hp = player_health
+        self.potions = potions
+        self.braced = False
+        self.fled = False
+
+    @property
+    def over(self) -> bool:
+        return self.fled or self.state.p_hp <= 0 or self.state.m_hp <= 0
+
+    @property
+    def won(self) -> bool:
+        return not self.fled and self.state.m_hp <= 0 < self.state.p_hp
+
+    def act(self, action: str) -> str:
+        """Plays one turn and describes it."""
+        if self.over:
+            raise ValueError("the fight is over")
+        if action not in (ATTACK, DEFEND, POTION, FLEE):
+            raise ValueError(f"unknown action {action!r}")
+        if action == POTION and not self.potions:
+            raise ValueError("no potions left")
+        if action == FLEE:
+            self.fled = True
+            return "You fled."
+        s = self.state
+        mob = s.mob
+        s.turn += 1
+        s.player_damage, s.mob_damage = player_damage(mob, self.attack), mob_damage(mob)
+        for hook in _hooks_for(mob):
+            hook(s)
+        if s.p_hp <= 0 or s.m_hp <= 0:
+            return f"{mob.name}'s {', '.join(mob.abilities)} decided the fight."
+        incoming = s.mob_damage
+        if action == ATTACK:
+            hit = s.player_damage * 3 // 2 if self.braced else s.player_damage
+            self.braced = False
+            s.m_hp -= hit
+            done = f"You {'counter' if hit != s.player_damage else 'hit'} for {hit}"
+            if s.m_hp <= 0:
+                return f"{done} and defeat {mob.name}!"
+        elif action == DEFEND:
+            self.braced = True
+            incoming = -(-incoming // 2)
+            done = "You brace yourself"
+        else:
+            self.potions -= 1
+            healed = min(POTION_HEAL, self.max_hp - s.p_hp)
+            s.p_hp += healed
+            done = f"You drink a potion (+{healed} HP)"
+        s.p_hp -= incoming
+        return f"{done}; {mob.name} hits you for {incoming}."
+
+    def finish(self) -> CombatResult:
+        """Resolves the rest of the fight with plain attacks."""
+        s = self.state
+        if self.braced and not self.over:
+            self.act(ATTACK)
+        if not self.over:
+            if _hooks_for(s.mob):
+                while not self.over:
+                    self.act(ATTACK)
+            else:
+                _, s.p_hp, s.m_hp = resolve(s.m_hp, s.p_hp, player_damage(s.mob, self.attack), mob_damage(s.mob))
+        return self.won, max(0, s.p_hp), max(0, s.m_hp)
@@ -0,0 +1,79 @@
+# content.py
+# Biome -> content join index: resolves the structure, mob and chest tier IDs
+# on each biome to their records once, with precompiled samplers.
+# Built once per content registry version.
+from __future__ import annotations
+import logging
+import random
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.sampling import AliasSampler
+
+log = logging.getLogger(__name__)
+
+
+class BiomePool:
+    """Resolved content for one biome, ready to roll from."""
+
+    __slots__ = ("biome", "structures", "mobs", "tiers", "_structures", "_mobs", "_tiers")
+
+    def __init__(self, biome, structures: Tuple, mobs: Tuple, tiers: Tuple):
+        self.biome = biome
+        self.structures = structures
+        self.mobs = mobs
+        self.tiers = tiers
+        # Structures and mobs are uniform (as pick_structure/roll_mob); tiers use their weights
+        self._structures = AliasSampler(structures, [1.0] * len(structures)) if structures else None
+        self._mobs = AliasSampler(mobs, [1.0] * len(mobs)) if mobs else None
+        self._tiers = AliasSampler(tiers, [t.weights for t in tiers]) if tiers else None
+
+    def roll_structure(self, rng: random.Random = random):
+        return self._structures.sample(rng) if self._structures else None
+
+    def roll_mob(self, rng: random.Random = random):
+        return self._mobs.sample(rng) if self._mobs else None
+
+    def roll_tier(self, rng: random.Random = random):
+        return self._tiers.sample(rng) if self._tiers else None
+
+
+class ContentIndex:
+    def __init__(self, pools: Dict[str, BiomePool], dangling: List[Tuple[str, str, str]]):
+        self.pools = pools
+        self.dangling = dangling
+        biomes = [p.biome for p in pools.values()]
+        self._biomes = AliasSampler(list(pools.values()), [b.chance for b in biomes])
+
+    def pool(self, biome_name: str) -> Optional[BiomePool]:
+        return self.pools.get(biome_name)
+
+    def roll_biome(self, rng: random.Random = random) -> BiomePool:
+        return self._biomes.sample(rng)
+
+
+def build_index(biomes: Iterable, structures: Sequence, mobs: Sequence, tiers: Sequence, dangling: Optional[List[Tuple[str, str, str]]] = None) -> ContentIndex:
+    # Biome references are IDs into the record tuples; ``dangling`` lists the
+    # (biome, kind, key) references the registry could not resolve
+    dangling = dangling or []
+    pools: Dict[str, BiomePool] = {}
+    for biome in biomes:
+        pools[biome.name] = BiomePool(
+            biome,
+            tuple(structures[i] for i in biome.structures),
+            tuple(mobs[i] for i in biome.mobs),
+            tuple(tiers[i] for i in biome.chest_types),
+        )
+    if dangling:
+        log.warning(
+            "Content index: %d dangling reference(s): %s",
+            len(dangling),
+            "; ".join(f"{b} -> {kind} {name!r}" for b, kind, name in dangling),
+        )
+    return ContentIndex(pools, dangling)
+
+
+def content_index() -> ContentIndex:
+    """The index of the live content registry (core.registry)."""
+    from core.registry import registry
+
+    return registry().index
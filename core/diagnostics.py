@@ -0,0 +1,186 @@
+# diagnostics.py
+# Live-process diagnostics: an event-loop lag watchdog and a sampling profiler
+# that produces collapsed stacks (flamegraph.pl / speedscope input).
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from core.metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+LOOP_LAG = METRICS.histogram(
+    "event_loop_lag_seconds", "Delay between when a loop callback was due and when it ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_STALLS = METRICS.counter("event_loop_stalls_total", "Times the loop was blocked past the lag threshold.")
+
+
+def _format_stack(frame, limit: int = 30) -> str:
+    return "".join(traceback.format_stack(frame, limit=limit))
+
+
+class LoopWatchdog:
+    """Detects event-loop stalls and logs what the loop thread was running.
+
+    A callback on the loop stamps a heartbeat every ``interval`` seconds and
+    records how late it ran. A daemon thread watches the heartbeat; once it is
+    older than ``threshold`` the thread grabs the loop thread's current stack
+    (the loop itself can't, it is the thing that's stuck) and logs it once per
+    stall.
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1):
+        self.threshold = threshold
+        self.interval = interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._schedule(self._beat)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _schedule(self, now: float) -> None:
+        self._handle = self._loop.call_later(self.interval, self._tick, now + self.interval)
+
+    def _tick(self, due: float) -> None:
+        now = time.monotonic()
+        LOOP_LAG.observe(max(0.0, now - due))
+        self._beat = now
+        self._schedule(now)
+
+    def _watch(self) -> None:
+        stalled_since: Optional[float] = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            behind = time.monotonic() - beat
+            if behind > self.threshold + self.interval:
+                if stalled_since != beat:
+                    stalled_since = beat
+                    LOOP_STALLS.inc()
+                    self._report(behind)
+            elif stalled_since is not None:
+                log.warning("Event loop responsive again after a %.0f ms stall", (self._beat - stalled_since) * 1000)
+                stalled_since = None
+
+    def _report(self, behind: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+        name = task.get_name() if task is not None else "no task (callback)"
+        stack = _format_stack(frame) if frame is not None else "  <no frame>\n"
+        log.warning("Event loop blocked for %.0f ms in %s:\n%s", behind * 1000, name, stack.rstrip())
+
+
+# Seconds; how soon a busy thread must hand the GIL to the sampler
+SWITCH_INTERVAL = 0.0005
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    short = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+def collapse(frame, labels: Dict[object, str]) -> str:
+    """Root-first ``a;b;c`` stack, the format flamegraph tools read."""
+    parts: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        label = labels.get(code)
+        if label is None:
+            label = labels[code] = _frame_label(code)
+        parts.append(label)
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at ``hz`` from a background thread.
+
+    Nothing is hooked into the interpreter, so the profiled code runs at full
+    speed; the cost is one ``sys._current_frames()`` walk per sample. The
+    sampler needs the GIL to take a sample, so the switch interval is lowered
+    while it runs; otherwise busy code only gives the GIL up at its next I/O
+    call and every sample lands in the selector.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, hz: int = 200):
+        self.hz = hz
+        self.samples: Counter = Counter()
+        self.total = 0
+
+    @classmethod
+    def busy(cls) -> bool:
+        return cls._lock.locked()
+
+    def run(self, seconds: float) -> None:
+        """Blocks for ``seconds``; call it from a worker thread."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch, SWITCH_INTERVAL))
+        try:
+            labels: Dict[object, str] = {}
+            me = threading.get_ident()
+            interval = 1.0 / self.hz
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = collapse(frame, labels)
+                    self.samples[f"{names.get(ident, ident)};{stack}"] += 1
+                self.total += 1
+                time.sleep(interval)
+        finally:
+            sys.setswitchinterval(switch)
+            self._lock.release()
+
+    async def profile(self, seconds: float) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.run, seconds)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def top_frames(self, n: int = 5, thread: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Leaf frames by sample count, optionally for one thread."""
+        leaves: Counter = Counter()
+        for stack, count in self.samples.items():
+            name, _, rest = stack.partition(";")
+            if thread is None or name == thread:
+                leaves[rest.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
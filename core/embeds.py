@@ -0,0 +1,79 @@
+# embeds.py
+# Render layer for embeds that only depend on the content: each is built once
+# per content version and kept as the payload dict Discord is sent. Rendering
+# one wraps the stored payload in an Embed that shares its fields, so only
+# per-request parts such as the footer are new objects.
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import discord
+
+
+class _Template:
+    __slots__ = ("payload", "attrs")
+
+    def __init__(self, embed: discord.Embed):
+        self.payload = embed.to_dict()
+        # What Embed.from_dict(payload) would set, worked out once; from_dict
+        # itself spends most of its time on KeyErrors for the absent parts
+        e = discord.Embed.from_dict(self.payload)
+        self.attrs: Tuple[Tuple[str, Any], ...] = tuple(
+            (name, getattr(e, name)) for name in discord.Embed.__slots__ if hasattr(e, name)
+        )
+
+
+class EmbedTemplates:
+    """Embed payloads keyed by content record, dropped wholesale when the content changes.
+
+    ``source`` is any object identifying the content version (the
+    registry); passing a different one clears the cache. Content embeds are
+    a few hundred bytes each and there is one per record, so nothing is
+    evicted between versions.
+    """
+
+    def __init__(self):
+        self._source: Optional[object] = None
+        self._templates: Dict[Hashable, _Template] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _template(self, source: object, key: Hashable, build: Callable[[], discord.Embed]) -> _Template:
+        if source is not self._source:
+            self._templates.clear()
+            self._source = source
+        template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            return template
+        self.misses += 1
+        template = self._templates[key] = _Template(build())
+        return template
+
+    def payload(self, source: object, key: Hashable, build: Callable[[], discord.Embed]) -> Dict[str, Any]:
+        """The cached embed for ``key`` as the dict sent to Discord; don't modify it."""
+        return self._template(source, key, build).payload
+
+    def render(
+        self, source: object, key: Hashable, build: Callable[[], discord.Embed], *, footer: Optional[str] = None,
+    ) -> discord.Embed:
+        """The cached embed for ``key``, with ``footer`` set on this copy only.
+
+        The returned embed shares its field list with the cache: set its
+        footer, author or timestamp freely, but don't add or edit fields.
+        """
+        e = discord.Embed.__new__(discord.Embed)
+        for name, value in self._template(source, key, build).attrs:
+            setattr(e, name, value)
+        if footer is not None:
+            e.set_footer(text=footer)
+        return e
+
+    def invalidate(self) -> None:
+        self._templates.clear()
+        self._source = None
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
+EMBEDS = EmbedTemplates()
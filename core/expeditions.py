@@ -0,0 +1,231 @@
+# expeditions.py
+# Long-running expeditions: a SQLite table of who is away, where and until
+# when, and a scheduler that keeps the deadlines on a timing wheel, turned by
+# one task. Everything due in the same tick is handed to the resolver as a
+# single batch; the resolver (cogs/expeditions.py) owns the game logic.
+from __future__ import annotations
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from core.metrics import METRICS
+from core.wheel import TimingWheel
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = METRICS.histogram(
+    "expedition_batch_size", "Expeditions resolved per wheel tick.", buckets=(1, 5, 10, 50, 100, 500, 1000, 5000))
+BATCH_SECONDS = METRICS.histogram("expedition_batch_seconds", "Time to resolve and store one tick's expeditions.")
+
+
+class Expedition(NamedTuple):
+    user_id: int
+    biome: str  # biome name; record IDs can change when content is edited
+    channel_id: int  # where the start command was used, for the report
+    started: float
+    due: float
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS expeditions (
+    user_id    INTEGER PRIMARY KEY,
+    biome      TEXT    NOT NULL,
+    channel_id INTEGER NOT NULL,
+    started    REAL    NOT NULL,
+    due        REAL    NOT NULL
+);
+"""
+
+
+class ExpeditionStore:
+    """Active expeditions in SQLite, one row per user, on a dedicated thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args))
+
+    async def open(self) -> None:
+        if self._conn is None:
+            # A new thread per open: close() shuts the last one down, and a cog reload opens again
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="expeditions-db")
+            await self._run(self._open)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def load(self) -> List[Expedition]:
+        return await self._run(self._load)
+
+    def _load(self) -> List[Expedition]:
+        return [Expedition(*row) for row in self._conn.execute("SELECT user_id, biome, channel_id, started, due FROM expeditions")]
+
+    async def add(self, expedition: Expedition) -> bool:
+        """Stores ``expedition``; False if the user already has one."""
+        return await self._run(self._add, expedition)
+
+    def _add(self, expedition: Expedition) -> bool:
+        cur = self._conn.execute(
+            "INSERT INTO expeditions (user_id, biome, channel_id, started, due) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(user_id) DO NOTHING",
+            expedition,
+        )
+        return cur.rowcount == 1
+
+    async def remove(self, user_ids: Sequence[int]) -> None:
+        await self._run(self._remove, list(user_ids))
+
+    def _remove(self, user_ids: List[int]) -> None:
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("DELETE FROM expeditions WHERE user_id = ?", [(u,) for u in user_ids])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+Resolver = Callable[[List[Expedition]], Awaitable[None]]
+
+
+class ExpeditionScheduler:
+    """Runs expeditions to completion across restarts.
+
+    Deadlines live on a TimingWheel, so tens of thousands of expeditions cost
+    one task that wakes once per ``tick``. On start, the stored expeditions
+    are put back on the wheel, and any that finished while the bot was down
+    come due on the first tick. A batch is removed from the store only after
+    ``resolver`` returns, so the resolver must not return before its results
+    are stored; if it raises, the batch is retried next tick.
+    ``close()`` lets a tick that is already resolving finish.
+    """
+
+    def __init__(self, store: ExpeditionStore, tick: float = 1.0, clock: Callable[[], float] = time.time):
+        self.store = store
+        self.tick = tick
+        self.clock = clock
+        self.resolver: Optional[Resolver] = None
+        self.active: Dict[int, Expedition] = {}
+        self._wheel = TimingWheel(clock(), tick)
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._retry: List[Expedition] = []
+        self._removals: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def get(self, user_id: int) -> Optional[Expedition]:
+        return self.active.get(user_id)
+
+    async def start(self, resolver: Resolver) -> None:
+        self.resolver = resolver
+        if self._task is not None:
+            return
+        await self.store.open()
+        self._wheel = TimingWheel(self.clock(), self.tick)
+        for expedition in await self.store.load():
+            self.active[expedition.user_id] = expedition
+            self._wheel.schedule(expedition.user_id, expedition.due)
+        if self.active:
+            log.info("Restored %d expedition(s)", len(self.active))
+        self._stop = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+        if self._removals:
+            try:
+                await self._remove()
+            except Exception:
+                log.exception("Could not remove %d resolved expedition(s) from the store", len(self._removals))
+        await self.store.close()
+
+    async def add(self, user_id: int, biome: str, channel_id: int, duration: float) -> Optional[Expedition]:
+        """Starts an expedition; None if the user is already on one."""
+        if user_id in self.active:
+            return None
+        now = self.clock()
+        expedition = Expedition(user_id, biome, channel_id, now, now + duration)
+        # Claim the slot before the write so a double click can't start two
+        self.active[user_id] = expedition
+        try:
+            stored = await self.store.add(expedition)
+        except BaseException:
+            del self.active[user_id]
+            raise
+        if not stored:
+            del self.active[user_id]
+            return None
+        self._wheel.schedule(user_id, expedition.due)
+        return expedition
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.tick - self.clock() % self.tick)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.run_due(self.clock())
+            except Exception:
+                log.exception("Expedition tick failed; will retry")
+
+    async def run_due(self, now: float) -> int:
+        """Resolves everything due by ``now`` as one batch; returns the batch size."""
+        batch, self._retry = self._retry, []
+        batch += [self.active[user_id] for user_id in self._wheel.advance(now) if user_id in self.active]
+        if not batch:
+            if self._removals:
+                await self._remove()
+            return 0
+        start = time.perf_counter()
+        try:
+            await self.resolver(batch)
+        except BaseException:
+            self._retry = batch
+            raise
+        for expedition in batch:
+            self.active.pop(expedition.user_id, None)
+        self._removals += [e.user_id for e in batch]
+        BATCH_SIZE.observe(len(batch))
+        BATCH_SECONDS.observe(time.perf_counter() - start)
+        # Resolved is resolved: a failed delete is retried, never the rewards
+        await self._remove()
+        return len(batch)
+
+    async def _remove(self) -> None:
+        user_ids, self._removals = self._removals, []
+        try:
+            await self.store.remove(user_ids)
+        except BaseException:
+            self._removals = user_ids + self._removals
+            raise
@@ -0,0 +1,135 @@
+# extensions.py
+# Startup pipeline for the cogs: finds them next to this package rather than
+# in the working directory and loads each one, timing it. Cogs listed in
+# cogs.LAZY_COGS get stub prefix commands and are loaded on first use.
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import List, Mapping, NamedTuple, Optional, Sequence
+
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+COGS_DIR = Path(__file__).resolve().parents[1] / "cogs"
+COGS_PACKAGE = "cogs"
+
+
+class CogLoadError(RuntimeError):
+    """A cog failed to import or set up while loading in strict mode."""
+
+
+class CogTiming(NamedTuple):
+    name: str
+    status: str  # loaded, lazy or failed
+    seconds: float = 0.0  # import and setup(); load_extension does both
+    error: Optional[str] = None
+
+
+def discover(directory: Path = COGS_DIR) -> List[str]:
+    """Cog module names in ``directory``, in a stable order."""
+    return sorted(p.stem for p in directory.glob("*.py") if not p.stem.startswith("_"))
+
+
+def _describe(e: BaseException) -> str:
+    # ExtensionFailed wraps the real error
+    cause = e.__cause__ or e
+    return f"{type(cause).__name__}: {cause}"
+
+
+async def load_cogs(
+    bot: commands.Bot,
+    directory: Path = COGS_DIR,
+    *,
+    lazy: Optional[Mapping[str, Sequence[str]]] = None,
+    strict: bool = False,
+) -> List[CogTiming]:
+    """Loads every cog in ``directory`` in name order and returns per-cog timings.
+
+    ``load_extension`` always executes the cog module afresh, so there is
+    nothing to gain from importing it ahead of time. A dependency shared by
+    several cogs is charged to whichever loaded it first.
+
+    A failing cog is logged with its traceback and skipped, or raises
+    CogLoadError when ``strict``.
+    """
+    lazy = lazy or {}
+    names = discover(directory)
+    timings: List[CogTiming] = []
+    for name in names:
+        if name in lazy:
+            continue
+        start = time.perf_counter()
+        try:
+            await bot.load_extension(f"{COGS_PACKAGE}.{name}")
+        except Exception as error:
+            seconds = time.perf_counter() - start
+            if strict:
+                raise CogLoadError(f"Cog {name} failed to load: {_describe(error)}") from error
+            log.error("Cog %s failed to load", name, exc_info=error)
+            timings.append(CogTiming(name, "failed", seconds, _describe(error)))
+        else:
+            timings.append(CogTiming(name, "loaded", time.perf_counter() - start))
+
+    for name, command_names in lazy.items():
+        if name not in names:
+            message = f"Lazy cog {name} is not in {directory}"
+            if strict:
+                raise CogLoadError(message)
+            log.warning(message)
+            continue
+        install_lazy(bot, f"{COGS_PACKAGE}.{name}", command_names)
+        timings.append(CogTiming(name, "lazy"))
+    return timings
+
+
+def install_lazy(bot: commands.Bot, extension: str, command_names: Sequence[str]) -> None:
+    """Registers stub prefix commands that load ``extension`` when first used.
+
+    ``command_names`` must cover every name and alias the cog registers. The
+    first call swaps the stubs for the real commands and re-dispatches the
+    message through ``bot.invoke``, so the real command gets the same rate
+    limits, metrics and error handling as any other; if loading fails the
+    stubs stay and the next call retries. Slash commands can't be stubbed (the synced tree needs their
+    real signatures), so lazy cogs should be prefix-only.
+    """
+    lock = asyncio.Lock()
+    stubs: List[commands.Command] = []
+
+    async def ensure_loaded() -> None:
+        async with lock:
+            if extension in bot.extensions:
+                return
+            for command in stubs:
+                bot.remove_command(command.name)
+            start = time.perf_counter()
+            try:
+                await bot.load_extension(extension)
+            except Exception:
+                for command in stubs:
+                    bot.add_command(command)
+                raise
+            log.info("Loaded %s on first use in %.1f ms", extension, (time.perf_counter() - start) * 1000)
+
+    async def stub(ctx: commands.Context) -> None:
+        await ensure_loaded()
+        real = await bot.get_context(ctx.message)
+        if real.command is None or real.command.callback is stub:
+            log.warning("%s does not define %r", extension, ctx.invoked_with)
+            return
+        await bot.invoke(real)
+
+    for name in command_names:
+        command = commands.Command(stub, name=name, hidden=True)
+        bot.add_command(command)
+        stubs.append(command)
+
+
+def format_timings(timings: Sequence[CogTiming]) -> str:
+    lines = [f"{'cog':<16} {'status':<7} {'load ms':>8}"]
+    for t in timings:
+        line = f"{t.name:<16} {t.status:<7} {t.seconds * 1000:>8.1f}"
+        lines.append(f"{line}  {t.error}" if t.error else line)
+    return "\n".join(lines)
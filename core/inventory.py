@@ -0,0 +1,592 @@
+# inventory.py
+# Inventory and economy storage: the async interface the cogs talk to, plus a
+# SQLite backend with a write-behind buffer.
+from __future__ import annotations
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from core.journal import RewardJournal, Source
+from core.leaderboard import Leaderboards
+from core.metrics import INVENTORY_LATENCY
+
+log = logging.getLogger(__name__)
+
+# Extra rows to write in the same transaction as a spend or a settlement,
+# called on the database thread with the open connection
+Write = Callable[[sqlite3.Connection], Any]
+
+
+class Grant(NamedTuple):
+    """One user's share of a batch passed to ``grant_many``."""
+
+    user_id: int
+    coins: int = 0
+    xp: int = 0
+    items: Sequence[Tuple[int, int]] = ()
+    cards: int = 0
+    kills: int = 0
+
+
+class InventoryService:
+    """No-op store; the interface every backend implements."""
+
+    async def add_items(self, user_id: int, items: List[Tuple[int, int]]):
+        pass
+
+    async def add_currency(self, user_id: int, coins: int):
+        pass
+
+    async def add_xp(self, user_id: int, xp: int):
+        pass
+
+    async def add_biome_card(self, user_id: int, amount: int = 1):
+        pass
+
+    async def consume_biome_card(self, user_id: int, amount: int = 1) -> bool:
+        return True
+
+    async def spend(
+        self, user_id: int, coins: int = 0, items: List[Tuple[int, int]] = (), source: Source = Source.SPEND,
+        write: Optional[Write] = None,
+    ) -> bool:
+        # Takes all of it or none of it; False if the user is short of anything.
+        # ``write`` runs in the spend's transaction, only if the spend succeeds
+        return True
+
+    async def settle(
+        self, credits: Mapping[int, Tuple[int, List[Tuple[int, int]]]], source: Source = Source.OTHER,
+        write: Optional[Write] = None,
+    ):
+        # user -> (coins, items) payouts; backends apply the whole batch or none of it.
+        # With ``write``, the payouts are stored right away in one transaction with it
+        for user_id, (coins, items) in credits.items():
+            await self.grant(user_id, coins=coins, items=items, source=source)
+
+    async def grant(
+        self, user_id: int, coins: int = 0, xp: int = 0, items: List[Tuple[int, int]] = (), cards: int = 0,
+        source: Source = Source.OTHER, kills: int = 0,
+    ):
+        # Items are (item ID, qty) pairs. Several rewards in one call; backends may store them as a single write.
+        # ``source`` is what the reward log records the grant under; ``kills`` counts mobs defeated for the leaderboards
+        if coins:
+            await self.add_currency(user_id, coins)
+        if xp:
+            await self.add_xp(user_id, xp)
+        if items:
+            await self.add_items(user_id, list(items))
+        if cards:
+            await self.add_biome_card(user_id, cards)
+
+    async def grant_many(self, grants: Sequence[Grant], source: Source = Source.OTHER):
+        # Many users' rewards as one call; backends apply the whole batch or none of it
+        for g in grants:
+            await self.grant(g.user_id, coins=g.coins, xp=g.xp, items=list(g.items), cards=g.cards, source=source, kills=g.kills)
+
+    async def get_profile(self, user_id: int) -> Dict[str, Any]:
+        # "items" maps item ID -> qty
+        return {"coins": 0, "xp": 0, "biome_cards": 0, "items": {}}
+
+    async def transaction(self, write: Write) -> Any:
+        # Runs ``write`` in one transaction of the inventory database and returns its result
+        raise NotImplementedError("This inventory has no database")
+
+    async def start(self):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class _Pending:
+    __slots__ = ("coins", "xp", "cards", "kills", "items")
+
+    def __init__(self):
+        self.coins = 0
+        self.xp = 0
+        self.cards = 0
+        self.kills = 0
+        self.items: Counter = Counter()
+
+    def merge(self, other: "_Pending") -> None:
+        self.coins += other.coins
+        self.xp += other.xp
+        self.cards += other.cards
+        self.kills += other.kills
+        self.items.update(other.items)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id     INTEGER PRIMARY KEY,
+    coins       INTEGER NOT NULL DEFAULT 0,
+    xp          INTEGER NOT NULL DEFAULT 0,
+    biome_cards INTEGER NOT NULL DEFAULT 0,
+    -- Lifetime counters for the leaderboards
+    cards_opened INTEGER NOT NULL DEFAULT 0,
+    kills        INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS user_items (
+    user_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    qty     INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, item_id)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_USER = """
+INSERT INTO users (user_id, coins, xp, biome_cards, kills) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    coins = coins + excluded.coins,
+    xp = xp + excluded.xp,
+    biome_cards = biome_cards + excluded.biome_cards,
+    kills = kills + excluded.kills
+"""
+
+_UPSERT_ITEM = """
+INSERT INTO user_items (user_id, item_id, qty) VALUES (?, ?, ?)
+ON CONFLICT(user_id, item_id) DO UPDATE SET qty = qty + excluded.qty
+"""
+
+
+def _migrate_leaderboard_columns(conn: sqlite3.Connection) -> bool:
+    # Databases from before the leaderboard counters; True if they were added
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+    missing = [c for c in ("cards_opened", "kills") if c not in columns]
+    for column in missing:
+        conn.execute(f"ALTER TABLE users ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    return bool(missing)
+
+
+def _migrate_item_names(conn: sqlite3.Connection) -> None:
+    # Databases from before item IDs keep items by name in `items`. Rows whose
+    # name is in items.json move to user_items; the rest stay behind.
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items'").fetchone():
+        return
+    from core.registry import registry
+
+    names = registry().items
+    rows = conn.execute("SELECT user_id, item, qty FROM items").fetchall()
+    known = [(uid, name, qty) for uid, name, qty in rows if name in names]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(_UPSERT_ITEM, [(uid, names.id(name), qty) for uid, name, qty in known])
+        if len(known) == len(rows):
+            conn.execute("DROP TABLE items")
+        else:
+            conn.executemany("DELETE FROM items WHERE user_id = ? AND item = ?", [(uid, name) for uid, name, _ in known])
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    log.info("Migrated %d inventory row(s) to item IDs", len(known))
+    if len(known) < len(rows):
+        log.warning("Left %d row(s) with unknown item names in the legacy items table", len(rows) - len(known))
+
+
+class SQLiteInventoryService(InventoryService):
+    """SQLite-backed store.
+
+    Grants are merged per user in memory and written in one transaction every
+    ``flush_interval`` seconds. All database work runs on a single dedicated
+    thread, so statements are serialized and never block the event loop.
+    With a ``journal``, every grant and card spend is also appended to the
+    reward log, which the store starts and closes along with itself. With
+    ``leaderboards``, grants and card spends update the boards as they happen,
+    and the boards are re-seeded from the users table at start and synced
+    with it periodically, so they pick up other clusters' grants and never
+    drift from the stored totals.
+    """
+
+    def __init__(
+        self, path: str, flush_interval: float = 0.25, journal: Optional[RewardJournal] = None,
+        leaderboards: Optional[Leaderboards] = None,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.journal = journal
+        self.leaderboards = leaderboards
+        self._pending: Dict[int, _Pending] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inventory-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None  # the latest batch sent to the DB thread
+        self._backfill = False  # counters just added; fill them from the leaderboard snapshot
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def start(self):
+        if self._conn is not None:
+            return
+        await self._run(self._open)
+        if self.journal is not None:
+            await self.journal.start()
+        if self.leaderboards is not None:
+            # The users table is the source of truth; the boards are rebuilt from it now and kept in step with it
+            await self.leaderboards.start(self._totals)
+        self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._conn is not None:
+            await self.flush()
+            await self._run(self._conn.close)
+            self._conn = None
+        if self.journal is not None:
+            await self.journal.close()
+        if self.leaderboards is not None:
+            await self.leaderboards.close()
+        self._executor.shutdown(wait=True)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._backfill = _migrate_leaderboard_columns(conn)
+        _migrate_item_names(conn)
+        self._conn = conn
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+        finally:
+            INVENTORY_LATENCY.observe(time.perf_counter() - start, fn.__name__.lstrip("_"))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Inventory flush failed; will retry")
+
+    # -- buffered writes -----------------------------------------------------
+
+    def _buffer(self, user_id: int) -> _Pending:
+        pending = self._pending.get(user_id)
+        if pending is None:
+            pending = self._pending[user_id] = _Pending()
+        return pending
+
+    async def add_items(self, user_id: int, items: List[Tuple[int, int]]):
+        await self.grant(user_id, items=items)
+
+    async def add_currency(self, user_id: int, coins: int):
+        await self.grant(user_id, coins=coins)
+
+    async def add_xp(self, user_id: int, xp: int):
+        await self.grant(user_id, xp=xp)
+
+    async def add_biome_card(self, user_id: int, amount: int = 1):
+        await self.grant(user_id, cards=amount)
+
+    async def grant(
+        self, user_id: int, coins: int = 0, xp: int = 0, items: List[Tuple[int, int]] = (), cards: int = 0,
+        source: Source = Source.OTHER, kills: int = 0,
+    ):
+        self._credit(user_id, coins, xp, items, cards, source, kills)
+
+    async def grant_many(self, grants: Sequence[Grant], source: Source = Source.OTHER):
+        # Buffered without yielding, so the whole batch goes out in one flush transaction
+        for g in grants:
+            self._credit(g.user_id, g.coins, g.xp, g.items, g.cards, source, g.kills)
+
+    async def settle(
+        self, credits: Mapping[int, Tuple[int, List[Tuple[int, int]]]], source: Source = Source.OTHER,
+        write: Optional[Write] = None,
+    ):
+        if write is None:
+            # Buffered without yielding, so the whole batch goes out in one flush transaction
+            for user_id, (coins, items) in credits.items():
+                self._credit(user_id, coins, 0, items, 0, source, 0)
+            return
+        users = [(user_id, coins, 0, 0, 0) for user_id, (coins, _) in credits.items() if coins]
+        items = [(user_id, item_id, qty) for user_id, (_, owed) in credits.items() for item_id, qty in owed if qty]
+        await self._run(self._settle, users, items, write)
+        for user_id, (coins, owed) in credits.items():
+            self._record(user_id, coins, 0, owed, 0, source, 0)
+
+    def _settle(self, users: List[Tuple[int, int, int, int, int]], items: List[Tuple[int, int, int]], write: Write) -> None:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(_UPSERT_USER, users)
+            conn.executemany(_UPSERT_ITEM, items)
+            write(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _credit(
+        self, user_id: int, coins: int, xp: int, items: List[Tuple[int, int]], cards: int, source: Source, kills: int,
+    ) -> None:
+        self._record(user_id, coins, xp, items, cards, source, kills)
+        pending = self._buffer(user_id)
+        pending.coins += coins
+        pending.xp += xp
+        pending.cards += cards
+        pending.kills += kills
+        for item_id, qty in items:
+            pending.items[item_id] += qty
+
+    def _record(
+        self, user_id: int, coins: int, xp: int, items: List[Tuple[int, int]], cards: int, source: Source, kills: int,
+    ) -> None:
+        # The reward log and the boards see a grant as soon as it is made, buffered or not
+        if self.journal is not None:
+            self.journal.record(user_id, source, coins, xp, cards, items)
+        if self.leaderboards is not None:
+            self.leaderboards.add(user_id, coins=coins, xp=xp, kills=kills)
+
+    async def flush(self):
+        """Returns once every grant buffered before the call is in the database.
+
+        That includes a batch another flush is still writing. Raises if the
+        write fails; the grants stay buffered for the next flush.
+        """
+        if self._conn is None:
+            return
+        # A batch still on its way; one that failed earlier is back in the buffer
+        previous = self._writing if self._writing is not None and not self._writing.done() else None
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            self._writing = writing = asyncio.ensure_future(self._run(self._write_batch, batch))
+            # Re-queued from the future itself, before any waiter resumes; a
+            # cancelled flush still commits on the DB thread
+            writing.add_done_callback(functools.partial(self._requeue, batch))
+            await asyncio.shield(writing)
+        # The DB thread runs writes in order, so that batch is done by now;
+        # this raises if it failed and its grants went back in the buffer
+        if previous is not None:
+            await asyncio.shield(previous)
+
+    def _requeue(self, batch: Dict[int, _Pending], writing: asyncio.Future) -> None:
+        if writing.cancelled() or writing.exception() is None:
+            return
+        # Put the batch back with anything buffered meanwhile
+        for user_id, pending in batch.items():
+            self._buffer(user_id).merge(pending)
+
+    def _write_batch(self, batch: Dict[int, _Pending]) -> None:
+        conn = self._conn
+        users = [
+            (uid, p.coins, p.xp, p.cards, p.kills)
+            for uid, p in batch.items()
+            if p.coins or p.xp or p.cards or p.kills
+        ]
+        items = [
+            (uid, item_id, qty)
+            for uid, p in batch.items()
+            for item_id, qty in p.items.items()
+            if qty
+        ]
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(_UPSERT_USER, users)
+            conn.executemany(_UPSERT_ITEM, items)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # -- atomic and read paths -----------------------------------------------
+
+    async def consume_biome_card(self, user_id: int, amount: int = 1) -> bool:
+        if self._conn is None:
+            return False
+        # Fold buffered card grants into the same transaction as the spend
+        pending = self._pending.get(user_id)
+        granted = 0
+        if pending is not None:
+            granted, pending.cards = pending.cards, 0
+        try:
+            consumed = await self._run(self._consume_cards, user_id, granted, amount)
+        except BaseException:
+            if granted:
+                self._buffer(user_id).cards += granted
+            raise
+        if consumed and self.journal is not None:
+            self.journal.record(user_id, Source.SPEND, cards=-amount)
+        if consumed and self.leaderboards is not None:
+            self.leaderboards.add(user_id, cards=amount)
+        return consumed
+
+    def _consume_cards(self, user_id: int, granted: int, amount: int) -> bool:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if granted:
+                conn.execute(_UPSERT_USER, (user_id, 0, 0, granted, 0))
+            cur = conn.execute(
+                "UPDATE users SET biome_cards = biome_cards - ?, cards_opened = cards_opened + ? "
+                "WHERE user_id = ? AND biome_cards >= ?",
+                (amount, amount, user_id, amount),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return cur.rowcount == 1
+
+    async def spend(
+        self, user_id: int, coins: int = 0, items: List[Tuple[int, int]] = (), source: Source = Source.SPEND,
+        write: Optional[Write] = None,
+    ) -> bool:
+        if self._conn is None:
+            return False
+        wanted = Counter()
+        for item_id, qty in items:
+            wanted[item_id] += qty
+        # Fold everything buffered for the user into the same transaction as the spend
+        pending = self._pending.pop(user_id, None)
+        try:
+            spent = await self._run(self._spend, user_id, pending, coins, list(wanted.items()), write)
+        except BaseException:
+            if pending is not None:
+                self._buffer(user_id).merge(pending)
+            raise
+        if spent:
+            if self.journal is not None:
+                self.journal.record(user_id, source, coins=-coins, items=[(i, -q) for i, q in wanted.items()])
+            if self.leaderboards is not None:
+                self.leaderboards.add(user_id, coins=-coins)
+        return spent
+
+    def _spend(
+        self, user_id: int, pending: Optional[_Pending], coins: int, items: List[Tuple[int, int]], write: Optional[Write],
+    ) -> bool:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if pending is not None:
+                conn.execute(_UPSERT_USER, (user_id, pending.coins, pending.xp, pending.cards, pending.kills))
+                conn.executemany(_UPSERT_ITEM, [(user_id, i, q) for i, q in pending.items.items() if q])
+            # The folded grants commit either way; only the spend is undone when short
+            conn.execute("SAVEPOINT spend")
+            spent = not coins or conn.execute(
+                "UPDATE users SET coins = coins - ? WHERE user_id = ? AND coins >= ?", (coins, user_id, coins),
+            ).rowcount == 1
+            for item_id, qty in items:
+                if not spent:
+                    break
+                spent = conn.execute(
+                    "UPDATE user_items SET qty = qty - ? WHERE user_id = ? AND item_id = ? AND qty >= ?",
+                    (qty, user_id, item_id, qty),
+                ).rowcount == 1
+            conn.execute("RELEASE spend" if spent else "ROLLBACK TO spend")
+            if not spent:
+                conn.execute("RELEASE spend")
+            elif write is not None:
+                write(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return spent
+
+    async def get_profile(self, user_id: int) -> Dict[str, Any]:
+        if self._conn is None:
+            return await super().get_profile(user_id)
+        profile = await self._run(self._read_profile, user_id)
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            profile["coins"] += pending.coins
+            profile["xp"] += pending.xp
+            profile["biome_cards"] += pending.cards
+            for item_id, qty in pending.items.items():
+                profile["items"][item_id] = profile["items"].get(item_id, 0) + qty
+        return profile
+
+    async def transaction(self, write: Write) -> Any:
+        if self._conn is None:
+            raise RuntimeError("The inventory is not started")
+        return await self._run(self._transaction, write)
+
+    def _transaction(self, write: Write) -> Any:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = write(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    async def _totals(self) -> List[Tuple[int, int, int, int, int]]:
+        # Stored totals plus what this process still has buffered; other
+        # clusters' grants show up here once they flush. A batch that is
+        # being flushed while this reads can be missed once; the next sync
+        # picks it up.
+        if self._backfill:
+            self._backfill = False
+            boards = self.leaderboards.boards
+            opened, kills = boards["cards"].scores, boards["kills"].scores
+            counters = [(u, opened.get(u, 0), kills.get(u, 0)) for u in opened.keys() | kills.keys()]
+            if counters:
+                await self._run(self._write_counters, counters)
+        rows = await self._run(self._read_totals)
+        pending = self._pending
+        if not pending:
+            return rows
+        out = []
+        for user_id, coins, xp, opened, kills in rows:
+            p = pending.get(user_id)
+            out.append((user_id, coins + p.coins, xp + p.xp, opened, kills + p.kills) if p is not None else (user_id, coins, xp, opened, kills))
+        # Players with nothing stored yet, only buffered grants
+        stored = {row[0] for row in rows}
+        for user_id, p in pending.items():
+            if user_id not in stored and (p.coins or p.xp or p.kills):
+                out.append((user_id, p.coins, p.xp, 0, p.kills))
+        return out
+
+    def _write_counters(self, counters: List[Tuple[int, int, int]]) -> None:
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO users (user_id, cards_opened, kills) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET cards_opened = excluded.cards_opened, kills = excluded.kills",
+                counters,
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        log.info("Carried %d player(s)' card and kill counts over from the leaderboard snapshot", len(counters))
+
+    def _read_totals(self) -> List[Tuple[int, int, int, int, int]]:
+        return self._conn.execute(
+            "SELECT user_id, coins, xp, cards_opened, kills FROM users "
+            "WHERE coins != 0 OR xp != 0 OR cards_opened != 0 OR kills != 0"
+        ).fetchall()
+
+    def _read_profile(self, user_id: int) -> Dict[str, Any]:
+        conn = self._conn
+        row = conn.execute(
+            "SELECT coins, xp, biome_cards FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone() or (0, 0, 0)
+        items = dict(conn.execute("SELECT item_id, qty FROM user_items WHERE user_id = ? AND qty > 0", (user_id,)))
+        return {"coins": row[0], "xp": row[1], "biome_cards": row[2], "items": items}
@@ -0,0 +1,493 @@
+# journal.py
+# Append-only reward log: every grant and card spend is written as fixed-size
+# binary records, batched into checksummed frames with one fsync per commit
+# window. Snapshots compact sealed log segments into per-user totals, and
+# replay() rebuilds balances from the latest snapshot plus the log tail by
+# memory-mapping the files.
+#
+# Directory layout, where N is a generation number:
+#   segment-N.log    MAGIC, then frames: <length, crc32> + length bytes of records
+#   snapshot-N.snap  totals covering every segment up to and including N
+from __future__ import annotations
+import asyncio
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+COMMITS = METRICS.histogram(
+    "reward_log_commit_seconds", "Reward log frame write plus fsync, including any wait for the writer thread.")
+RECORDS = METRICS.counter("reward_log_records_total", "Records appended to the reward log.")
+SNAPSHOTS = METRICS.counter("reward_log_snapshots_total", "Reward log compactions.", ("result",))
+
+SEGMENT_MAGIC = b"RWDLOG01"
+SNAPSHOT_MAGIC = b"RWDSNP01"
+
+# user, unix time, kind, source, item, coins | qty, xp, cards
+RECORD = struct.Struct("<QIBBHqqi")
+TOTALS, ITEM = 0, 1
+FRAME = struct.Struct("<II")  # payload length, crc32 of the payload
+# generation, records covered, user rows, item rows, crc32 of the body
+SNAPSHOT_HEADER = struct.Struct("<QQQQI")
+SNAPSHOT_USER = struct.Struct("<Qqqq")  # user, coins, xp, cards
+SNAPSHOT_ITEM = struct.Struct("<QHq")  # user, item, qty
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+class Source(IntEnum):
+    """What a record came from; stored in one byte."""
+
+    OTHER = 0
+    BIOME = 1
+    CHEST = 2
+    MOB = 3
+    EXPLORE = 4
+    ADMIN = 5
+    SPEND = 6  # biome cards consumed; cards is negative
+    EXPEDITION = 7
+    MARKET = 8  # escrow taken (negative) and trade payouts or refunds
+
+
+class JournalError(RuntimeError):
+    """A log or snapshot file is not in the expected format."""
+
+
+def _segment_path(directory: Path, gen: int) -> Path:
+    return directory / f"segment-{gen:08d}.log"
+
+
+def _snapshot_path(directory: Path, gen: int) -> Path:
+    return directory / f"snapshot-{gen:08d}.snap"
+
+
+def _generations(directory: Path, pattern: str) -> List[Tuple[int, Path]]:
+    found = []
+    for path in directory.glob(pattern):
+        try:
+            found.append((int(path.stem.split("-", 1)[1]), path))
+        except ValueError:
+            continue
+    return sorted(found)
+
+
+def segments(directory: Path) -> List[Tuple[int, Path]]:
+    return _generations(Path(directory), "segment-*.log")
+
+
+def snapshots(directory: Path) -> List[Tuple[int, Path]]:
+    return _generations(Path(directory), "snapshot-*.snap")
+
+
+def _fsync_dir(directory: Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# -- replay ------------------------------------------------------------------
+
+class Balances:
+    """Per-user totals rebuilt from snapshots and log records.
+
+    Item quantities live in one flat dict keyed by ``user << 16 | item`` so
+    the replay loop does a single lookup per record.
+    """
+
+    __slots__ = ("users", "items", "records", "generation")
+
+    def __init__(self):
+        self.users: Dict[int, List[int]] = {}  # user -> [coins, xp, cards]
+        self.items: Dict[int, int] = {}
+        self.records = 0
+        self.generation = 0  # snapshot the totals started from
+
+    def apply(self, payload: memoryview) -> None:
+        users = self.users
+        items = self.items
+        get_item = items.get
+        get_user = users.get
+        for user, _, kind, _, item, a, b, c in RECORD.iter_unpack(payload):
+            if kind:
+                key = user << 16 | item
+                items[key] = get_item(key, 0) + a
+            else:
+                totals = get_user(user)
+                if totals is None:
+                    users[user] = [a, b, c]
+                else:
+                    totals[0] += a
+                    totals[1] += b
+                    totals[2] += c
+        self.records += len(payload) // RECORD.size
+
+    def merge(self, other: "Balances") -> None:
+        for user, (coins, xp, cards) in other.users.items():
+            totals = self.users.setdefault(user, [0, 0, 0])
+            totals[0] += coins
+            totals[1] += xp
+            totals[2] += cards
+        for key, qty in other.items.items():
+            self.items[key] = self.items.get(key, 0) + qty
+        self.records += other.records
+
+    def profile(self, user_id: int) -> Dict[str, Any]:
+        """The user's totals in the shape InventoryService.get_profile returns."""
+        coins, xp, cards = self.users.get(user_id, (0, 0, 0))
+        items = {key & 0xFFFF: qty for key, qty in self.items.items() if key >> 16 == user_id and qty}
+        return {"coins": coins, "xp": xp, "biome_cards": cards, "items": items}
+
+    def item_rows(self) -> Iterable[Tuple[int, int, int]]:
+        for key, qty in self.items.items():
+            if qty:
+                yield key >> 16, key & 0xFFFF, qty
+
+
+def _map(path: Path, magic: bytes):
+    # Returns (file, mmap) or None for a file too short to hold anything
+    f = open(path, "rb")
+    size = os.fstat(f.fileno()).st_size
+    if size <= len(magic):
+        f.close()
+        return None
+    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if m[:len(magic)] != magic:
+        m.close()
+        f.close()
+        raise JournalError(f"{path} is not a reward log file")
+    return f, m
+
+
+def _frame_end(m, view: memoryview, pos: int) -> int:
+    # End offset of an intact frame at ``pos``, or 0
+    length, crc = FRAME.unpack_from(m, pos)
+    start = pos + FRAME.size
+    end = start + length
+    if not length or end > len(m) or length % RECORD.size:
+        return 0
+    with view[start:end] as payload:
+        return end if zlib.crc32(payload) == crc else 0
+
+
+def replay_segment(path: Path, balances: Balances) -> None:
+    """Applies every intact frame of one segment.
+
+    A torn or corrupt frame is skipped by scanning forward to the next
+    offset that holds an intact frame, so one bad write (say, a partial
+    write that was retried) doesn't drop the frames after it.
+    """
+    mapped = _map(path, SEGMENT_MAGIC)
+    if mapped is None:
+        return
+    f, m = mapped
+    try:
+        size = len(m)
+        pos = len(SEGMENT_MAGIC)
+        with memoryview(m) as view:
+            while pos + FRAME.size <= size:
+                end = _frame_end(m, view, pos)
+                if not end:
+                    bad = pos
+                    pos += 1
+                    while pos + FRAME.size <= size and not _frame_end(m, view, pos):
+                        pos += 1
+                    if pos + FRAME.size > size:
+                        log.warning("Ignoring %d byte(s) after a torn frame at offset %d in %s", size - bad, bad, path)
+                        break
+                    log.warning("Skipped %d byte(s) of a corrupt frame at offset %d in %s", pos - bad, bad, path)
+                    continue
+                with view[pos + FRAME.size:end] as payload:
+                    balances.apply(payload)
+                pos = end
+    finally:
+        m.close()
+        f.close()
+
+
+def load_snapshot(path: Path) -> Balances:
+    balances = Balances()
+    mapped = _map(path, SNAPSHOT_MAGIC)
+    if mapped is None:
+        raise JournalError(f"{path} is truncated")
+    f, m = mapped
+    try:
+        start = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size
+        gen, records, n_users, n_items, crc = SNAPSHOT_HEADER.unpack_from(m, len(SNAPSHOT_MAGIC))
+        users_end = start + n_users * SNAPSHOT_USER.size
+        end = users_end + n_items * SNAPSHOT_ITEM.size
+        with memoryview(m) as view, view[start:end] as body:
+            if end != len(m) or zlib.crc32(body) != crc:
+                raise JournalError(f"{path} is corrupt")
+            with view[start:users_end] as users:
+                balances.users = {u: [c, x, k] for u, c, x, k in SNAPSHOT_USER.iter_unpack(users)}
+            with view[users_end:end] as items:
+                balances.items = {u << 16 | i: q for u, i, q in SNAPSHOT_ITEM.iter_unpack(items)}
+    finally:
+        m.close()
+        f.close()
+    balances.records = records
+    balances.generation = gen
+    return balances
+
+
+def replay(directory: Path, upto: Optional[int] = None) -> Balances:
+    """Balances from the newest snapshot plus every later segment (through ``upto``)."""
+    directory = Path(directory)
+    snaps = [(gen, path) for gen, path in snapshots(directory) if upto is None or gen <= upto]
+    balances = load_snapshot(snaps[-1][1]) if snaps else Balances()
+    for gen, path in segments(directory):
+        if gen > balances.generation and (upto is None or gen <= upto):
+            replay_segment(path, balances)
+    return balances
+
+
+def write_snapshot(directory: Path, balances: Balances, gen: int) -> Path:
+    """Writes ``balances`` as snapshot ``gen``, atomically."""
+    users = [(u, c, x, k) for u, (c, x, k) in balances.users.items() if c or x or k]
+    items = list(balances.item_rows())
+    body = bytearray(len(users) * SNAPSHOT_USER.size + len(items) * SNAPSHOT_ITEM.size)
+    offset = 0
+    for row in users:
+        SNAPSHOT_USER.pack_into(body, offset, *row)
+        offset += SNAPSHOT_USER.size
+    for row in items:
+        SNAPSHOT_ITEM.pack_into(body, offset, *row)
+        offset += SNAPSHOT_ITEM.size
+    header = SNAPSHOT_HEADER.pack(gen, balances.records, len(users), len(items), zlib.crc32(body))
+    path = _snapshot_path(directory, gen)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(directory)
+    return path
+
+
+def compact(directory: Path, upto: int) -> Path:
+    """Folds segments through ``upto`` into a snapshot, then deletes what it covers."""
+    directory = Path(directory)
+    balances = replay(directory, upto)
+    path = write_snapshot(directory, balances, upto)
+    for gen, old in segments(directory):
+        if gen <= upto:
+            old.unlink()
+    for gen, old in snapshots(directory):
+        if gen < upto:
+            old.unlink()
+    log.info("Compacted reward log through generation %d: %d record(s), %d user(s)", upto, balances.records, len(balances.users))
+    return path
+
+
+def export_sqlite(balances: Balances, path: str) -> None:
+    """Writes ``balances`` into a fresh inventory database at ``path``."""
+    from core.inventory import _SCHEMA
+
+    if os.path.exists(path):
+        raise FileExistsError(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO users (user_id, coins, xp, biome_cards) VALUES (?, ?, ?, ?)",
+            ((u, c, x, k) for u, (c, x, k) in balances.users.items()),
+        )
+        conn.executemany("INSERT INTO user_items (user_id, item_id, qty) VALUES (?, ?, ?)", balances.item_rows())
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+# -- writer ------------------------------------------------------------------
+
+class RewardJournal:
+    """Appends reward records with group commit.
+
+    ``record()`` only packs bytes into a buffer on the event loop. Every
+    ``commit_interval`` seconds the buffer goes out as one checksummed frame
+    and a single fsync on a dedicated thread, so a crash loses at most one
+    window of grants. Each start opens a new segment, and every
+    ``snapshot_interval`` seconds (0 disables) the current segment is sealed
+    and compacted into a snapshot on a worker thread.
+    """
+
+    def __init__(self, directory: str, commit_interval: float = 0.05, snapshot_interval: float = 3600.0):
+        self.directory = Path(directory)
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.generation = 0
+        self._pending = bytearray()
+        self._segment_records = 0
+        self._fd: Optional[int] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reward-log")
+        self._tasks: List[asyncio.Task] = []
+        self._compacting: Optional[asyncio.Lock] = None
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def start(self) -> None:
+        if self._fd is not None:
+            return
+        await self._run(self._open)
+        self._compacting = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        self._tasks.append(loop.create_task(self._commit_loop()))
+        if self.snapshot_interval > 0:
+            self._tasks.append(loop.create_task(self._snapshot_loop()))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks.clear()
+        if self._fd is not None:
+            await self.commit()
+            await self._run(os.close, self._fd)
+            self._fd = None
+        self._executor.shutdown(wait=True)
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        gens = [gen for gen, _ in segments(self.directory) + snapshots(self.directory)]
+        self._open_segment(max(gens, default=0) + 1)
+
+    def _open_segment(self, gen: int) -> None:
+        path = _segment_path(self.directory, gen)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, SEGMENT_MAGIC)
+            os.fsync(fd)
+            _fsync_dir(self.directory)
+        except BaseException:
+            # Leave nothing behind, so a retry can create it again
+            os.close(fd)
+            path.unlink()
+            raise
+        self._fd = fd
+        self.generation = gen
+        self._segment_records = 0
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _commit_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.commit_interval)
+            try:
+                await self.commit()
+            except Exception:
+                log.exception("Reward log commit failed; will retry")
+
+    async def _snapshot_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.compact()
+            except Exception:
+                SNAPSHOTS.inc("error")
+                log.exception("Reward log compaction failed")
+
+    # -- appends -------------------------------------------------------------
+
+    def record(
+        self, user_id: int, source: int, coins: int = 0, xp: int = 0, cards: int = 0,
+        items: Iterable[Tuple[int, int]] = (),
+    ) -> None:
+        now = int(time.time())
+        pending = self._pending
+        before = len(pending)
+        if coins or xp or cards:
+            pending += RECORD.pack(user_id, now, TOTALS, source, 0, coins, xp, cards)
+        for item_id, qty in items:
+            if qty:
+                pending += RECORD.pack(user_id, now, ITEM, source, item_id, qty, 0, 0)
+        RECORDS.inc(amount=(len(pending) - before) // RECORD.size)
+
+    @property
+    def pending_records(self) -> int:
+        return len(self._pending) // RECORD.size
+
+    async def commit(self) -> None:
+        """Writes and fsyncs everything recorded so far as one frame."""
+        if not self._pending or self._fd is None:
+            return
+        batch, self._pending = self._pending, bytearray()
+        start = time.perf_counter()
+        try:
+            # Shielded: once handed to the writer thread the frame is written
+            # even if this task is cancelled, so it must not be re-queued
+            await asyncio.shield(self._run(self._write, batch))
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            # Keep the batch ahead of anything recorded meanwhile
+            batch += self._pending
+            self._pending = batch
+            raise
+        # Timed here on the loop: metrics are only recorded from the loop thread
+        COMMITS.observe(time.perf_counter() - start)
+
+    def _write(self, payload: bytearray) -> None:
+        fd = self._fd
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        offset = os.fstat(fd).st_size
+        try:
+            with memoryview(frame) as view:
+                written = 0
+                while written < len(frame):
+                    written += os.write(fd, view[written:])
+            _fdatasync(fd)
+        except BaseException:
+            # The batch is re-queued and written again as a new frame; cut
+            # this attempt off so it doesn't sit torn in the middle of the segment
+            try:
+                os.ftruncate(fd, offset)
+            except OSError:
+                log.exception("Could not truncate a failed reward log write; replay will skip it")
+            raise
+        self._segment_records += len(payload) // RECORD.size
+
+    # -- compaction ----------------------------------------------------------
+
+    def _seal(self) -> Optional[int]:
+        # Runs on the writer thread after the last commit; empty segments are kept
+        if not self._segment_records:
+            return None
+        # The next segment is opened first: if that fails the current one stays
+        # open for appends, and the next compaction tries again
+        sealed, fd = self.generation, self._fd
+        self._open_segment(sealed + 1)
+        os.close(fd)
+        return sealed
+
+    async def compact(self) -> Optional[Path]:
+        """Seals the current segment and snapshots everything up to it."""
+        if self._fd is None:
+            return None
+        async with self._compacting:
+            await self.commit()
+            sealed = await self._run(self._seal)
+            if sealed is None:
+                return None
+            path = await asyncio.get_running_loop().run_in_executor(None, compact, self.directory, sealed)
+            SNAPSHOTS.inc("ok")
+            return path
@@ -0,0 +1,384 @@
+# leaderboard.py
+# Leaderboards kept up to date as rewards are granted: one ranked board per
+# metric, globally and for every guild a player has used the bot in. Boards
+# answer top-N and a player's rank without scanning. Scores come from the
+# inventory's users table, which all clusters share: the boards are seeded
+# from it at start and synced with it periodically. The snapshot on disk
+# keeps which guilds each player has played in.
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from core.metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+# Metric name -> display label
+BOARDS = {"coins": "Coins", "xp": "XP", "cards": "Biome Cards Opened", "kills": "Mobs Defeated"}
+
+SNAPSHOT_MAGIC = b"LDRBRD01"
+# users, memberships, crc32 of the body
+SNAPSHOT_HEADER = struct.Struct("<QQI")
+SNAPSHOT_USER = struct.Struct("<Q" + "q" * len(BOARDS))
+SNAPSHOT_MEMBER = struct.Struct("<QQ")  # guild, user
+
+# Entries per bucket of a RankedBoard before it splits
+BUCKET_SIZE = 1000
+# A board entry is one int, -score << 64 | user: ints order by (-score, user)
+# and compare much faster than tuples
+_USER_BITS = 64
+_USER_MASK = (1 << _USER_BITS) - 1
+# Players synced between yields to the event loop
+SYNC_CHUNK = 10_000
+
+# (user, coins, xp, cards, kills): one player's stored totals, in BOARDS order
+Totals = Tuple[int, int, int, int, int]
+TotalsSource = Callable[[], Awaitable[Sequence[Totals]]]
+
+
+class RankedBoard:
+    """Scores for one metric in one scope, kept in rank order.
+
+    A sorted list of buckets (a flat skip list): entries sort by ``(-score,
+    user)`` so the highest score comes first and ties go to the lower user
+    ID. Updates are two bisects and a list insert within one bucket; a rank is
+    the bucket sizes before it plus one bisect. Zero scores are not ranked.
+    """
+
+    __slots__ = ("scores", "_buckets", "_maxes")
+
+    def __init__(self, scores: Optional[Dict[int, int]] = None):
+        self.scores: Dict[int, int] = {}
+        self._buckets: List[List[int]] = []
+        self._maxes: List[int] = []
+        if scores:
+            self.scores = {u: s for u, s in scores.items() if s}
+            entries = sorted([-s << _USER_BITS | u for u, s in self.scores.items()])
+            self._buckets = [entries[i:i + BUCKET_SIZE] for i in range(0, len(entries), BUCKET_SIZE)]
+            self._maxes = [b[-1] for b in self._buckets]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def update(self, user_id: int, score: int) -> None:
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._remove(-old << _USER_BITS | user_id)
+            del self.scores[user_id]
+        if score:
+            self._insert(-score << _USER_BITS | user_id)
+            self.scores[user_id] = score
+
+    def _insert(self, entry: int) -> None:
+        maxes = self._maxes
+        if not maxes:
+            self._buckets.append([entry])
+            maxes.append(entry)
+            return
+        i = bisect_left(maxes, entry)
+        if i == len(maxes):
+            i -= 1
+            self._buckets[i].append(entry)
+            maxes[i] = entry
+        else:
+            insort(self._buckets[i], entry)
+        bucket = self._buckets[i]
+        if len(bucket) > 2 * BUCKET_SIZE:
+            half = bucket[BUCKET_SIZE:]
+            del bucket[BUCKET_SIZE:]
+            self._buckets.insert(i + 1, half)
+            maxes[i] = bucket[-1]
+            maxes.insert(i + 1, half[-1])
+
+    def _remove(self, entry: int) -> None:
+        i = bisect_left(self._maxes, entry)
+        bucket = self._buckets[i]
+        del bucket[bisect_left(bucket, entry)]
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """1-based rank, or None for a player with no score."""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        entry = -score << _USER_BITS | user_id
+        i = bisect_left(self._maxes, entry)
+        return sum(map(len, self._buckets[:i])) + bisect_left(self._buckets[i], entry) + 1
+
+    def top(self, n: int = 10, offset: int = 0) -> List[Tuple[int, int]]:
+        """``(user, score)`` pairs from rank ``offset + 1``, best first."""
+        out: List[Tuple[int, int]] = []
+        for bucket in self._buckets:
+            if offset >= len(bucket):
+                offset -= len(bucket)
+                continue
+            for entry in bucket[offset:offset + n - len(out)]:
+                out.append((entry & _USER_MASK, -(entry >> _USER_BITS)))
+            offset = 0
+            if len(out) >= n:
+                break
+        return out
+
+
+class Leaderboards:
+    """Global and per-guild boards for every metric in BOARDS.
+
+    ``add`` applies reward deltas to the global board and to the boards of
+    each guild the player has been ``seen`` in. The global boards hold the
+    player totals; joining a guild copies them into its boards. Deltas only
+    cover this process, so ``start(totals)`` seeds every board from the
+    shared store and then re-reads it every ``sync_interval`` seconds.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_interval: float = 300.0, sync_interval: float = 60.0):
+        self.path = path
+        self.save_interval = save_interval
+        self.sync_interval = sync_interval
+        self.boards: Dict[str, RankedBoard] = {m: RankedBoard() for m in BOARDS}
+        self.guilds: Dict[int, Dict[str, RankedBoard]] = {}
+        self.memberships: Dict[int, Tuple[int, ...]] = {}  # user -> guilds played in
+        self.loaded = False
+        self._dirty = False
+        self._executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="leaderboards")
+        self._saver: Optional[asyncio.Task] = None
+        self._syncer: Optional[asyncio.Task] = None
+        self._touched: Optional[Set[int]] = None  # players add() changed during a sync
+        METRICS.gauge("leaderboard_players", "Players tracked by the leaderboards.", (), lambda: {(): len(self.memberships)})
+
+    # -- updates -------------------------------------------------------------
+
+    def add(self, user_id: int, coins: int = 0, xp: int = 0, cards: int = 0, kills: int = 0) -> None:
+        guilds = self.memberships.setdefault(user_id, ())
+        if self._touched is not None:
+            self._touched.add(user_id)
+        for metric, delta in (("coins", coins), ("xp", xp), ("cards", cards), ("kills", kills)):
+            if delta:
+                board = self.boards[metric]
+                score = board.scores.get(user_id, 0) + delta
+                board.update(user_id, score)
+                for guild_id in guilds:
+                    self.guilds[guild_id][metric].update(user_id, score)
+                self._dirty = True
+
+    def seen(self, guild_id: Optional[int], user_id: int) -> None:
+        """Puts ``user_id`` on ``guild_id``'s boards the first time they play there."""
+        guilds = self.memberships.setdefault(user_id, ())
+        if guild_id is None or guild_id in guilds:
+            return
+        self.memberships[user_id] = guilds + (guild_id,)
+        boards = self.guilds.get(guild_id)
+        if boards is None:
+            boards = self.guilds[guild_id] = {m: RankedBoard() for m in BOARDS}
+        for metric, board in boards.items():
+            score = self.boards[metric].scores.get(user_id)
+            if score:
+                board.update(user_id, score)
+        self._dirty = True
+
+    def set(self, user_id: int, coins: int, xp: int, cards: int, kills: int) -> None:
+        """Replaces a player's scores with stored totals, on the global and guild boards."""
+        guilds = self.memberships.setdefault(user_id, ())
+        for metric, score in zip(BOARDS, (coins, xp, cards, kills)):
+            board = self.boards[metric]
+            if board.scores.get(user_id, 0) != score:
+                board.update(user_id, score)
+                for guild_id in guilds:
+                    self.guilds[guild_id][metric].update(user_id, score)
+                self._dirty = True
+
+    def seed(self, rows: Iterable[Totals]) -> None:
+        """Rebuilds every board from ``(user, coins, xp, cards, kills)`` totals; players not in ``rows`` score zero."""
+        columns: Dict[str, Dict[int, int]] = {m: {} for m in BOARDS}
+        for row in rows:
+            self.memberships.setdefault(row[0], ())
+            for metric, score in zip(BOARDS, row[1:]):
+                if score:
+                    columns[metric][row[0]] = score
+        self._build(columns)
+        self._dirty = True
+
+    async def sync(self, rows: Sequence[Totals]) -> None:
+        """Applies stored totals player by player, yielding to the loop every SYNC_CHUNK players.
+
+        ``rows`` is every player with a score, like for ``seed``: anyone on
+        the boards who is missing from it has dropped to zero. Players that
+        ``add`` changes while this runs are left alone; their boards are
+        newer than ``rows``.
+        """
+        listed: Set[int] = set()
+        touched = self._touched = set()
+        try:
+            for i in range(0, len(rows), SYNC_CHUNK):
+                if i:
+                    await asyncio.sleep(0)
+                for row in rows[i:i + SYNC_CHUNK]:
+                    listed.add(row[0])
+                    if row[0] not in touched:
+                        self.set(*row)
+            for board in list(self.boards.values()):
+                users = list(board.scores)
+                for i in range(0, len(users), SYNC_CHUNK):
+                    await asyncio.sleep(0)
+                    for user_id in users[i:i + SYNC_CHUNK]:
+                        if user_id not in listed and user_id not in touched:
+                            self.set(user_id, 0, 0, 0, 0)
+        finally:
+            self._touched = None
+
+    def _build(self, columns: Dict[str, Dict[int, int]]) -> None:
+        per_guild: Dict[int, List[int]] = {}
+        for user_id, guilds in self.memberships.items():
+            for guild_id in guilds:
+                per_guild.setdefault(guild_id, []).append(user_id)
+        self.boards = {m: RankedBoard(columns[m]) for m in BOARDS}
+        self.guilds = {
+            g: {m: RankedBoard({u: columns[m][u] for u in users if u in columns[m]}) for m in BOARDS}
+            for g, users in per_guild.items()
+        }
+
+    # -- queries -------------------------------------------------------------
+
+    def board(self, metric: str, guild_id: Optional[int] = None) -> RankedBoard:
+        if guild_id is None:
+            return self.boards[metric]
+        boards = self.guilds.get(guild_id)
+        return boards[metric] if boards is not None else RankedBoard()
+
+    def top(self, metric: str, guild_id: Optional[int] = None, n: int = 10, offset: int = 0) -> List[Tuple[int, int]]:
+        return self.board(metric, guild_id).top(n, offset)
+
+    def rank(self, metric: str, user_id: int, guild_id: Optional[int] = None) -> Tuple[Optional[int], int, int]:
+        """``(rank, score, ranked players)``; rank is None for a player with no score."""
+        board = self.board(metric, guild_id)
+        return board.rank(user_id), board.scores.get(user_id, 0), len(board)
+
+    # -- snapshots -----------------------------------------------------------
+
+    async def start(self, totals: Optional[TotalsSource] = None) -> None:
+        """Loads the snapshot, then seeds the scores from ``totals`` and keeps syncing them."""
+        if self._saver is not None or self._syncer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="leaderboards")
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                await loop.run_in_executor(self._executor, self._load)
+            except Exception:
+                log.exception("Could not load leaderboard snapshot %s; starting empty", self.path)
+        if totals is not None:
+            # The snapshot's scores may be behind the store after a crash; the store wins
+            self.seed(await totals())
+            if self.sync_interval > 0:
+                self._syncer = loop.create_task(self._sync_loop(totals))
+        if self.path is not None and self.save_interval > 0:
+            self._saver = loop.create_task(self._save_loop())
+
+    async def close(self) -> None:
+        for task in (self._syncer, self._saver):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._syncer = self._saver = None
+        await self.save()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _sync_loop(self, totals: TotalsSource) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync(await totals())
+            except Exception:
+                log.exception("Leaderboard sync failed")
+
+    async def _save_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await self.save()
+            except Exception:
+                log.exception("Leaderboard snapshot failed")
+
+    async def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        self._dirty = False
+        # Dict copies on the loop are C-speed; rows are packed on the worker thread
+        scores = [board.scores.copy() for board in self.boards.values()]
+        memberships = self.memberships.copy()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, scores, memberships)
+        except BaseException:
+            self._dirty = True
+            raise
+
+    def _write(self, scores: List[Dict[int, int]], memberships: Dict[int, Tuple[int, ...]]) -> None:
+        rows = [SNAPSHOT_USER.pack(u, *[column.get(u, 0) for column in scores]) for u in memberships]
+        rows += [SNAPSHOT_MEMBER.pack(g, u) for u, guilds in memberships.items() for g in guilds]
+        body = b"".join(rows)
+        n_members = (len(body) - len(memberships) * SNAPSHOT_USER.size) // SNAPSHOT_MEMBER.size
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + SNAPSHOT_HEADER.pack(len(memberships), n_members, zlib.crc32(body)))
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        with open(self.path, "rb") as f:
+            data = f.read()
+        start = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size
+        if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError("not a leaderboard snapshot")
+        n_users, n_members, crc = SNAPSHOT_HEADER.unpack_from(data, len(SNAPSHOT_MAGIC))
+        users_end = start + n_users * SNAPSHOT_USER.size
+        body = memoryview(data)[start:]
+        if len(body) != n_users * SNAPSHOT_USER.size + n_members * SNAPSHOT_MEMBER.size or zlib.crc32(body) != crc:
+            raise ValueError("leaderboard snapshot is corrupt")
+        columns: Dict[str, Dict[int, int]] = {m: {} for m in BOARDS}
+        memberships: Dict[int, Tuple[int, ...]] = {}
+        for row in SNAPSHOT_USER.iter_unpack(body[:users_end - start]):
+            memberships[row[0]] = ()
+            for metric, score in zip(BOARDS, row[1:]):
+                if score:
+                    columns[metric][row[0]] = score
+        for guild_id, user_id in SNAPSHOT_MEMBER.iter_unpack(body[users_end - start:]):
+            memberships[user_id] = memberships.get(user_id, ()) + (guild_id,)
+        self.memberships = memberships
+        self._build(columns)
+        self.loaded = True
+        log.info("Loaded leaderboards for %d player(s) in %d guild(s)", len(memberships), len(self.guilds))
+
+
+def install_leaderboards(bot, boards: Leaderboards) -> None:
+    """Records which guilds each player uses the bot in, for the guild boards."""
+
+    async def on_command(ctx):
+        boards.seen(ctx.guild.id if ctx.guild else None, ctx.author.id)
+
+    async def on_interaction(interaction):
+        boards.seen(interaction.guild_id, interaction.user.id)
+
+    bot.add_listener(on_command)
+    bot.add_listener(on_interaction)
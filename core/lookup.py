@@ -0,0 +1,130 @@
+# lookup.py
+# Key lookup for command arguments: prefix completion over a sorted token
+# index for slash autocomplete, and forgiving resolution with "did you mean"
+# suggestions for prefix commands. One index per key table, built with the
+# content registry.
+from __future__ import annotations
+import difflib
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from discord import app_commands
+
+# Discord shows at most 25 autocomplete choices
+MAX_CHOICES = 25
+# Keys sharing the most bigrams with a typo that go on to difflib scoring
+FUZZY_CANDIDATES = 64
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.casefold())
+
+
+def normalize(text: str) -> str:
+    """Case- and separator-insensitive form: "cave_spider" -> "cavespider"."""
+    return "".join(_words(text))
+
+
+def _bigrams(norm: str) -> Set[str]:
+    return {norm[i:i + 2] for i in range(len(norm) - 1)} or {norm}
+
+
+class KeyIndex:
+    """Sorted token index over one table's keys.
+
+    Every key is indexed under its whole normalized form and under each
+    trailing run of words ("Cave Spider" -> "cavespider", "spider"), so a
+    prefix finds keys by their first letters or by any later word. Lookups
+    are a bisect plus a scan over the matches. Fuzzy suggestions score only
+    the keys sharing the most letter pairs with the input, so they stay cheap
+    on large tables.
+    """
+
+    __slots__ = ("keys", "labels", "_exact", "_full", "_words", "_grams")
+
+    def __init__(self, keys: Iterable[str], labels: Optional[Mapping[str, str]] = None):
+        self.keys: Tuple[str, ...] = tuple(keys)
+        # Display names for autocomplete choices; the key itself by default
+        self.labels: Mapping[str, str] = labels or {}
+        self._exact: Dict[str, str] = {}
+        full: List[Tuple[str, str]] = []
+        words: List[Tuple[str, str]] = []
+        for key in self.keys:
+            parts = _words(key)
+            norm = "".join(parts)
+            self._exact.setdefault(norm, key)
+            full.append((norm, key))
+            words.extend(("".join(parts[i:]), key) for i in range(1, len(parts)))
+        self._full = sorted(full)
+        self._words = sorted(words)
+        grams: Dict[str, List[str]] = {}
+        for norm in self._exact:
+            for gram in _bigrams(norm):
+                grams.setdefault(gram, []).append(norm)
+        self._grams = grams
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @staticmethod
+    def _scan(entries: List[Tuple[str, str]], prefix: str, out: Dict[str, None], limit: int) -> None:
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and len(out) < limit:
+            token, key = entries[i]
+            if not token.startswith(prefix):
+                break
+            out[key] = None
+            i += 1
+
+    def complete(self, text: str, limit: int = MAX_CHOICES) -> List[str]:
+        """Keys matching ``text`` as a prefix: whole-key matches first, then word matches."""
+        prefix = normalize(text)
+        if not prefix:
+            return list(self.keys[:limit])
+        out: Dict[str, None] = {}
+        self._scan(self._full, prefix, out, limit)
+        self._scan(self._words, prefix, out, limit)
+        return list(out)
+
+    def resolve(self, text: str) -> Optional[str]:
+        """The key ``text`` names: an exact (normalized) match or an unambiguous prefix."""
+        norm = normalize(text)
+        key = self._exact.get(norm)
+        if key is not None or not norm:
+            return key
+        found = self.complete(norm, 2)
+        return found[0] if len(found) == 1 else None
+
+    def suggest(self, text: str, n: int = 3) -> List[str]:
+        """Likely keys for a failed lookup: prefix matches, else the closest spellings."""
+        found = self.complete(text, n)
+        if found:
+            return found
+        norm = normalize(text)
+        if not norm:
+            return []
+        if len(self._exact) <= FUZZY_CANDIDATES:
+            candidates = list(self._exact)
+        else:
+            shared: Counter = Counter()
+            for gram in _bigrams(norm):
+                shared.update(self._grams.get(gram, ()))
+            candidates = [c for c, _ in shared.most_common(FUZZY_CANDIDATES)]
+        close = difflib.get_close_matches(norm, candidates, n, cutoff=0.6)
+        return [self._exact[c] for c in close]
+
+    def unknown(self, what: str, text: str) -> str:
+        """An "Unknown ..." reply with suggestions when there are any."""
+        found = self.suggest(text)
+        if found:
+            return f"Unknown {what}. Did you mean: {', '.join(found)}?"
+        return f"Unknown {what}. Try: {', '.join(self.keys[:10])}" + (", ..." if len(self.keys) > 10 else "")
+
+    def choices(self, text: str) -> List[app_commands.Choice[str]]:
+        """Autocomplete choices for ``text``, labelled with display names."""
+        labels = self.labels
+        return [app_commands.Choice(name=labels.get(key, key), value=key) for key in self.complete(text)]
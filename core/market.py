@@ -0,0 +1,450 @@
+# market.py
+# Player item market: one limit order book per item with price-time priority
+# and partial fills, a table of resting orders in the inventory database, and
+# the exchange that escrows coins and items through the inventory before an
+# order can match. The books (Market, OrderBook) are plain data structures
+# with no I/O.
+from __future__ import annotations
+import asyncio
+import heapq
+import logging
+import sqlite3
+import time
+from collections import Counter
+from enum import IntEnum
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from core.journal import Source
+from core.metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+ORDERS = METRICS.counter("market_orders_total", "Orders placed on the market.", ("side",))
+FILLS = METRICS.counter("market_fills_total", "Trades between two orders.")
+
+
+class Side(IntEnum):
+    BUY = 0
+    SELL = 1
+
+
+class Order:
+    """A limit order; ``qty`` is what is left to fill."""
+
+    __slots__ = ("id", "user_id", "item_id", "side", "price", "qty", "placed")
+
+    def __init__(self, id: int, user_id: int, item_id: int, side: Side, price: int, qty: int, placed: float):
+        self.id = id
+        self.user_id = user_id
+        self.item_id = item_id
+        self.side = side
+        self.price = price
+        self.qty = qty
+        self.placed = placed
+
+
+class Fill(NamedTuple):
+    item_id: int
+    price: int  # the resting order's price
+    qty: int
+    buyer: int
+    seller: int
+    buy_id: int
+    sell_id: int
+    buy_limit: int  # the buy order's price; the difference is refunded to the buyer
+
+
+class MarketError(ValueError):
+    """An order the market won't take; the message is meant for the player."""
+
+
+class OrderBook:
+    """Resting orders for one item.
+
+    Each side is a binary heap keyed by (price, order ID), so the best price
+    comes first and, within a price, the oldest order: IDs only grow. A new
+    order matches against the other side's top until it is filled or no
+    longer crosses, then rests with whatever is left. Cancelled orders are
+    zeroed and popped when they reach the top; the heaps are rebuilt once
+    more than half their entries are dead.
+    """
+
+    __slots__ = ("item_id", "bids", "asks", "levels", "_dead")
+
+    def __init__(self, item_id: int):
+        self.item_id = item_id
+        self.bids: List[Tuple[int, int, Order]] = []  # (-price, id, order)
+        self.asks: List[Tuple[int, int, Order]] = []  # (price, id, order)
+        # Side -> price -> resting quantity, for depth display
+        self.levels: Tuple[Dict[int, int], Dict[int, int]] = ({}, {})
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self.bids) + len(self.asks) - self._dead
+
+    def match(self, order: Order) -> List[Fill]:
+        """Fills ``order`` against the book as far as its price allows and rests the rest."""
+        fills: List[Fill] = []
+        buying = order.side == Side.BUY
+        book = self.asks if buying else self.bids
+        levels = self.levels[Side.SELL if buying else Side.BUY]
+        while order.qty and book:
+            resting = book[0][2]
+            if not resting.qty:
+                heapq.heappop(book)
+                self._dead -= 1
+                continue
+            if (resting.price > order.price) if buying else (resting.price < order.price):
+                break
+            qty = min(order.qty, resting.qty)
+            order.qty -= qty
+            resting.qty -= qty
+            _take(levels, resting.price, qty)
+            if buying:
+                fills.append(Fill(self.item_id, resting.price, qty, order.user_id, resting.user_id, order.id, resting.id, order.price))
+            else:
+                fills.append(Fill(self.item_id, resting.price, qty, resting.user_id, order.user_id, resting.id, order.id, resting.price))
+            if not resting.qty:
+                heapq.heappop(book)
+        if order.qty:
+            self.rest(order)
+        return fills
+
+    def rest(self, order: Order) -> None:
+        if order.side == Side.BUY:
+            heapq.heappush(self.bids, (-order.price, order.id, order))
+        else:
+            heapq.heappush(self.asks, (order.price, order.id, order))
+        levels = self.levels[order.side]
+        levels[order.price] = levels.get(order.price, 0) + order.qty
+
+    def discard(self, order: Order) -> int:
+        """Takes a resting order off the book; returns its unfilled quantity."""
+        remaining, order.qty = order.qty, 0
+        if not remaining:
+            return 0
+        _take(self.levels[order.side], order.price, remaining)
+        self._dead += 1
+        if self._dead > 64 and self._dead * 2 > len(self.bids) + len(self.asks):
+            self.bids = [e for e in self.bids if e[2].qty]
+            self.asks = [e for e in self.asks if e[2].qty]
+            heapq.heapify(self.bids)
+            heapq.heapify(self.asks)
+            self._dead = 0
+        return remaining
+
+    def depth(self, side: Side, n: int = 5) -> List[Tuple[int, int]]:
+        """The best ``n`` price levels on ``side`` as ``(price, quantity)``."""
+        levels = self.levels[side]
+        prices = heapq.nlargest(n, levels) if side == Side.BUY else heapq.nsmallest(n, levels)
+        return [(p, levels[p]) for p in prices]
+
+
+def _take(levels: Dict[int, int], price: int, qty: int) -> None:
+    left = levels[price] - qty
+    if left:
+        levels[price] = left
+    else:
+        del levels[price]
+
+
+class Market:
+    """Every item's order book, plus each player's open orders."""
+
+    def __init__(self):
+        self.books: Dict[int, OrderBook] = {}
+        self.orders: Dict[int, Order] = {}
+        self.by_user: Dict[int, Dict[int, Order]] = {}
+        self.next_id = 1
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def book(self, item_id: int) -> OrderBook:
+        book = self.books.get(item_id)
+        if book is None:
+            book = self.books[item_id] = OrderBook(item_id)
+        return book
+
+    def place(self, user_id: int, item_id: int, side: Side, price: int, qty: int, now: Optional[float] = None) -> Tuple[Order, List[Fill]]:
+        """Matches a new limit order; the returned order is resting if its ``qty`` is non-zero."""
+        order = Order(self.next_id, user_id, item_id, side, price, qty, time.time() if now is None else now)
+        return order, self.add(order)
+
+    def add(self, order: Order) -> List[Fill]:
+        """Matches an order that already has its ID; IDs must grow, as they set time priority."""
+        self.next_id = max(self.next_id, order.id + 1)
+        fills = self.book(order.item_id).match(order)
+        for fill in fills:
+            resting = self.orders[fill.sell_id if order.side == Side.BUY else fill.buy_id]
+            if not resting.qty:
+                self._forget(resting)
+        if order.qty:
+            self.orders[order.id] = order
+            self.by_user.setdefault(order.user_id, {})[order.id] = order
+        return fills
+
+    def cancel(self, order_id: int) -> int:
+        """Cancels a resting order; returns its unfilled quantity (0 if it is not open)."""
+        order = self.orders.get(order_id)
+        if order is None:
+            return 0
+        self._forget(order)
+        return self.books[order.item_id].discard(order)
+
+    def _forget(self, order: Order) -> None:
+        del self.orders[order.id]
+        mine = self.by_user[order.user_id]
+        del mine[order.id]
+        if not mine:
+            del self.by_user[order.user_id]
+
+    def open_orders(self, user_id: int) -> List[Order]:
+        return list(self.by_user.get(user_id, {}).values())
+
+    def restore(self, orders: Iterable[Order]) -> List[Fill]:
+        """Puts stored orders back on their books in ID order.
+
+        Stored orders don't cross, except one stored just before a crash
+        that lost its fills: that one matches again here, and the fills are
+        returned.
+        """
+        fills: List[Fill] = []
+        for order in sorted(orders, key=lambda o: o.id):
+            fills += self.add(order)
+        return fills
+
+
+# user -> (coins, [(item ID, qty)]) paid out of escrow
+Credits = Dict[int, Tuple[int, List[Tuple[int, int]]]]
+
+
+def settlement(fills: Iterable[Fill]) -> Credits:
+    """What ``fills`` pay out from escrow: user -> (coins, [(item ID, qty)]).
+
+    Sellers get the trade price, buyers get the items plus the difference
+    between their limit and the trade price.
+    """
+    coins: Counter = Counter()
+    items: Dict[int, Counter] = {}
+    for fill in fills:
+        coins[fill.seller] += fill.price * fill.qty
+        coins[fill.buyer] += (fill.buy_limit - fill.price) * fill.qty
+        items.setdefault(fill.buyer, Counter())[fill.item_id] += fill.qty
+    return {
+        user_id: (coins.get(user_id, 0), list(items.get(user_id, {}).items()))
+        for user_id in set(coins) | set(items)
+    }
+
+
+def _combine(*credits: Credits) -> Credits:
+    out: Credits = {}
+    for batch in credits:
+        for user_id, (coins, items) in batch.items():
+            have_coins, have_items = out.get(user_id, (0, []))
+            out[user_id] = (have_coins + coins, have_items + list(items))
+    return out
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS market_orders (
+        order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        market   INTEGER NOT NULL,
+        user_id  INTEGER NOT NULL,
+        item_id  INTEGER NOT NULL,
+        side     INTEGER NOT NULL,
+        price    INTEGER NOT NULL,
+        qty      INTEGER NOT NULL,
+        placed   REAL    NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS market_orders_market ON market_orders (market)",
+)
+
+
+class OrderStore:
+    """Resting orders as rows of the inventory database.
+
+    The store never commits on its own: ``insert`` and ``update`` return
+    writes the inventory runs inside its escrow and payout transactions, so
+    an order is stored exactly when its escrow is taken, and a fill exactly
+    when it is paid out. ``market`` keeps each cluster's book apart in the
+    shared database. AUTOINCREMENT IDs are never reused and keep growing
+    across restarts, which also makes them the book's time priority.
+    """
+
+    def __init__(self, inventory, market: int = 0):
+        self.inventory = inventory
+        self.market = market
+
+    async def open(self) -> None:
+        await self.inventory.transaction(_create_tables)
+
+    async def load(self) -> List[Order]:
+        return await self.inventory.transaction(self._load)
+
+    def _load(self, conn: sqlite3.Connection) -> List[Order]:
+        rows = conn.execute(
+            "SELECT order_id, user_id, item_id, side, price, qty, placed FROM market_orders WHERE market = ? AND qty > 0",
+            (self.market,),
+        )
+        return [Order(i, u, item, Side(side), price, qty, placed) for i, u, item, side, price, qty, placed in rows]
+
+    def insert(self, order: Order) -> Callable[[sqlite3.Connection], None]:
+        """A write that stores ``order`` and gives it its ID."""
+        def write(conn: sqlite3.Connection) -> None:
+            order.id = conn.execute(
+                "INSERT INTO market_orders (market, user_id, item_id, side, price, qty, placed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.market, order.user_id, order.item_id, int(order.side), order.price, order.qty, order.placed),
+            ).lastrowid
+        return write
+
+    def update(self, open_orders: List[Order], closed: List[int]) -> Callable[[sqlite3.Connection], None]:
+        """A write that stores what is left of ``open_orders`` and deletes the ``closed`` order IDs."""
+        # Taken now: the orders may change again before the write runs
+        rows = [(order.qty, order.id) for order in open_orders]
+
+        def write(conn: sqlite3.Connection) -> None:
+            conn.executemany("UPDATE market_orders SET qty = ? WHERE order_id = ?", rows)
+            conn.executemany("DELETE FROM market_orders WHERE order_id = ?", [(i,) for i in closed])
+        return write
+
+
+def _create_tables(conn: sqlite3.Connection) -> None:
+    for statement in _SCHEMA:
+        conn.execute(statement)
+
+
+class Exchange:
+    """The market as the cogs see it.
+
+    Placing an order first takes its full cost out of the player's inventory
+    in one all-or-nothing spend: coins at the limit price for a buy, the
+    items for a sell. With a ``store``, the order row is written in that
+    same transaction. Matching then only moves escrow, so a fill can never
+    bounce, and each order's fills are written together with their payouts
+    in one settlement transaction. A crash between the two leaves the new
+    order stored at its full size; on start it crosses the book again and
+    its fills are replayed. A settlement that fails is retried with the next
+    one. Orders are placed and cancelled one at a time, and a placement runs
+    to the end even if the command that started it is cancelled.
+    """
+
+    def __init__(self, inventory, store: Optional[OrderStore] = None, max_open: int = 25):
+        self.inventory = inventory
+        self.store = store
+        self.max_open = max_open
+        self.market = Market()
+        self._lock: Optional[asyncio.Lock] = None
+        # Order rows and payouts whose settlement failed, written with the next one
+        self._unsaved: Set[int] = set()
+        self._owed: Credits = {}
+        self._started = False
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        # Made here rather than in __init__: on Python < 3.10 a lock binds to
+        # the loop current when it is built, and main.py builds this at import
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if self.store is not None:
+            await self.store.open()
+            # The store has every order, including what an earlier run had in memory
+            self.market = Market()
+            fills = self.market.restore(await self.store.load())
+            if self.market.orders:
+                log.info("Restored %d resting order(s)", len(self.market))
+            if fills:
+                log.warning("Replaying %d market fill(s) lost in a crash", len(fills))
+                await self._save(fills, _touched(fills))
+
+    async def close(self) -> None:
+        if not self._started:
+            return
+        self._started = False
+        async with self._lock:
+            if self._unsaved or self._owed:
+                try:
+                    await self._settle([], ())
+                except Exception:
+                    # Still consistent on disk: the fills cross again and are replayed on start
+                    log.exception("Could not store %d market order(s) on close", len(self._unsaved))
+
+    async def place(self, user_id: int, item_id: int, side: Side, price: int, qty: int) -> Tuple[Order, List[Fill]]:
+        """Escrows, matches and settles a limit order; raises MarketError if it can't be placed."""
+        if price <= 0 or qty <= 0:
+            raise MarketError("Price and quantity must be at least 1.")
+        return await asyncio.shield(self._place(user_id, item_id, side, price, qty))
+
+    async def _place(self, user_id: int, item_id: int, side: Side, price: int, qty: int) -> Tuple[Order, List[Fill]]:
+        async with self._lock:
+            if len(self.market.by_user.get(user_id, ())) >= self.max_open:
+                raise MarketError(f"You already have {self.max_open} open orders. Cancel one first.")
+            order = Order(self.market.next_id, user_id, item_id, side, price, qty, time.time())
+            write = self.store.insert(order) if self.store is not None else None
+            if side == Side.BUY:
+                escrowed = await self.inventory.spend(user_id, coins=price * qty, source=Source.MARKET, write=write)
+            else:
+                escrowed = await self.inventory.spend(user_id, items=[(item_id, qty)], source=Source.MARKET, write=write)
+            if not escrowed:
+                raise MarketError(f"You don't have {price * qty} coins." if side == Side.BUY else f"You don't have {qty} of that item.")
+            fills = self.market.add(order)
+            ORDERS.inc(side.name.lower())
+            FILLS.inc(amount=len(fills))
+            if fills or self._unsaved:
+                await self._save(fills, _touched(fills))
+            return order, fills
+
+    async def cancel(self, user_id: int, order_id: int) -> Optional[Order]:
+        """Cancels one of ``user_id``'s orders and refunds its escrow; None if they have no such order."""
+        return await asyncio.shield(self._cancel(user_id, order_id))
+
+    async def _cancel(self, user_id: int, order_id: int) -> Optional[Order]:
+        async with self._lock:
+            order = self.market.by_user.get(user_id, {}).get(order_id)
+            if order is None:
+                return None
+            remaining = self.market.cancel(order_id)
+            if order.side == Side.BUY:
+                refund = (order.price * remaining, [])
+            else:
+                refund = (0, [(order.item_id, remaining)])
+            await self._save([], [order_id], {user_id: refund})
+            # Keep the cancelled quantity on the returned order for the reply
+            return Order(order.id, user_id, order.item_id, order.side, order.price, remaining, order.placed)
+
+    async def _save(self, fills: List[Fill], changed: Iterable[int], refunds: Optional[Credits] = None) -> None:
+        try:
+            await self._settle(fills, changed, refunds)
+        except Exception:
+            # The book has moved on; what it owes is kept and goes out with the next settlement
+            log.exception("Market settlement failed; will retry")
+
+    async def _settle(self, fills: List[Fill], changed: Iterable[int], refunds: Optional[Credits] = None) -> None:
+        owed = _combine(self._owed, settlement(fills), refunds or {})
+        unsaved = self._unsaved | set(changed)
+        self._owed, self._unsaved = {}, set()
+        write = None
+        if self.store is not None:
+            orders = self.market.orders
+            write = self.store.update([orders[i] for i in unsaved if i in orders], [i for i in unsaved if i not in orders])
+        try:
+            await self.inventory.settle(owed, source=Source.MARKET, write=write)
+        except BaseException:
+            self._owed, self._unsaved = owed, unsaved
+            raise
+
+    def open_orders(self, user_id: int) -> List[Order]:
+        return self.market.open_orders(user_id)
+
+
+def _touched(fills: Iterable[Fill]) -> Set[int]:
+    """IDs of every order on either side of ``fills``."""
+    ids: Set[int] = set()
+    for fill in fills:
+        ids.add(fill.buy_id)
+        ids.add(fill.sell_id)
+    return ids
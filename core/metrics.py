@@ -0,0 +1,298 @@
+# metrics.py
+# In-process metrics: counters, fixed-bucket histograms and scrape-time
+# gauges, exported in the Prometheus text format by a small HTTP endpoint.
+#
+# Everything is recorded from the event loop thread, so the hot path is a
+# dict lookup, a bisect and two integer adds - no locks.
+from __future__ import annotations
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# Seconds; covers a cached roll (sub-ms) up to a slow Discord round trip
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """Fixed buckets; each label set gets its count array once, on first use."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[LabelValues, _HistogramChild] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        child = self.children.get(labels)
+        if child is None:
+            # One slot per bucket plus the +Inf overflow
+            child = self.children[labels] = _HistogramChild(len(self.buckets) + 1)
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+
+    def count(self, *labels: str) -> int:
+        child = self.children.get(labels)
+        return sum(child.counts) if child is not None else 0
+
+    def samples(self) -> Iterable[str]:
+        bounds = self.buckets + (math.inf,)
+        for labels, child in sorted(self.children.items()):
+            running = 0
+            for bound, n in zip(bounds, child.counts):
+                running += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {running}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {running}"
+
+
+class Gauge:
+    """Read at scrape time from a callback returning ``{label values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        if self.collect is None:
+            return
+        try:
+            values = self.collect()
+        except Exception:
+            log.exception("Collecting gauge %s failed", self.name)
+            return
+        for labels, value in sorted(values.items()):
+            if value != value:  # NaN, e.g. latency before the first heartbeat
+                continue
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self, namespace: str = "bot"):
+        self.namespace = namespace
+        self.metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labels != metric.labels:
+                raise ValueError(f"Metric {metric.name} already registered with a different shape")
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = (), collect=None) -> Gauge:
+        gauge = self._register(Gauge(f"{self.namespace}_{name}", documentation, labels, collect))
+        if collect is not None:
+            gauge.collect = collect
+        return gauge
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+COMMAND_LATENCY = METRICS.histogram(
+    "command_duration_seconds", "Command handler latency.", ("kind", "command", "status"))
+COMMAND_ERRORS = METRICS.counter(
+    "command_errors_total", "Failed command invocations per cog.", ("kind", "cog"))
+INVENTORY_LATENCY = METRICS.histogram(
+    "inventory_op_duration_seconds", "Inventory store operations, including the wait for the DB thread.", ("op",))
+GATEWAY_EVENTS = METRICS.counter(
+    "gateway_connection_events_total", "Gateway connects, disconnects and resumes.", ("shard", "event"))
+
+
+# -- bot instrumentation -----------------------------------------------------
+
+def instrument(bot) -> None:
+    """Hooks command timing, error counts and gateway events into ``bot``."""
+    perf_counter = time.perf_counter
+    invoke = bot.invoke
+
+    async def timed_invoke(ctx):
+        start = perf_counter()
+        try:
+            await invoke(ctx)
+        finally:
+            command = ctx.command
+            if command is not None:
+                failed = ctx.command_failed
+                COMMAND_LATENCY.observe(perf_counter() - start, "prefix", command.qualified_name, "error" if failed else "ok")
+                if failed:
+                    COMMAND_ERRORS.inc("prefix", command.cog_name or "none")
+
+    bot.invoke = timed_invoke
+
+    tree = bot.tree
+    interaction_check = tree.interaction_check
+    on_error = tree.on_error
+
+    async def stamped_check(interaction):
+        interaction.extras["metrics_start"] = perf_counter()
+        return await interaction_check(interaction)
+
+    async def counted_error(interaction, error):
+        command = interaction.command
+        start = interaction.extras.get("metrics_start")
+        if command is not None:
+            if start is not None:
+                COMMAND_LATENCY.observe(perf_counter() - start, "slash", command.qualified_name, "error")
+            cog = getattr(getattr(command, "binding", None), "qualified_name", None)
+            COMMAND_ERRORS.inc("slash", cog or "none")
+        await on_error(interaction, error)
+
+    tree.interaction_check = stamped_check
+    tree.on_error = counted_error
+
+    async def on_app_command_completion(interaction, command):
+        start = interaction.extras.get("metrics_start")
+        if start is not None:
+            COMMAND_LATENCY.observe(perf_counter() - start, "slash", command.qualified_name, "ok")
+
+    bot.add_listener(on_app_command_completion)
+
+    # AutoShardedBot fires the shard_* variants with the shard id as well
+    if isinstance(bot, discord.AutoShardedClient):
+        for event in ("connect", "disconnect", "resumed"):
+            bot.add_listener(_shard_listener(event), f"on_shard_{event}")
+    else:
+        for event in ("connect", "disconnect", "resumed"):
+            bot.add_listener(_listener(event), f"on_{event}")
+
+    def gateway_latency():
+        latencies = getattr(bot, "latencies", None) or [(bot.shard_id or 0, bot.latency)]
+        return {(str(shard),): latency for shard, latency in latencies if latency != math.inf}
+
+    METRICS.gauge("gateway_latency_seconds", "Heartbeat round trip per shard.", ("shard",), gateway_latency)
+    METRICS.gauge("guilds", "Guilds visible to this process.", (), lambda: {(): len(bot.guilds)})
+    inventory = getattr(bot, "inventory", None)
+    if inventory is not None and hasattr(inventory, "_pending"):
+        METRICS.gauge("inventory_pending_users", "Users with grants waiting for the next flush.", (), lambda: {(): len(inventory._pending)})
+
+
+def _listener(event: str):
+    async def listener():
+        GATEWAY_EVENTS.inc("0", event)
+    return listener
+
+
+def _shard_listener(event: str):
+    async def listener(shard_id):
+        GATEWAY_EVENTS.inc(str(shard_id), event)
+    return listener
+
+
+# -- HTTP endpoint -----------------------------------------------------------
+
+class MetricsServer:
+    """Serves ``GET /metrics``; anything else gets a 404."""
+
+    def __init__(self, registry: Registry = METRICS, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        sock = self._server.sockets[0].getsockname()
+        self.port = sock[1]
+        log.info("Metrics endpoint on http://%s:%d/metrics", self.host, self.port)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            method, path = request.split(b" ", 2)[:2]
+            if method == b"GET" and path.split(b"?", 1)[0] == b"/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
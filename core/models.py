@@ -0,0 +1,107 @@
+# models.py
+# Content record types shared by the cogs and the content registry.
+# Records are NamedTuples (tuple-backed, no per-instance dict) and refer to
+# items and other content by small integer IDs; names are looked up through
+# the registry only when a reply is rendered.
+from __future__ import annotations
+import sys
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+CoinsRange = Tuple[int, int]
+XpRange = Tuple[int, int]
+
+
+class Names:
+    """Item ID <-> interned name table; IDs index straight into a tuple."""
+
+    __slots__ = ("_names", "_ids")
+
+    def __init__(self, pairs: Iterable[Tuple[int, str]]):
+        pairs = [(i, sys.intern(name)) for i, name in pairs]
+        names = [None] * (max((i for i, _ in pairs), default=0) + 1)
+        for i, name in pairs:
+            names[i] = name
+        self._names: Tuple[Optional[str], ...] = tuple(names)
+        self._ids: Dict[str, int] = {name: i for i, name in pairs}
+
+    def __getitem__(self, item_id: int) -> str:
+        name = self._names[item_id] if 0 <= item_id < len(self._names) else None
+        return name if name is not None else f"#{item_id}"
+
+    def id(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class LootItem(NamedTuple):
+    item: int
+    chance: float  # weight within the tier
+    min_qty: int = 1
+    max_qty: int = 1
+
+
+class ChestTier(NamedTuple):
+    id: int
+    key: str
+    display: str
+    weights: float
+    coins: CoinsRange
+    xp: XpRange
+    items: Tuple[LootItem, ...]
+    special_notes: str = ""
+
+
+class MobDrop(NamedTuple):
+    item: int
+    chance: float  # percent
+    min_qty: int = 1
+    max_qty: int = 1
+
+
+class Mob(NamedTuple):
+    id: int
+    key: str
+    name: str
+    biome_rarity: str
+    attack: int
+    health: int
+    difficulty: int  # 1-10
+    abilities: Tuple[str, ...]
+    drops: Tuple[MobDrop, ...]
+
+
+class Structure(NamedTuple):
+    id: int
+    key: str
+    name: str
+    difficulty: int
+    xp_bonus: int
+    coins_bonus: int
+    drop_bonus_percent: int
+    description: str
+
+
+class Bonus(NamedTuple):
+    xp: int = 0
+    coins: int = 0
+    drop_bonus: int = 0  # percent
+
+
+class BiomeInfo(NamedTuple):
+    id: int
+    name: str
+    rarity: str
+    chance: float
+    description: str
+    structures: Tuple[int, ...]  # Structure IDs
+    mobs: Tuple[int, ...]  # Mob IDs
+    chest_types: Tuple[int, ...]  # ChestTier IDs
+    bonus: Bonus
@@ -0,0 +1,86 @@
+# profile.py
+# Client runtime profiles: which intents, member caching and message caching
+# the bot runs with. The cogs only read ctx.author / interaction.user, which
+# arrive with each event, so the "lean" profile drops every cache they don't need.
+from __future__ import annotations
+import os
+from typing import Any, Dict, Mapping, Optional
+
+import discord
+
+PROFILES = ("default", "lean")
+
+# Events the cogs actually rely on: guild metadata, message commands, slash commands
+_LEAN_INTENTS = ("guilds", "guild_messages", "dm_messages", "message_content")
+
+
+def _parse_member_cache(raw: str) -> discord.MemberCacheFlags:
+    raw = raw.strip().lower()
+    if raw in ("none", ""):
+        return discord.MemberCacheFlags.none()
+    if raw == "all":
+        return discord.MemberCacheFlags.all()
+    flags = discord.MemberCacheFlags.none()
+    for name in raw.split(","):
+        name = name.strip()
+        if not hasattr(flags, name):
+            raise ValueError(f"Unknown member cache flag: {name!r}")
+        setattr(flags, name, True)
+    return flags
+
+
+def _parse_max_messages(raw: str) -> Optional[int]:
+    raw = raw.strip().lower()
+    if raw in ("", "none", "0", "off"):
+        return None
+    return int(raw)
+
+
+def client_options(profile: Optional[str] = None, env: Mapping[str, str] = os.environ) -> Dict[str, Any]:
+    """Keyword arguments for ``commands.Bot`` for the configured profile.
+
+    CLIENT_PROFILE picks ``default`` or ``lean``; MAX_MESSAGES, MEMBER_CACHE,
+    ENABLE_INTENTS and DISABLE_INTENTS override individual settings.
+    """
+    profile = (profile or env.get("CLIENT_PROFILE", "default")).strip().lower()
+    if profile not in PROFILES:
+        raise ValueError(f"CLIENT_PROFILE must be one of {', '.join(PROFILES)}, not {profile!r}")
+
+    if profile == "lean":
+        intents = discord.Intents.none()
+        for name in _LEAN_INTENTS:
+            setattr(intents, name, True)
+        options: Dict[str, Any] = {
+            "max_messages": None,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "chunk_guilds_at_startup": False,
+        }
+    else:
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.guilds = True
+        options = {}
+
+    for key, value in (("ENABLE_INTENTS", True), ("DISABLE_INTENTS", False)):
+        for name in filter(None, (n.strip() for n in env.get(key, "").split(","))):
+            if not hasattr(intents, name):
+                raise ValueError(f"Unknown intent in {key}: {name!r}")
+            setattr(intents, name, value)
+
+    if "MAX_MESSAGES" in env:
+        options["max_messages"] = _parse_max_messages(env["MAX_MESSAGES"])
+    if "MEMBER_CACHE" in env:
+        options["member_cache_flags"] = _parse_member_cache(env["MEMBER_CACHE"])
+    elif profile == "default":
+        # The library default, recomputed so DISABLE_INTENTS can't leave it invalid
+        options["member_cache_flags"] = discord.MemberCacheFlags.from_intents(intents)
+
+    options["intents"] = intents
+    return options
+
+
+def describe(options: Mapping[str, Any]) -> str:
+    flags = options.get("member_cache_flags")
+    members = ",".join(name for name, on in flags if on) if flags is not None else "library default"
+    max_messages = options.get("max_messages", 1000)
+    return f"intents={options['intents'].value}, member_cache={members or 'none'}, max_messages={max_messages}"
@@ -0,0 +1,187 @@
+# ratelimit.py
+# Per-command token buckets at user, guild and global scope, checked before a
+# command runs so a macro user can't drain the bot's shared send budget.
+from __future__ import annotations
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import discord
+
+from core.metrics import METRICS
+
+RATE_LIMITED = METRICS.counter("rate_limited_total", "Commands rejected by the rate limiter.", ("command", "scope"))
+
+
+class Limit(NamedTuple):
+    """``rate`` uses per ``per`` seconds, with bursts of up to ``rate``."""
+
+    rate: int
+    per: float
+
+
+class CommandLimits(NamedTuple):
+    user: Optional[Limit] = None
+    guild: Optional[Limit] = None
+
+
+# Commands that send an embed; anything not listed is unlimited
+COMMAND_LIMITS: Dict[str, CommandLimits] = {
+    "openchest": CommandLimits(user=Limit(5, 10), guild=Limit(60, 10)),
+    "openbiome": CommandLimits(user=Limit(5, 10), guild=Limit(60, 10)),
+    "fightmob": CommandLimits(user=Limit(6, 10), guild=Limit(60, 10)),
+    "explore": CommandLimits(user=Limit(3, 10), guild=Limit(40, 10)),
+    "leaderboard": CommandLimits(user=Limit(3, 10), guild=Limit(30, 10)),
+}
+# Shared by every limited command; stays under Discord's 50 requests/s global limit
+GLOBAL_LIMIT = Limit(40, 1)
+# Button clicks on a flow the command already started, keyed by that command.
+# A click only edits its own message through the interaction callback, which
+# Discord doesn't count against the bot's global limit, so these are looser
+# and skip GLOBAL_LIMIT: a long fight is 25+ clicks
+CLICK_LIMITS: Dict[str, CommandLimits] = {
+    "openchest": CommandLimits(user=Limit(30, 10)),
+    "fightmob": CommandLimits(user=Limit(30, 10)),
+}
+
+
+class Bucket:
+    """GCRA token bucket over many keys, one float per key.
+
+    Each key stores its theoretical arrival time (TAT): the moment its bucket
+    is full again. A request is allowed while TAT - now <= per - per/rate.
+    A TAT is never more than ``per`` seconds ahead of the request that set it,
+    so keys live in two generations that rotate every ``per`` seconds; a key
+    untouched for a whole generation is full and is dropped with the old
+    dict. No timers, no sweeps.
+    """
+
+    __slots__ = ("interval", "tolerance", "per", "current", "previous", "rotate_at")
+
+    def __init__(self, limit: Limit):
+        self.per = float(limit.per)
+        self.interval = self.per / limit.rate
+        self.tolerance = self.per - self.interval
+        self.current: Dict[int, float] = {}
+        self.previous: Dict[int, float] = {}
+        self.rotate_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.current) + len(self.previous)
+
+    def _tat(self, key: int, now: float) -> float:
+        if now >= self.rotate_at:
+            # Skipping a whole generation means both are stale
+            self.previous = self.current if now - self.rotate_at < self.per else {}
+            self.current = {}
+            self.rotate_at = now + self.per
+        tat = self.current.get(key)
+        if tat is None:
+            tat = self.previous.get(key, now)
+        return tat if tat > now else now
+
+    def retry_after(self, key: int, now: float) -> float:
+        """Seconds until ``key`` may act again; 0 if it may act now."""
+        over = self._tat(key, now) - now - self.tolerance
+        return over if over > 0 else 0.0
+
+    def consume(self, key: int, now: float) -> None:
+        self.current[key] = self._tat(key, now) + self.interval
+
+
+class RateLimiter:
+    def __init__(
+        self, limits: Dict[str, CommandLimits] = COMMAND_LIMITS, global_limit: Optional[Limit] = GLOBAL_LIMIT,
+        click_limits: Dict[str, CommandLimits] = CLICK_LIMITS,
+    ):
+        self.limits = dict(limits)
+        self.click_limits = dict(click_limits)
+        self.global_bucket = Bucket(global_limit) if global_limit else None
+        self._buckets: Dict[Tuple[str, str], Bucket] = {}
+        for table, prefix in ((self.limits, ""), (self.click_limits, "click ")):
+            for name, limits in table.items():
+                for scope in ("user", "guild"):
+                    limit = getattr(limits, scope)
+                    if limit is not None:
+                        self._buckets[(name, prefix + scope)] = Bucket(limit)
+
+    def check(self, command: str, user_id: int, guild_id: Optional[int], now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """Consumes a token from every bucket, or none if any is empty.
+
+        Returns ``(scope, retry_after)`` for the first empty bucket, or None
+        when the command may run.
+        """
+        if command not in self.limits:
+            return None
+        user = self._buckets.get((command, "user"))
+        guild = self._buckets.get((command, "guild")) if guild_id is not None else None
+        return self._take(command, ((user, user_id, "user"), (guild, guild_id, "guild"), (self.global_bucket, 0, "global")), now)
+
+    def check_click(self, command: str, user_id: int, guild_id: Optional[int], now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """Like ``check``, for a button click on a flow ``command`` started; uses CLICK_LIMITS."""
+        if command not in self.click_limits:
+            return None
+        user = self._buckets.get((command, "click user"))
+        guild = self._buckets.get((command, "click guild")) if guild_id is not None else None
+        return self._take(command, ((user, user_id, "user"), (guild, guild_id, "guild")), now)
+
+    def _take(self, command: str, checks: Tuple[Tuple[Optional[Bucket], int, str], ...], now: Optional[float]) -> Optional[Tuple[str, float]]:
+        now = time.monotonic() if now is None else now
+        for bucket, key, scope in checks:
+            if bucket is not None:
+                wait = bucket.retry_after(key, now)
+                if wait:
+                    RATE_LIMITED.inc(command, scope)
+                    return scope, wait
+        for bucket, key, _ in checks:
+            if bucket is not None:
+                bucket.consume(key, now)
+        return None
+
+    def tracked(self) -> int:
+        return sum(len(b) for b in self._buckets.values())
+
+
+def limit_message(scope: str, wait: float) -> str:
+    if scope == "user":
+        return f"Slow down! Try again in {wait:.1f}s."
+    return f"This server is busy, try again in {wait:.1f}s." if scope == "guild" else f"The bot is busy, try again in {wait:.1f}s."
+
+
+def install_limiter(bot, limiter: RateLimiter) -> None:
+    """Checks ``limiter`` before every prefix and slash command on ``bot``.
+
+    Rejected prefix commands get one short reply per cooldown so a spammer
+    can't turn the rejections themselves into sends; rejected slash commands
+    get an ephemeral response.
+    """
+    invoke = bot.invoke
+    notified = Bucket(Limit(1, 10))
+
+    async def limited_invoke(ctx):
+        command = ctx.command
+        if command is not None:
+            hit = limiter.check(command.qualified_name, ctx.author.id, ctx.guild.id if ctx.guild else None)
+            if hit is not None:
+                now = time.monotonic()
+                if not notified.retry_after(ctx.author.id, now):
+                    notified.consume(ctx.author.id, now)
+                    await ctx.reply(limit_message(*hit), delete_after=min(10.0, hit[1] + 1))
+                return
+        await invoke(ctx)
+
+    bot.invoke = limited_invoke
+
+    tree = bot.tree
+    interaction_check = tree.interaction_check
+
+    async def limited_check(interaction):
+        command = interaction.command
+        if command is not None and interaction.type is discord.InteractionType.application_command:
+            hit = limiter.check(command.qualified_name, interaction.user.id, interaction.guild_id)
+            if hit is not None:
+                await interaction.response.send_message(limit_message(*hit), ephemeral=True)
+                return False
+        return await interaction_check(interaction)
+
+    tree.interaction_check = limited_check
+    METRICS.gauge("rate_limit_tracked_keys", "Users and guilds with live rate limit state.", (), lambda: {(): limiter.tracked()})
@@ -0,0 +1,411 @@
+# registry.py
+# Game content (items, chest tiers, mobs, structures, biomes) loaded from the
+# JSON files in content/, validated, and compiled into an immutable snapshot
+# with its join index and samplers. Reloads build a new snapshot off the
+# event loop and publish it with one reference swap.
+#
+# Items carry explicit IDs in items.json because inventories store them;
+# tiers, mobs, structures and biomes are numbered by position and those IDs
+# are only meaningful within one snapshot.
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.content import ContentIndex, build_index
+from core.lookup import KeyIndex
+from core.metrics import METRICS
+from core.models import BiomeInfo, Bonus, ChestTier, LootItem, Mob, MobDrop, Names, Structure
+from core.sampling import SAMPLERS, AliasSampler
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+CONTENT_DIR = os.getenv("CONTENT_DIR", str(Path(__file__).resolve().parents[1] / "content"))
+# file name -> top-level list key
+FILES = {"items.json": "items", "tiers.json": "tiers", "mobs.json": "mobs", "structures.json": "structures", "biomes.json": "biomes"}
+
+LOAD_SECONDS = METRICS.histogram(
+    "content_load_seconds", "Time to read, validate and compile the content registry.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+RELOADS = METRICS.counter("content_reloads_total", "Content reload attempts.", ("result",))
+
+
+class ContentError(ValueError):
+    """The content files are missing, malformed or fail the schema."""
+
+
+# -- schema --------------------------------------------------------------------
+# Each checker returns an error message, or None if the value is fine.
+
+Checker = Callable[[Any], Optional[str]]
+
+
+def _str(v) -> Optional[str]:
+    return None if isinstance(v, str) and v else "must be a non-empty string"
+
+
+def _text(v) -> Optional[str]:
+    return None if isinstance(v, str) else "must be a string"
+
+
+def _int(lo: int = 0) -> Checker:
+    def check(v):
+        if not isinstance(v, int) or isinstance(v, bool) or v < lo:
+            return f"must be an integer >= {lo}"
+        return None
+    return check
+
+
+def _num(lo: float = 0.0, hi: float = float("inf")) -> Checker:
+    def check(v):
+        if not isinstance(v, (int, float)) or isinstance(v, bool) or not lo < v <= hi:
+            return f"must be a number in ({lo:g}, {hi:g}]"
+        return None
+    return check
+
+
+def _range(v) -> Optional[str]:
+    if not (isinstance(v, list) and len(v) == 2 and all(_int()(x) is None for x in v) and v[0] <= v[1]):
+        return "must be [min, max] with 0 <= min <= max"
+    return None
+
+
+def _list(item: Checker) -> Checker:
+    def check(v):
+        if not isinstance(v, list):
+            return "must be a list"
+        for i, x in enumerate(v):
+            err = item(x)
+            if err:
+                return f"[{i}] {err}"
+        return None
+    return check
+
+
+def _roll(v) -> Optional[str]:
+    # [name, chance %, min_qty, max_qty]
+    if not (isinstance(v, list) and len(v) == 4):
+        return "must be [name, chance, min_qty, max_qty]"
+    for err in (_str(v[0]), _num(0, 100)(v[1]), _range(v[2:])):
+        if err:
+            return err
+    return None
+
+
+def _bonus(v) -> Optional[str]:
+    if not isinstance(v, dict) or set(v) != {"xp", "coins", "drop_bonus"}:
+        return "must have exactly xp, coins and drop_bonus"
+    bad = [k for k, x in v.items() if _int()(x)]
+    return f"{', '.join(bad)} must be integers >= 0" if bad else None
+
+
+# field -> (checker, default); a default of ... means required
+SCHEMA: Dict[str, Dict[str, Tuple[Checker, Any]]] = {
+    "items": {
+        "id": (_int(1), ...), "name": (_str, ...),
+    },
+    "tiers": {
+        "key": (_str, ...), "display": (_str, ...), "weights": (_num(), ...),
+        "coins": (_range, ...), "xp": (_range, ...), "items": (_list(_roll), ...),
+        "special_notes": (_text, ""),
+    },
+    "mobs": {
+        "key": (_str, ...), "name": (_str, ...), "biome_rarity": (_str, ...),
+        "attack": (_int(), ...), "health": (_int(1), ...), "difficulty": (_int(1), ...),
+        "abilities": (_list(_str), []), "drops": (_list(_roll), []),
+    },
+    "structures": {
+        "key": (_str, ...), "name": (_str, ...), "difficulty": (_int(1), ...),
+        "xp_bonus": (_int(), 0), "coins_bonus": (_int(), 0), "drop_bonus_percent": (_int(), 0),
+        "description": (_text, ""),
+    },
+    "biomes": {
+        "name": (_str, ...), "rarity": (_str, ...), "chance": (_num(), ...), "description": (_text, ""),
+        "structures": (_list(_str), []), "mobs": (_list(_str), []), "chest_types": (_list(_str), []),
+        "bonus": (_bonus, ...),
+    },
+}
+# Fields that must be unique within a file
+UNIQUE = {"items": ("id", "name"), "tiers": ("key",), "mobs": ("key",), "structures": ("key",), "biomes": ("name",)}
+
+
+def validate(kind: str, rows: Any, where: str) -> List[Dict[str, Any]]:
+    """Checks ``rows`` against SCHEMA[kind]; returns them with defaults filled in."""
+    if not isinstance(rows, list):
+        raise ContentError(f"{where}: '{kind}' must be a list")
+    spec = SCHEMA[kind]
+    unique = UNIQUE[kind]
+    errors: List[str] = []
+    seen: Dict[str, set] = {name: set() for name in unique}
+    out = []
+    for i, row in enumerate(rows):
+        label = f"{where}: {kind}[{i}]"
+        if not isinstance(row, dict):
+            errors.append(f"{label} must be an object")
+            continue
+        label = f"{where}: {row.get(unique[-1], f'{kind}[{i}]')}"
+        for name in row.keys() - spec.keys():
+            errors.append(f"{label}: unknown field {name!r}")
+        clean = {}
+        for name, (check, default) in spec.items():
+            if name not in row:
+                if default is ...:
+                    errors.append(f"{label}: missing {name!r}")
+                    continue
+                clean[name] = default
+                continue
+            err = check(row[name])
+            if err:
+                errors.append(f"{label}: {name} {err}")
+            clean[name] = row[name]
+        for name in unique:
+            ident = row.get(name)
+            if isinstance(ident, (str, int)):
+                if ident in seen[name]:
+                    errors.append(f"{label}: duplicate {name} {ident!r}")
+                seen[name].add(ident)
+        out.append(clean)
+    if errors:
+        raise ContentError("\n".join(errors))
+    return out
+
+
+# -- compiled snapshot -----------------------------------------------------------
+
+class ContentRegistry:
+    """One immutable version of the content plus everything derived from it.
+
+    ``tiers``, ``mobs`` and ``structures`` map command keys to records;
+    the ``*_table`` tuples and ``biomes`` are indexed by record ID.
+    """
+
+    __slots__ = (
+        "version", "items", "tier_table", "mob_table", "structure_table", "biomes", "tiers", "mobs", "structures",
+        "index", "tier_keys", "mob_keys", "structure_keys", "biome_keys", "item_keys", "loot", "biome_sampler", "load_seconds", "_tier_samplers",
+    )
+
+    def __init__(
+        self, version: str, items: Names, tiers: Tuple[ChestTier, ...], mobs: Tuple[Mob, ...],
+        structures: Tuple[Structure, ...], biomes: Tuple[BiomeInfo, ...], dangling: Sequence[Tuple[str, str, str]] = (),
+    ):
+        self.version = version
+        self.items = items
+        self.tier_table = tiers
+        self.mob_table = mobs
+        self.structure_table = structures
+        self.biomes = biomes
+        self.tiers: Dict[str, ChestTier] = {t.key: t for t in tiers}
+        self.mobs: Dict[str, Mob] = {m.key: m for m in mobs}
+        self.structures: Dict[str, Structure] = {s.key: s for s in structures}
+        self.index: ContentIndex = build_index(biomes, structures, mobs, tiers, list(dangling))
+        # Argument lookup and autocomplete for the commands that take these keys
+        self.tier_keys = KeyIndex(self.tiers, {t.key: t.display for t in tiers})
+        self.mob_keys = KeyIndex(self.mobs, {m.key: m.name for m in mobs})
+        self.structure_keys = KeyIndex(self.structures, {s.key: s.name for s in structures})
+        self.biome_keys = KeyIndex(b.name for b in biomes)
+        self.item_keys = KeyIndex(items)
+        self.loot = tuple(AliasSampler(t.items, [i.chance for i in t.items]) for t in tiers)
+        self.biome_sampler = AliasSampler(biomes, [b.chance for b in biomes])
+        self.load_seconds = 0.0
+        self._tier_samplers: Dict[Tuple, AliasSampler] = {}
+        for allowed in {b.chest_types for b in biomes} | {tuple(self.tiers)}:
+            self.tier_sampler(allowed)
+
+    def tier_sampler(self, allowed: Tuple) -> AliasSampler:
+        """Sampler over the tiers in ``allowed``, given as tier keys or IDs."""
+        sampler = self._tier_samplers.get(allowed)
+        if sampler is None:
+            found = [self.tier_table[k] if isinstance(k, int) else self.tiers.get(k) for k in allowed]
+            found = [t for t in found if t is not None]
+            sampler = self._tier_samplers[allowed] = AliasSampler(found, [t.weights for t in found])
+        return sampler
+
+    def loot_sampler(self, tier: ChestTier) -> AliasSampler:
+        if tier.id < len(self.tier_table) and self.tier_table[tier.id] is tier:
+            return self.loot[tier.id]
+        # A tier from an older snapshot, held by a command that straddled a swap
+        return SAMPLERS.get(("loot", tier.key), tier.items, lambda i: i.chance)
+
+
+def _build(data: Dict[str, List[Dict[str, Any]]], version: str) -> ContentRegistry:
+    s = sys.intern
+    items = Names((r["id"], r["name"]) for r in data["items"])
+    errors: List[str] = []
+
+    def rolls(cls, rows, where):
+        out = []
+        for name, chance, lo, hi in rows:
+            item_id = items.id(name)
+            if item_id is None:
+                errors.append(f"{where}: unknown item {name!r} (add it to items.json)")
+            else:
+                out.append(cls(item_id, chance, lo, hi))
+        return tuple(out)
+
+    tiers = tuple(
+        ChestTier(
+            i, s(r["key"]), s(r["display"]), float(r["weights"]), tuple(r["coins"]), tuple(r["xp"]),
+            rolls(LootItem, r["items"], f"tiers.json: {r['key']}"), r["special_notes"],
+        )
+        for i, r in enumerate(data["tiers"])
+    )
+    mobs = tuple(
+        Mob(
+            i, s(r["key"]), s(r["name"]), s(r["biome_rarity"]), r["attack"], r["health"], r["difficulty"],
+            tuple(s(a) for a in r["abilities"]), rolls(MobDrop, r["drops"], f"mobs.json: {r['key']}"),
+        )
+        for i, r in enumerate(data["mobs"])
+    )
+    structures = tuple(
+        Structure(
+            i, s(r["key"]), s(r["name"]), r["difficulty"], r["xp_bonus"], r["coins_bonus"],
+            r["drop_bonus_percent"], r["description"],
+        )
+        for i, r in enumerate(data["structures"])
+    )
+    if errors:
+        raise ContentError("\n".join(errors))
+
+    # Biomes refer to the rest by key; unknown keys are dropped and reported
+    dangling: List[Tuple[str, str, str]] = []
+
+    def refs(biome: str, kind: str, keys: List[str], table: Sequence) -> Tuple[int, ...]:
+        ids = {rec.key: rec.id for rec in table}
+        found = []
+        for key in keys:
+            if key in ids:
+                found.append(ids[key])
+            else:
+                dangling.append((biome, kind, key))
+        return tuple(found)
+
+    biomes = tuple(
+        BiomeInfo(
+            i, s(r["name"]), s(r["rarity"]), float(r["chance"]), r["description"],
+            refs(r["name"], "structure", r["structures"], structures),
+            refs(r["name"], "mob", r["mobs"], mobs),
+            refs(r["name"], "chest tier", r["chest_types"], tiers),
+            Bonus(**r["bonus"]),
+        )
+        for i, r in enumerate(data["biomes"])
+    )
+    return ContentRegistry(version, items, tiers, mobs, structures, biomes, dangling)
+
+
+def load_registry(directory: str = CONTENT_DIR) -> ContentRegistry:
+    """Reads and compiles the content in ``directory``; raises ContentError."""
+    start = time.perf_counter()
+    digest = hashlib.sha256()
+    data: Dict[str, List[Dict[str, Any]]] = {}
+    for filename, kind in FILES.items():
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, "rb") as fp:
+                raw = fp.read()
+            doc = json.loads(raw)
+        except OSError as e:
+            raise ContentError(f"{path}: {e.strerror}") from e
+        except ValueError as e:
+            raise ContentError(f"{path}: invalid JSON: {e}") from e
+        if not isinstance(doc, dict) or doc.get("schema") != SCHEMA_VERSION:
+            raise ContentError(f"{path}: expected schema {SCHEMA_VERSION}, found {doc.get('schema') if isinstance(doc, dict) else None!r}")
+        digest.update(raw)
+        data[kind] = validate(kind, doc.get(kind), filename)
+    registry = _build(data, digest.hexdigest()[:12])
+    registry.load_seconds = time.perf_counter() - start
+    LOAD_SECONDS.observe(registry.load_seconds)
+    return registry
+
+
+# -- the live snapshot ------------------------------------------------------------
+
+_current: Optional[ContentRegistry] = None
+
+
+def registry() -> ContentRegistry:
+    """The live content. Take it once per command and use that snapshot throughout."""
+    global _current
+    if _current is None:
+        _current = load_registry()
+        log.info("Loaded content %s in %.1f ms", _current.version, _current.load_seconds * 1000)
+    return _current
+
+
+def swap(new: ContentRegistry) -> Optional[ContentRegistry]:
+    global _current
+    old, _current = _current, new
+    return old
+
+
+class ContentWatcher:
+    """Polls the content directory and hot-swaps the registry when it changes."""
+
+    def __init__(self, directory: str = CONTENT_DIR, interval: float = 2.0):
+        self.directory = directory
+        self.interval = interval
+        self._stamp = self._scan()
+        self._task: Optional[asyncio.Task] = None
+        # Made on first use: on Python < 3.10 a lock binds to the loop current
+        # when it is built, and main.py builds the watcher at import
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _scan(self) -> Tuple:
+        stamp = []
+        for filename in FILES:
+            try:
+                st = os.stat(os.path.join(self.directory, filename))
+                stamp.append((filename, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append((filename, None, None))
+        return tuple(stamp)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            stamp = self._scan()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                await self.reload()
+
+    async def reload(self) -> Optional[ContentRegistry]:
+        """Builds a new snapshot in a worker thread and swaps it in.
+
+        On any error the current content stays live and the error is logged.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.perf_counter()
+            try:
+                new = await asyncio.get_running_loop().run_in_executor(None, load_registry, self.directory)
+            except ContentError as e:
+                RELOADS.inc("error")
+                log.error("Content reload failed, keeping %s:\n%s", _current.version if _current else "nothing", e)
+                return None
+            old = swap(new)
+            RELOADS.inc("ok")
+            log.info(
+                "Content reloaded: %s -> %s (build %.1f ms, total %.1f ms)",
+                old.version if old else "none", new.version, new.load_seconds * 1000, (time.perf_counter() - start) * 1000,
+            )
+            return new
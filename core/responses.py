@@ -0,0 +1,262 @@
+# responses.py
+# Outbound response pipeline: interactions are deferred before the 3-second
+# deadline when the work behind them is slow, and prefix replies go through a
+# queue per channel that folds a backlog of embeds into one message.
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Awaitable, Deque, Dict, List, Optional, Union
+
+import discord
+
+from core.metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+TTFB = METRICS.histogram(
+    "response_ttfb_seconds", "From the user's message or interaction to the first byte we sent back.", ("kind",))
+QUEUE_WAIT = METRICS.histogram("response_queue_wait_seconds", "Time a reply spent in its channel queue.")
+SENDS = METRICS.counter("response_messages_total", "Messages sent by the scheduler.", ("kind",))
+COALESCED = METRICS.counter("response_coalesced_total", "Replies folded into another reply's message.")
+
+# Discord's per-message caps
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+# Defer if the work hasn't finished by then; the hard deadline is 3s
+DEFER_AFTER = 1.5
+FAILED = "Something went wrong, please try again."
+
+Result = Union[discord.Embed, str]
+
+
+def _since(created_at) -> float:
+    return max(0.0, (discord.utils.utcnow() - created_at).total_seconds())
+
+
+class _Reply:
+    __slots__ = ("ctx", "content", "embed", "view", "coalesce", "future", "queued")
+
+    def __init__(self, ctx, content: Optional[str], embed: Optional[discord.Embed], coalesce: bool, view: Optional[discord.ui.View] = None):
+        self.ctx = ctx
+        self.content = content
+        self.embed = embed
+        self.view = view
+        # Buttons belong to one reply's message, so those never share one
+        self.coalesce = coalesce and embed is not None and content is None and view is None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.queued = time.monotonic()
+
+
+class _Notice:
+    """Stands in for a command context when the bot posts unprompted."""
+
+    __slots__ = ("channel", "author", "message")
+
+    def __init__(self, channel, mention: str):
+        self.channel = channel
+        self.author = SimpleNamespace(mention=mention)
+        self.message = SimpleNamespace(created_at=discord.utils.utcnow())
+
+    async def reply(self, content: Optional[str] = None, embed: Optional[discord.Embed] = None, view: Optional[discord.ui.View] = None):
+        return await self.channel.send(content=content or self.author.mention, embed=embed, view=view)
+
+
+class ResponseScheduler:
+    """Sends command responses.
+
+    ``reply`` queues a prefix reply on its channel. One worker per busy
+    channel sends them in order; replies that pile up while a send is in
+    flight (a burst, or a channel sitting in a rate-limit wait) go out together
+    as one message with up to ten embeds. Channels are separate Discord
+    rate-limit buckets, so they drain independently and a hot channel doesn't
+    hold up the rest; ``max_in_flight`` caps concurrent sends overall.
+    """
+
+    def __init__(self, defer_after: float = DEFER_AFTER, max_in_flight: int = 32):
+        self.defer_after = defer_after
+        self.max_in_flight = max_in_flight
+        self._queues: Dict[int, Deque[_Reply]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        METRICS.gauge("response_queue_depth", "Replies waiting in channel queues.", (), lambda: {(): self.depth})
+        METRICS.gauge("response_busy_channels", "Channels with a reply queue.", (), lambda: {(): len(self._queues)})
+
+    @property
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    # -- prefix commands -------------------------------------------------------
+
+    async def reply(
+        self, ctx, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None, coalesce: bool = True,
+        view: Optional[discord.ui.View] = None,
+    ) -> asyncio.Future:
+        """Queues a reply and returns a future for the sent message.
+
+        Plain-text replies (errors, prompts) and replies with a ``view`` are
+        never folded into others.
+        """
+        item = _Reply(ctx, content, embed, coalesce, view)
+        channel_id = ctx.channel.id
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = deque()
+        queue.append(item)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.get_running_loop().create_task(self._drain(channel_id))
+        return item.future
+
+    async def notify(self, channel, mention: str, content: Optional[str] = None, *, embed: Optional[discord.Embed] = None) -> asyncio.Future:
+        """Queues a message for ``mention`` (a user mention) on ``channel``, like a reply.
+
+        Notices go out one per message so the mention pings: a folded
+        message is sent without pings. They stay out of the TTFB metric,
+        which measures replies to commands.
+        """
+        return await self.reply(_Notice(channel, mention), content, embed=embed, coalesce=False)
+
+    def _take_batch(self, queue: Deque[_Reply]) -> List[_Reply]:
+        batch = [queue.popleft()]
+        if not batch[0].coalesce:
+            return batch
+        chars = len(batch[0].embed)
+        while queue and queue[0].coalesce and len(batch) < MAX_EMBEDS:
+            size = len(queue[0].embed)
+            if chars + size > MAX_EMBED_CHARS:
+                break
+            chars += size
+            batch.append(queue.popleft())
+        return batch
+
+    async def _drain(self, channel_id: int) -> None:
+        if self._in_flight is None:
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        queue = self._queues[channel_id]
+        try:
+            while queue:
+                batch = self._take_batch(queue)
+                async with self._in_flight:
+                    await self._deliver(batch)
+        finally:
+            del self._queues[channel_id]
+            del self._workers[channel_id]
+
+    async def _deliver(self, batch: List[_Reply]) -> None:
+        first = batch[0]
+        now = time.monotonic()
+        for item in batch:
+            QUEUE_WAIT.observe(now - item.queued)
+        try:
+            if first.view is not None:
+                message = await first.ctx.reply(content=first.content, embed=first.embed, view=first.view)
+            elif len(batch) == 1:
+                message = await first.ctx.reply(content=first.content, embed=first.embed)
+            else:
+                # No pings: the embeds already say who they're for
+                names = ", ".join(dict.fromkeys(item.ctx.author.mention for item in batch))
+                message = await first.ctx.channel.send(
+                    content=f"Results for {names}",
+                    embeds=[item.embed for item in batch],
+                    allowed_mentions=discord.AllowedMentions.none(),
+                )
+                COALESCED.inc(amount=len(batch) - 1)
+        except Exception as e:
+            log.warning("Reply to channel %s failed: %s", first.ctx.channel.id, e)
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+                    item.future.exception()  # callers may not await the future
+            return
+        if isinstance(first.ctx, _Notice):
+            SENDS.inc("notice")
+        else:
+            SENDS.inc("prefix")
+            for item in batch:
+                TTFB.observe(_since(item.ctx.message.created_at), "prefix")
+        for item in batch:
+            if not item.future.done():
+                item.future.set_result(message)
+
+    async def close(self) -> None:
+        """Waits for every queued reply to be sent."""
+        workers = list(self._workers.values())
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    # -- slash commands --------------------------------------------------------
+
+    async def respond(
+        self, interaction: discord.Interaction, work: Union[Awaitable[Result], Result], *, slow: bool = False,
+        view: Optional[discord.ui.View] = None,
+    ) -> None:
+        """Sends what ``work`` produces: an embed, or an ephemeral text notice.
+
+        With ``slow`` the interaction is deferred before the work starts;
+        otherwise only if it takes longer than ``defer_after``. A ready
+        embed or string is sent as is. ``view`` is attached to an embed.
+        """
+        if isinstance(work, (discord.Embed, str)):
+            await interaction.response.send_message(**self._kwargs(work, view))
+            SENDS.inc("slash")
+            TTFB.observe(_since(interaction.created_at), "slash")
+            return
+        if slow:
+            # Defer before the work starts; CPU-bound rolling would otherwise
+            # run ahead of the defer request
+            await interaction.response.defer(thinking=True)
+            TTFB.observe(_since(interaction.created_at), "slash")
+            await self._followup(interaction, work, view)
+            return
+
+        task = asyncio.ensure_future(work)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), self.defer_after)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            # Same notice as a failure after deferring; unanswered, the user
+            # would get "The application did not respond"
+            await self._private_notice(interaction, FAILED)
+            raise
+        else:
+            await interaction.response.send_message(**self._kwargs(result, view))
+            SENDS.inc("slash")
+            TTFB.observe(_since(interaction.created_at), "slash")
+            return
+
+        await interaction.response.defer(thinking=True)
+        TTFB.observe(_since(interaction.created_at), "slash")
+        await self._followup(interaction, task, view)
+
+    async def _followup(self, interaction: discord.Interaction, work: Awaitable[Result], view: Optional[discord.ui.View] = None) -> None:
+        try:
+            result = await work
+        except Exception:
+            await self._private_notice(interaction, FAILED)
+            raise
+        if isinstance(result, str):
+            await self._private_notice(interaction, result)
+        else:
+            await interaction.followup.send(**self._kwargs(result, view))
+        SENDS.inc("slash")
+
+    @staticmethod
+    async def _private_notice(interaction: discord.Interaction, text: str) -> None:
+        if not interaction.response.is_done():
+            await interaction.response.send_message(text, ephemeral=True)
+            return
+        # The first follow-up after a public defer replaces the "thinking"
+        # message and ignores ephemeral, so that message is resolved and
+        # removed around a separate ephemeral follow-up instead
+        await interaction.edit_original_response(content="\N{HORIZONTAL ELLIPSIS}")
+        await interaction.followup.send(text, ephemeral=True)
+        await interaction.delete_original_response()
+
+    @staticmethod
+    def _kwargs(result: Result, view: Optional[discord.ui.View] = None) -> Dict[str, Any]:
+        if isinstance(result, discord.Embed):
+            return {"embed": result, "view": view} if view is not None else {"embed": result}
+        return {"content": result, "ephemeral": True}
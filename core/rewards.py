@@ -0,0 +1,129 @@
+# rewards.py
+# Reward pipeline: folds biome, structure and chest-tier modifiers into
+# adjusted loot tables, compiled once per combination and kept in an LRU.
+from __future__ import annotations
+import random
+from collections import OrderedDict
+from typing import Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+from core.sampling import AliasSampler
+
+
+class Modifiers(NamedTuple):
+    xp: int = 0
+    coins: int = 0
+    drop_bonus: int = 0  # percent
+
+
+def combine(biome=None, structure=None) -> Modifiers:
+    xp = coins = drop = 0
+    if biome is not None:
+        xp += biome.bonus.xp
+        coins += biome.bonus.coins
+        drop += biome.bonus.drop_bonus
+    if structure is not None:
+        xp += structure.xp_bonus
+        coins += structure.coins_bonus
+        drop += structure.drop_bonus_percent
+    return Modifiers(xp, coins, drop)
+
+
+def boosted_weights(weights: Sequence[float], drop_bonus: int) -> List[float]:
+    """Shift odds toward rarer rows.
+
+    Each weight grows by up to ``drop_bonus`` percent in proportion to how
+    rare it is next to the most common row, which itself is unchanged.
+    """
+    if not drop_bonus or not weights:
+        return list(weights)
+    top = max(weights)
+    if top <= 0:
+        return list(weights)
+    scale = drop_bonus / 100.0
+    return [w * (1.0 + scale * (1.0 - w / top)) for w in weights]
+
+
+class AdjustedTier:
+    """A chest tier with modifiers baked in; rolls like ``open a chest``."""
+
+    __slots__ = ("tier", "modifiers", "coins", "xp", "loot")
+
+    def __init__(self, tier, modifiers: Modifiers):
+        self.tier = tier
+        self.modifiers = modifiers
+        self.coins = (tier.coins[0] + modifiers.coins, tier.coins[1] + modifiers.coins)
+        self.xp = (tier.xp[0] + modifiers.xp, tier.xp[1] + modifiers.xp)
+        self.loot = AliasSampler(tier.items, boosted_weights([i.chance for i in tier.items], modifiers.drop_bonus))
+
+    def roll(self, rng: random.Random = random) -> Tuple[int, int, List[Tuple[int, int]]]:
+        items: List[Tuple[int, int]] = []
+        for _ in range(rng.randint(1, 3)):
+            chosen = self.loot.sample(rng)
+            items.append((chosen.item, rng.randint(chosen.min_qty, chosen.max_qty)))
+        return rng.randint(*self.coins), rng.randint(*self.xp), items
+
+
+class AdjustedDrops:
+    """A mob's drop list with the drop bonus applied to each chance."""
+
+    __slots__ = ("mob", "drops")
+
+    def __init__(self, mob, drop_bonus: int):
+        self.mob = mob
+        factor = 1.0 + drop_bonus / 100.0
+        self.drops = tuple((d, min(100.0, d.chance * factor)) for d in mob.drops)
+
+    def roll(self, rng: random.Random = random) -> List[Tuple[int, int]]:
+        results: List[Tuple[int, int]] = []
+        for d, chance in self.drops:
+            if rng.uniform(0, 100) <= chance:
+                results.append((d.item, rng.randint(d.min_qty, d.max_qty)))
+        return results
+
+
+class RewardTables:
+    """LRU of adjusted tables, dropped wholesale when the content changes.
+
+    ``source`` is any object identifying the content version (the content
+    index); passing a different one clears the cache.
+    """
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._source: Optional[object] = None
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, source: object, key: Hashable, build):
+        if source is not self._source:
+            self._entries.clear()
+            self._source = source
+        entries = self._entries
+        table = entries.get(key)
+        if table is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return table
+        self.misses += 1
+        table = entries[key] = build()
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        return table
+
+    def chest(self, source: object, tier, biome=None, structure=None) -> AdjustedTier:
+        key = ("chest", biome.id if biome else None, structure.id if structure else None, tier.id)
+        return self._lookup(source, key, lambda: AdjustedTier(tier, combine(biome, structure)))
+
+    def drops(self, source: object, mob, drop_bonus: int = 0) -> AdjustedDrops:
+        return self._lookup(source, ("drops", mob.id, drop_bonus), lambda: AdjustedDrops(mob, drop_bonus))
+
+    def invalidate(self) -> None:
+        self._entries.clear()
+        self._source = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+REWARD_TABLES = RewardTables()
@@ -0,0 +1,164 @@
+# sampling.py
+# Precompiled weighted samplers shared by the biome, chest and loot tables
+from __future__ import annotations
+import random
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Sequence, Sized, Tuple, TypeVar
+
+try:
+    import numpy as np
+except ImportError:  # optional: bulk rolls fall back to pure Python
+    np = None
+
+T = TypeVar("T")
+
+_np_rng = np.random.default_rng() if np is not None else None
+# Below this many draws the NumPy call overhead outweighs the loop
+VECTOR_THRESHOLD = 64
+
+
+def randint_sum(lo: int, hi: int, k: int, rng: random.Random = random) -> int:
+    """Sum of ``k`` independent ``randint(lo, hi)`` draws."""
+    if k <= 0:
+        return 0
+    if lo == hi:
+        return lo * k
+    if _np_rng is not None and k >= VECTOR_THRESHOLD:
+        return int(_np_rng.integers(lo, hi + 1, size=k).sum())
+    randint = rng.randint
+    return sum(randint(lo, hi) for _ in range(k))
+
+
+class AliasSampler(Generic[T]):
+    """Vose alias table: O(n) to build, O(1) per draw."""
+
+    __slots__ = ("items", "weights", "total", "_n", "_prob", "_alias", "_arrays")
+
+    def __init__(self, items: Sequence[T], weights: Sequence[float]):
+        if not items:
+            raise ValueError("cannot build a sampler from an empty table")
+        if len(items) != len(weights):
+            raise ValueError("items and weights must have the same length")
+        if any(w < 0 for w in weights):
+            raise ValueError("weights must be non-negative")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("weights must not all be zero")
+
+        n = len(items)
+        self.items: Tuple[T, ...] = tuple(items)
+        self.weights: Tuple[float, ...] = tuple(float(w) for w in weights)
+        self.total = total
+        self._n = n
+
+        prob = [0.0] * n
+        alias = list(range(n))
+        scaled = [w * n / total for w in self.weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to float rounding
+        for i in large:
+            prob[i] = 1.0
+        for i in small:
+            prob[i] = 1.0
+
+        self._prob = prob
+        self._alias = alias
+        self._arrays = None
+
+    def __len__(self) -> int:
+        return self._n
+
+    def sample_index(self, rng: random.Random = random) -> int:
+        # One uniform draw picks the column and the coin flip within it
+        u = rng.random() * self._n
+        i = int(u)
+        if u - i < self._prob[i]:
+            return i
+        return self._alias[i]
+
+    def sample(self, rng: random.Random = random) -> T:
+        return self.items[self.sample_index(rng)]
+
+    def sample_indices(self, k: int, rng: random.Random = random) -> List[int]:
+        n = self._n
+        prob = self._prob
+        alias = self._alias
+        rand = rng.random
+        out = [0] * k
+        for j in range(k):
+            u = rand() * n
+            i = int(u)
+            out[j] = i if u - i < prob[i] else alias[i]
+        return out
+
+    def sample_counts(self, k: int, rng: random.Random = random) -> List[int]:
+        """How many of ``k`` draws landed on each row, in row order."""
+        if _np_rng is not None and k >= VECTOR_THRESHOLD:
+            if self._arrays is None:
+                self._arrays = (np.asarray(self._prob), np.asarray(self._alias))
+            prob, alias = self._arrays
+            u = _np_rng.random(k) * self._n
+            cols = u.astype(np.intp)
+            picks = np.where(u - cols < prob[cols], cols, alias[cols])
+            return np.bincount(picks, minlength=self._n).tolist()
+        counts = [0] * self._n
+        for i in self.sample_indices(k, rng):
+            counts[i] += 1
+        return counts
+
+
+class _Entry:
+    __slots__ = ("source", "size", "sampler")
+
+    def __init__(self, source: object, size: int, sampler: AliasSampler):
+        self.source = source
+        self.size = size
+        self.sampler = sampler
+
+
+class SamplerCache:
+    """Compiled samplers keyed by table identity.
+
+    An entry is reused only while the cached source is the very same object
+    with the same length; anything else (a reassigned table, an appended
+    item) recompiles it. Content reloads should call ``clear()``.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def get(
+        self,
+        key: Hashable,
+        source: Sized,
+        weight: Callable[[T], float],
+        select: Optional[Callable[[], Sequence[T]]] = None,
+    ) -> AliasSampler[T]:
+        # ``select`` builds the rows from ``source`` on a miss (e.g. a subset
+        # of a dict); without it ``source`` itself is the row sequence.
+        entry = self._entries.get(key)
+        if entry is not None and entry.source is source and entry.size == len(source):
+            return entry.sampler
+        rows = select() if select is not None else source
+        sampler = AliasSampler(rows, [weight(x) for x in rows])
+        self._entries[key] = _Entry(source, len(source), sampler)
+        return sampler
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+SAMPLERS = SamplerCache()
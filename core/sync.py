@@ -0,0 +1,99 @@
+# sync.py
+# Hash-gated application command sync: only talk to Discord when the command
+# tree actually changed since the last successful sync.
+from __future__ import annotations
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import discord
+from discord import app_commands
+
+
+def tree_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    payload = sorted(
+        (cmd.to_dict() for cmd in tree.get_commands(guild=guild)),
+        key=lambda d: (d.get("type", 1), d["name"]),
+    )
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class SyncState:
+    """Last synced hash per scope ("global" or a guild id), kept in a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes: Dict[str, str] = {}
+        try:
+            with open(path, encoding="utf-8") as fp:
+                self.hashes = dict(json.load(fp))
+        except (OSError, ValueError):
+            self.hashes = {}
+
+    def get(self, scope: str) -> Optional[str]:
+        return self.hashes.get(scope)
+
+    def set(self, scope: str, digest: str) -> None:
+        self.hashes[scope] = digest
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump(self.hashes, fp, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class SyncResult:
+    __slots__ = ("scope", "synced", "count", "elapsed")
+
+    def __init__(self, scope: str, synced: bool, count: int, elapsed: float):
+        self.scope = scope
+        self.synced = synced
+        self.count = count
+        self.elapsed = elapsed
+
+    def __str__(self) -> str:
+        if self.synced:
+            return f"{self.scope}: synced {self.count} command(s) in {self.elapsed * 1000:.0f} ms"
+        return f"{self.scope}: unchanged, sync skipped ({self.elapsed * 1000:.0f} ms)"
+
+
+async def sync_commands(
+    tree: app_commands.CommandTree,
+    state: SyncState,
+    dev_guild_ids: Iterable[int] = (),
+    *,
+    include_global: bool = True,
+    force: bool = False,
+) -> List[SyncResult]:
+    """Sync globally and/or to development guilds when the tree changed.
+
+    Development guilds get a copy of the global commands, which Discord
+    applies instantly instead of after the global propagation delay.
+    """
+    results: List[SyncResult] = []
+    if include_global:
+        results.append(await _sync_scope(tree, state, "global", None, force))
+    for guild_id in dev_guild_ids:
+        guild = discord.Object(id=guild_id)
+        tree.copy_global_to(guild=guild)
+        results.append(await _sync_scope(tree, state, str(guild_id), guild, force))
+    return results
+
+
+async def _sync_scope(tree, state: SyncState, scope: str, guild, force: bool) -> SyncResult:
+    start = time.perf_counter()
+    digest = tree_hash(tree, guild)
+    if not force and state.get(scope) == digest:
+        return SyncResult(scope, False, 0, time.perf_counter() - start)
+    synced = await tree.sync(guild=guild)
+    state.set(scope, digest)
+    return SyncResult(scope, True, len(synced), time.perf_counter() - start)
+
+
+def parse_guild_ids(raw: Optional[str]) -> List[int]:
+    return [int(part) for part in (raw or "").replace(" ", "").split(",") if part]
@@ -0,0 +1,127 @@
+# views.py
+# Interactive messages without a live discord.ui.View per message. Each flow
+# registers one persistent dispatcher view with fixed custom IDs; messages are
+# sent with a stopped copy that only renders the buttons. What a message's
+# buttons act on lives in one bounded store: a small record per message,
+# dropped when idle past its TTL or when the store is full.
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import discord
+
+from core.metrics import METRICS
+from core.ratelimit import limit_message
+
+EVICTIONS = METRICS.counter("view_state_evictions_total", "Interactive view states dropped.", ("reason",))
+
+
+class ViewStateStore:
+    """Per-message state for button flows, bounded by count and idle time.
+
+    Entries are kept in least-recently-used order, and every access refreshes
+    the TTL, so the front of the store is also the entry that expires first.
+    Expired entries are swept from the front on every write; past
+    ``capacity`` the least recently used entry goes. There are no timers.
+    """
+
+    def __init__(self, capacity: int = 20_000, ttl: float = 900.0, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        METRICS.gauge("view_states", "Interactive messages with live state.", (), lambda: {(): len(self._entries)})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The state for ``key``, or None if it was never stored, finished or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = self.clock()
+        if entry[0] <= now:
+            del self._entries[key]
+            EVICTIONS.inc("ttl")
+            return None
+        self._entries[key] = (now + self.ttl, entry[1])
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, state: Any) -> None:
+        now = self.clock()
+        self.sweep(now)
+        self._entries[key] = (now + self.ttl, state)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            EVICTIONS.inc("lru")
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drops expired entries; returns how many."""
+        now = self.clock() if now is None else now
+        entries = self._entries
+        dropped = 0
+        while entries:
+            key, (expires, _) = next(iter(entries.items()))
+            if expires > now:
+                break
+            del entries[key]
+            dropped += 1
+        if dropped:
+            EVICTIONS.inc("ttl", amount=dropped)
+        return dropped
+
+
+def view_key(message: discord.Message) -> int:
+    """Store key for a flow message: the slash interaction's ID, or the prefix reply's message ID."""
+    interaction = message.interaction
+    return interaction.id if interaction is not None else message.id
+
+
+def frozen(view: discord.ui.View) -> discord.ui.View:
+    """Stops ``view`` so sending it only renders its buttons; the dispatcher handles the clicks."""
+    view.stop()
+    return view
+
+
+async def claim(interaction: discord.Interaction, store: ViewStateStore, kind: type, command: Optional[str] = None) -> Optional[Any]:
+    """The ``kind`` state behind a button click, after the checks every flow shares.
+
+    Returns None, having answered the interaction, when the flow is gone
+    (its buttons are removed), the clicker didn't start it, or ``command``'s
+    click limit applies.
+    """
+    key = view_key(interaction.message)
+    state = store.get(key)
+    if not isinstance(state, kind):
+        await interaction.response.edit_message(view=None)
+        return None
+    if interaction.user.id != state.user_id:
+        await interaction.response.send_message("These buttons belong to someone else's command.", ephemeral=True)
+        return None
+    limiter = getattr(interaction.client, "rate_limiter", None)
+    if command is not None and limiter is not None:
+        hit = limiter.check_click(command, interaction.user.id, interaction.guild_id)
+        if hit is not None:
+            await interaction.response.send_message(limit_message(*hit), ephemeral=True)
+            return None
+    return state
+
+
+async def reply_with_view(responder, ctx, store: ViewStateStore, state: Any, *, embed: discord.Embed, view: discord.ui.View) -> None:
+    """Sends a prefix reply with buttons and keeps ``state`` for them under the sent message."""
+    try:
+        message = await (await responder.reply(ctx, embed=embed, view=view))
+    except Exception:
+        return  # logged by the responder; nothing to click
+    store.put(message.id, state)
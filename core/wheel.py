@@ -0,0 +1,129 @@
+# wheel.py
+# Hierarchical timing wheel: O(1) scheduling and cancellation for large
+# numbers of long timers, advanced by one periodic task instead of a sleeping
+# task per timer.
+from __future__ import annotations
+import heapq
+from typing import Dict, Hashable, List, Tuple
+
+Entry = Tuple[int, Hashable]  # (deadline tick, key)
+
+
+class TimingWheel:
+    """Timers keyed by any hashable, due at absolute times.
+
+    Level 0 has one slot per tick; each level above covers ``slots`` times
+    the span of the one below, and its slots are cascaded down as the wheel
+    turns. With the defaults (1 s ticks, 64 slots, 4 levels) the wheel spans
+    about 194 days; later deadlines wait in an overflow heap.
+
+    Cancelling only drops the key from the deadline map; stale slot entries
+    are skipped when their slot comes up.
+    """
+
+    __slots__ = ("tick", "current", "_bits", "_mask", "_levels", "_overflow", "_deadlines", "_late")
+
+    def __init__(self, now: float, tick: float = 1.0, slots: int = 64, levels: int = 4):
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.current = int(now // tick)
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._levels: List[List[List[Entry]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overflow: List[Entry] = []
+        self._deadlines: Dict[Hashable, int] = {}
+        # Scheduled at or before the current tick; returned by the next advance()
+        self._late: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, when: float) -> None:
+        """Fires ``key`` at ``when``, replacing any timer it already has."""
+        due = -int(-when // self.tick)  # first tick at or after ``when``
+        self._deadlines[key] = due
+        self._place(due, key)
+
+    def cancel(self, key: Hashable) -> bool:
+        return self._deadlines.pop(key, None) is not None
+
+    def _place(self, due: int, key: Hashable) -> None:
+        current = self.current
+        if due <= current:
+            self._late.append(key)
+            return
+        # The level is the highest digit (base ``slots``) where the deadline
+        # and the current tick differ, so the slot is always ahead of the hand
+        bits = self._bits
+        level = 0
+        while (due >> (bits * (level + 1))) != (current >> (bits * (level + 1))):
+            level += 1
+            if level == len(self._levels):
+                heapq.heappush(self._overflow, (due, key))
+                return
+        self._levels[level][(due >> (bits * level)) & self._mask].append((due, key))
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Turns the wheel up to ``now`` and returns the keys that came due, in deadline order."""
+        target = int(now // self.tick)
+        deadlines = self._deadlines
+        fired: List[Hashable] = []
+        self._fire_late(fired)
+        bits, mask, levels = self._bits, self._mask, self._levels
+        while self.current < target:
+            if not deadlines:
+                # Nothing live: drop cancelled leftovers and jump
+                for level in levels:
+                    for slot in level:
+                        slot.clear()
+                self._overflow.clear()
+                self.current = target
+                break
+            self.current += 1
+            current = self.current
+            # Cascade every level whose lower digits just rolled over, top down
+            top = 1
+            while top < len(levels) and not (current >> (bits * (top - 1))) & mask:
+                top += 1
+            for level in range(top - 1, 0, -1):
+                slot = levels[level][(current >> (bits * level)) & mask]
+                if slot:
+                    entries = slot[:]
+                    slot.clear()
+                    for due, key in entries:
+                        if deadlines.get(key) == due:
+                            self._place(due, key)
+            overflow = self._overflow
+            span = bits * len(levels)
+            while overflow and overflow[0][0] >> span == current >> span:
+                due, key = heapq.heappop(overflow)
+                if deadlines.get(key) == due:
+                    self._place(due, key)
+            slot = levels[0][current & mask]
+            if slot:
+                for due, key in slot:
+                    if deadlines.get(key) == due:
+                        del deadlines[key]
+                        fired.append(key)
+                slot.clear()
+            self._fire_late(fired)
+        return fired
+
+    def _fire_late(self, fired: List[Hashable]) -> None:
+        if not self._late:
+            return
+        late, self._late = self._late, []
+        deadlines = self._deadlines
+        for key in late:
+            due = deadlines.get(key)
+            if due is not None and due <= self.current:
+                del deadlines[key]
+                fired.append(key)
+
+    def next_due(self) -> float:
+        """Earliest pending deadline in seconds, or inf; O(n), for tooling and tests."""
+        return min(self._deadlines.values(), default=float("inf")) * self.tick
@@ -0,0 +1,39 @@
+# launcher.py
+# Runs the bot as N cluster processes, each owning a slice of the shard range.
+#
+#   SHARD_COUNT=16 CLUSTER_COUNT=4 python launcher.py
+#   python launcher.py --stub            # local run against a stub gateway
+import argparse
+import logging
+import os
+import signal
+
+from core.cluster import RestartPolicy, Supervisor
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-process cluster launcher')
+    parser.add_argument('--shards', type=int, default=int(os.getenv('SHARD_COUNT', '1')))
+    parser.add_argument('--clusters', type=int, default=int(os.getenv('CLUSTER_COUNT', str(os.cpu_count() or 1))))
+    parser.add_argument('--stub', action='store_true', default=os.getenv('STUB_GATEWAY') == '1',
+                        help='run fake clusters instead of connecting to Discord')
+    parser.add_argument('--max-restarts', type=int, default=int(os.getenv('CLUSTER_MAX_RESTARTS', '5')))
+    parser.add_argument('--restart-window', type=float, default=float(os.getenv('CLUSTER_RESTART_WINDOW', '300')))
+    parser.add_argument('--status-interval', type=float, default=float(os.getenv('CLUSTER_STATUS_INTERVAL', '60')))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)-8s %(name)s %(message)s')
+    supervisor = Supervisor(
+        args.shards,
+        args.clusters,
+        stub=args.stub,
+        policy=RestartPolicy(max_restarts=args.max_restarts, window=args.restart_window),
+    )
+    # Stop the clusters cleanly when the supervisor itself is terminated
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+    try:
+        supervisor.run(status_interval=args.status_interval)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
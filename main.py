@@ -1,31 +1,155 @@
+import asyncio
 import discord
 from discord.ext import commands
 import os
+import time
+
+from cogs import LAZY_COGS
+
+from core.diagnostics import LoopWatchdog
+from core.expeditions import ExpeditionScheduler, ExpeditionStore
+from core.extensions import format_timings, load_cogs as load_extensions
+from core.inventory import SQLiteInventoryService
+from core.journal import RewardJournal
+from core.leaderboard import Leaderboards, install_leaderboards
+from core.market import Exchange, OrderStore
+from core.metrics import MetricsServer, instrument
+from core.profile import client_options, describe
+from core.ratelimit import RateLimiter, install_limiter
+from core.registry import CONTENT_DIR, ContentWatcher
+from core.responses import ResponseScheduler
+from core.sync import SyncState, parse_guild_ids, sync_commands
+from core.views import ViewStateStore
 
 # Bot configuration
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 DEFAULT_PREFIX = '!'
+INVENTORY_DB = os.getenv('INVENTORY_DB', 'data/inventory.sqlite3')
+INVENTORY_FLUSH_MS = int(os.getenv('INVENTORY_FLUSH_MS', '250'))
+# Append-only reward log (empty to disable): fsynced once per commit window and
+# compacted into a snapshot every REWARD_SNAPSHOT_INTERVAL seconds
+REWARD_LOG_DIR = os.getenv('REWARD_LOG_DIR', 'data/rewards')
+REWARD_LOG_COMMIT_MS = int(os.getenv('REWARD_LOG_COMMIT_MS', '50'))
+REWARD_SNAPSHOT_INTERVAL = float(os.getenv('REWARD_SNAPSHOT_INTERVAL', '3600'))
+SYNC_STATE_FILE = os.getenv('SYNC_STATE_FILE', 'data/command_sync.json')
+# Leaderboard snapshot (empty to keep the boards in memory only), saved every
+# LEADERBOARD_SAVE_INTERVAL seconds and on shutdown; one file per cluster
+LEADERBOARD_FILE = os.getenv('LEADERBOARD_FILE', 'data/leaderboards.bin')
+LEADERBOARD_SAVE_INTERVAL = float(os.getenv('LEADERBOARD_SAVE_INTERVAL', '300'))
+# Seconds between re-reads of the shared inventory totals, which bring in
+# other clusters' grants (0 = only at startup)
+LEADERBOARD_SYNC_INTERVAL = float(os.getenv('LEADERBOARD_SYNC_INTERVAL', '60'))
+# Active expeditions; each cluster process keeps its own file
+EXPEDITION_DB = os.getenv('EXPEDITION_DB', 'data/expeditions.sqlite3')
+# Button state for open chest and fight messages: at most VIEW_STATE_CAPACITY
+# messages, each dropped after VIEW_STATE_TTL seconds without a click
+VIEW_STATE_CAPACITY = int(os.getenv('VIEW_STATE_CAPACITY', '20000'))
+VIEW_STATE_TTL = float(os.getenv('VIEW_STATE_TTL', '900'))
+# Development guilds get an instant per-guild copy of the commands
+DEV_GUILD_IDS = parse_guild_ids(os.getenv('DEV_GUILD_IDS'))
+SYNC_GLOBAL = os.getenv('SYNC_GLOBAL', '1') != '0'
+# Sharding: set SHARD_COUNT (or SHARD_COUNT=auto) to run an AutoShardedBot.
+# launcher.py sets SHARD_IDS/CLUSTER_ID for each cluster process.
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_IDS = [int(s) for s in os.getenv('SHARD_IDS', '').split(',') if s.strip()]
+CLUSTER_ID = os.getenv('CLUSTER_ID')
+# Prometheus endpoint; each cluster process listens on METRICS_PORT + CLUSTER_ID
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+# Log the blocking stack when the event loop stalls longer than this; 0 disables
+LOOP_LAG_THRESHOLD_MS = int(os.getenv('LOOP_LAG_THRESHOLD_MS', '250'))
+RATE_LIMITS = os.getenv('RATE_LIMITS', '1') != '0'
+# Seconds between checks of the content directory for edits; 0 disables hot reload
+CONTENT_WATCH_INTERVAL = float(os.getenv('CONTENT_WATCH_INTERVAL', '2'))
+# Cog startup: stub-and-load-on-first-use for cogs.LAZY_COGS,
+# and STRICT_COGS=1 to abort startup when any cog fails to load
+LAZY_LOADING = os.getenv('LAZY_COGS', '1') != '0'
+STRICT_COGS = os.getenv('STRICT_COGS', '0') == '1'
 
-# Create bot instance with intents
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
+# Create bot instance; CLIENT_PROFILE=lean trims intents and caches
+CLIENT_OPTIONS = client_options()
 
-bot = commands.Bot(
-    command_prefix=DEFAULT_PREFIX,
-    intents=intents,
-    help_command=None
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        command_prefix=DEFAULT_PREFIX,
+        help_command=None,
+        shard_count=None if SHARD_COUNT == 'auto' else int(SHARD_COUNT),
+        shard_ids=SHARD_IDS or None,
+        **CLIENT_OPTIONS
+    )
+else:
+    bot = commands.Bot(
+        command_prefix=DEFAULT_PREFIX,
+        help_command=None,
+        **CLIENT_OPTIONS
+    )
+# Shared by the cogs; grants are buffered and flushed in batches, and each
+# cluster process keeps its own reward log
+reward_log = RewardJournal(
+    os.path.join(REWARD_LOG_DIR, f'cluster-{CLUSTER_ID}') if CLUSTER_ID is not None else REWARD_LOG_DIR,
+    commit_interval=REWARD_LOG_COMMIT_MS / 1000,
+    snapshot_interval=REWARD_SNAPSHOT_INTERVAL,
+) if REWARD_LOG_DIR else None
+# Top-N and rank per metric, updated by every grant; the inventory loads and saves them
+leaderboard_file, leaderboard_ext = os.path.splitext(LEADERBOARD_FILE)
+if LEADERBOARD_FILE and CLUSTER_ID is not None:
+    LEADERBOARD_FILE = f'{leaderboard_file}-cluster{CLUSTER_ID}{leaderboard_ext}'
+bot.leaderboards = Leaderboards(
+    LEADERBOARD_FILE or None, save_interval=LEADERBOARD_SAVE_INTERVAL, sync_interval=LEADERBOARD_SYNC_INTERVAL,
 )
+install_leaderboards(bot, bot.leaderboards)
+bot.inventory = SQLiteInventoryService(
+    INVENTORY_DB, flush_interval=INVENTORY_FLUSH_MS / 1000, journal=reward_log, leaderboards=bot.leaderboards,
+)
+bot.sync_state = SyncState(SYNC_STATE_FILE)
+# Expedition deadlines on a timing wheel; started and stopped by cogs/expeditions.py
+expedition_db, expedition_ext = os.path.splitext(EXPEDITION_DB)
+bot.expeditions = ExpeditionScheduler(ExpeditionStore(
+    f'{expedition_db}-cluster{CLUSTER_ID}{expedition_ext}' if CLUSTER_ID is not None else EXPEDITION_DB
+))
+# Item order books; orders are stored in the inventory database with their escrow.
+# Each cluster process runs its own market, keyed by CLUSTER_ID in the shared table.
+# Started and stopped by cogs/market.py
+bot.market = Exchange(bot.inventory, OrderStore(bot.inventory, market=int(CLUSTER_ID or 0)))
+bot.view_states = ViewStateStore(VIEW_STATE_CAPACITY, VIEW_STATE_TTL)
+# Defers slow interactions and coalesces queued replies per channel
+bot.responder = ResponseScheduler()
+bot.dev_guild_ids = DEV_GUILD_IDS
+bot.sync_global = SYNC_GLOBAL
+# Command latency, error counts and gateway events, exported when METRICS_PORT != 0
+instrument(bot)
+bot.metrics_server = MetricsServer(host=METRICS_HOST, port=METRICS_PORT + int(CLUSTER_ID or 0)) if METRICS_PORT else None
+# Per-user/guild/global cooldowns on the embed-sending commands (core/ratelimit.py)
+bot.rate_limiter = RateLimiter() if RATE_LIMITS else None
+if bot.rate_limiter is not None:
+    install_limiter(bot, bot.rate_limiter)
+bot.content_watcher = ContentWatcher(CONTENT_DIR, CONTENT_WATCH_INTERVAL) if CONTENT_WATCH_INTERVAL > 0 else None
+bot.loop_watchdog = LoopWatchdog(LOOP_LAG_THRESHOLD_MS / 1000) if LOOP_LAG_THRESHOLD_MS else None
+commands_synced = False
 
 @bot.event
 async def on_ready():
-    print(f'Bot is ready! Logged in as {bot.user}')
-    print(f'Bot is in {len(bot.guilds)} guilds')
-    
-    # Sync slash commands
+    global commands_synced
+    cluster = f'[cluster {CLUSTER_ID}] ' if CLUSTER_ID is not None else ''
+    print(f'{cluster}Bot is ready! Logged in as {bot.user}')
+    print(f'{cluster}Bot is in {len(bot.guilds)} guilds')
+    reporter = getattr(bot, 'health_reporter', None)
+    if reporter is not None:
+        # Push a report now so the supervisor's fleet totals include this cluster
+        reporter.report(bot)
+
+    # Only one cluster needs to sync the (shared) command tree
+    if CLUSTER_ID not in (None, '0'):
+        return
+
+    # on_ready fires again after reconnects; the tree can only change on restart
+    if commands_synced:
+        return
     try:
-        synced = await bot.tree.sync()
-        print(f'Synced {len(synced)} slash command(s)')
+        results = await sync_commands(bot.tree, bot.sync_state, bot.dev_guild_ids, include_global=bot.sync_global)
+        commands_synced = True
+        for result in results:
+            print(f'Slash commands {result}')
     except Exception as e:
         print(f'Failed to sync commands: {e}')
 
@@ -37,19 +161,54 @@ async def on_guild_join(guild):
 async def on_guild_remove(guild):
     print(f'Left guild: {guild.name} (ID: {guild.id})')
 
-# Load cogs
+# Load cogs from the cogs/ package; see core/extensions.py
 async def load_cogs():
-    for filename in os.listdir('./cogs'):
-        if filename.endswith('.py'):
-            try:
-                await bot.load_extension(f'cogs.{filename[:-3]}')
-                print(f'Loaded cog: {filename}')
-            except Exception as e:
-                print(f'Failed to load cog {filename}: {e}')
+    start = time.perf_counter()
+    timings = await load_extensions(
+        bot, lazy=LAZY_COGS if LAZY_LOADING else None, strict=STRICT_COGS,
+    )
+    print(format_timings(timings))
+    failed = [t.name for t in timings if t.status == 'failed']
+    print(f'Cogs ready in {(time.perf_counter() - start) * 1000:.0f} ms' + (f'; FAILED: {", ".join(failed)}' if failed else ''))
 
 @bot.event
 async def setup_hook():
+    print(f'Client profile: {describe(CLIENT_OPTIONS)}')
+    await bot.inventory.start()
+    if bot.loop_watchdog is not None:
+        bot.loop_watchdog.start()
+    if bot.metrics_server is not None:
+        await bot.metrics_server.start()
+        print(f'Metrics: http://{bot.metrics_server.host}:{bot.metrics_server.port}/metrics')
+    reporter = getattr(bot, 'health_reporter', None)
+    if reporter is not None:
+        reporter.start(bot)
     await load_cogs()
+    if bot.content_watcher is not None:
+        bot.content_watcher.start()
+
+async def main():
+    discord.utils.setup_logging()
+    async with bot:
+        try:
+            await bot.start(BOT_TOKEN)
+        finally:
+            # Write out anything still buffered before the process exits
+            # Let a finishing expedition batch grant its rewards, and the market pay
+            # out any retried settlement, before the store closes
+            await bot.expeditions.close()
+            await bot.market.close()
+            await bot.responder.close()
+            await bot.inventory.close()
+            if bot.metrics_server is not None:
+                await bot.metrics_server.close()
+            if bot.loop_watchdog is not None:
+                bot.loop_watchdog.stop()
+            if bot.content_watcher is not None:
+                await bot.content_watcher.stop()
 
 if __name__ == '__main__':
-    bot.run(BOT_TOKEN)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
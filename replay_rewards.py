@@ -0,0 +1,52 @@
+# replay_rewards.py
+# Rebuilds balances from reward logs (the latest snapshot plus the segments
+# after it). Pass several directories to sum the logs of every cluster.
+#
+#   python replay_rewards.py data/rewards
+#   python replay_rewards.py data/rewards/cluster-* --user 1234
+#   python replay_rewards.py data/rewards --sqlite rebuilt.sqlite3
+import argparse
+import json
+import logging
+import sys
+import time
+
+from core.journal import Balances, export_sqlite, replay
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild inventory balances from the reward log')
+    parser.add_argument('directories', nargs='*', default=['data/rewards'])
+    parser.add_argument('--user', type=int, action='append', default=[], help='print this user\'s balance (repeatable)')
+    parser.add_argument('--sqlite', help='write the rebuilt balances to a new inventory database')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)-8s %(name)s %(message)s')
+    start = time.perf_counter()
+    balances = Balances()
+    for directory in args.directories:
+        balances.merge(replay(directory))
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        'records': balances.records,
+        'users': len(balances.users),
+        'item_rows': sum(1 for _ in balances.item_rows()),
+        'seconds': round(elapsed, 3),
+        'records_per_sec': round(balances.records / elapsed) if elapsed else 0,
+        'profiles': {str(u): balances.profile(u) for u in args.user},
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['records']:,} records, {summary['users']:,} users, {summary['item_rows']:,} item rows "
+              f"in {elapsed:.3f}s ({summary['records_per_sec']:,}/s)")
+        for user, profile in summary['profiles'].items():
+            print(f'{user}: {profile}')
+    if args.sqlite:
+        export_sqlite(balances, args.sqlite)
+        print(f'Wrote {args.sqlite}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())